@@ -1,6 +1,7 @@
 import streamlit as st
 import pandas as pd
 from db_utils import get_supabase_client
+import repository
 
 def show_activity_management():
     st.title("Gestión de Actividades")
@@ -25,18 +26,19 @@ def show_activity_list():
     
     # Obtener las actividades
     supabase = get_supabase_client()
-    response = supabase.table('actividades').select('*').execute()
+    activities = repository.list_activities(supabase)
     
-    if response.data:
+    if activities:
         # Convertir a DataFrame para mostrar
-        df = pd.DataFrame(response.data)
+        df = pd.DataFrame(activities)
         
         # Reorganizar y renombrar columnas para mejor visualización
-        columns_to_display = ['nombre', 'descripcion']
+        columns_to_display = ['nombre', 'descripcion', 'capacidad']
         df_display = df[columns_to_display].copy()
+        df_display['capacidad'] = df_display['capacidad'].map(lambda c: int(c) if pd.notna(c) else 'Sin límite')
         
         # Renombrar columnas para mostrar
-        df_display.columns = ['Nombre', 'Descripción']
+        df_display.columns = ['Nombre', 'Descripción', 'Aforo']
         
         # Mostrar DataFrame
         st.dataframe(df_display, use_container_width=True)
@@ -49,6 +51,7 @@ def show_new_activity():
     with st.form("new_activity_form"):
         nombre = st.text_input("Nombre de la Actividad")
         descripcion = st.text_area("Descripción")
+        capacidad = st.number_input("Aforo por sesión (0 = sin límite)", min_value=0, step=1, value=0)
         
         submit = st.form_submit_button("Registrar Actividad")
         
@@ -59,20 +62,17 @@ def show_new_activity():
                 supabase = get_supabase_client()
                 
                 # Verificar si ya existe una actividad con ese nombre
-                response = supabase.table('actividades').select('*').eq('nombre', nombre).execute()
-                
-                if response.data and len(response.data) > 0:
+                if repository.activity_name_in_use(supabase, nombre):
                     st.error(f"Ya existe una actividad con el nombre {nombre}")
                 else:
                     # Insertar nueva actividad
                     data = {
                         'nombre': nombre,
-                        'descripcion': descripcion if descripcion else None
+                        'descripcion': descripcion if descripcion else None,
+                        'capacidad': capacidad or None
                     }
                     
-                    response = supabase.table('actividades').insert(data).execute()
-                    
-                    if response.data:
+                    if repository.insert_activity(supabase, data):
                         st.success(f"Actividad {nombre} registrada correctamente")
                         # Limpiar el formulario
                         st.session_state['nombre'] = ""
@@ -85,23 +85,26 @@ def show_edit_activity():
     
     # Obtener lista de actividades
     supabase = get_supabase_client()
-    response = supabase.table('actividades').select('*').execute()
+    activities = repository.list_activities(supabase)
     
-    if not response.data:
+    if not activities:
         st.info("No hay actividades disponibles para editar")
         return
     
     # Crear lista de opciones para el selector
-    activity_options = [f"{a['nombre']}" for a in response.data]
+    activity_options = [a.nombre for a in activities]
     selected_activity = st.selectbox("Seleccionar Actividad a Editar", options=activity_options)
     
     # Encontrar la actividad seleccionada
-    activity = next((a for a in response.data if a['nombre'] == selected_activity), None)
+    activity = next((a for a in activities if a.nombre == selected_activity), None)
     
     if activity:
         with st.form("edit_activity_form"):
-            nombre = st.text_input("Nombre de la Actividad", value=activity['nombre'])
-            descripcion = st.text_area("Descripción", value=activity['descripcion'] if activity['descripcion'] else "")
+            nombre = st.text_input("Nombre de la Actividad", value=activity.nombre)
+            descripcion = st.text_area("Descripción", value=activity.descripcion or "")
+            capacidad = st.number_input("Aforo por sesión (0 = sin límite)", min_value=0, step=1,
+                                        value=activity.capacidad or 0,
+                                        help="Se aplica a las reservas nuevas; las existentes conservan su aforo")
             
             submit = st.form_submit_button("Actualizar Actividad")
             
@@ -110,21 +113,19 @@ def show_edit_activity():
                     st.error("El nombre de la actividad es obligatorio")
                 else:
                     # Verificar si el nuevo nombre ya existe (si se cambió)
-                    if nombre != activity['nombre']:
-                        check_response = supabase.table('actividades').select('*').eq('nombre', nombre).execute()
-                        if check_response.data and len(check_response.data) > 0:
+                    if nombre != activity.nombre:
+                        if repository.activity_name_in_use(supabase, nombre):
                             st.error(f"Ya existe una actividad con el nombre {nombre}")
                             return
                     
                     # Actualizar actividad
                     data = {
                         'nombre': nombre,
-                        'descripcion': descripcion if descripcion else None
+                        'descripcion': descripcion if descripcion else None,
+                        'capacidad': capacidad or None
                     }
                     
-                    response = supabase.table('actividades').update(data).eq('id', activity['id']).execute()
-                    
-                    if response.data:
+                    if repository.update_activity(supabase, activity.id, data):
                         st.success(f"Actividad actualizada correctamente")
                     else:
                         st.error("Error al actualizar la actividad")
@@ -0,0 +1,160 @@
+import io
+import unicodedata
+import pandas as pd
+import repository
+from repository import SECCIONES, GRUPOS
+
+REQUIRED_COLUMNS = ['nombre', 'apellidos', 'nip', 'seccion', 'grupo']
+OPTIONAL_COLUMNS = ['email', 'telefono', 'es_monitor']
+
+# NIP numérico de hasta 6 cifras (VARCHAR(6) en la tabla agentes)
+NIP_PATTERN = r'^[0-9]{1,6}$'
+EMAIL_PATTERN = r'^[^@\s]+@[^@\s]+\.[^@\s]+$'
+
+# Filas procesadas por bloque (lectura, validación, consulta y upsert)
+CHUNK_SIZE = 500
+
+TRUE_VALUES = {'1', 'si', 'sí', 'true', 'x', 'yes', 's'}
+
+def _normalize_column(name):
+    name = unicodedata.normalize('NFKD', str(name)).encode('ascii', 'ignore').decode('ascii')
+    return name.strip().lower().replace(' ', '_')
+
+def read_roster(uploaded_file, chunk_size=CHUNK_SIZE):
+    """Lee el fichero por bloques; cada bloque conserva el número de fila original"""
+    name = getattr(uploaded_file, 'name', '').lower()
+
+    if name.endswith(('.xlsx', '.xls')):
+        # Excel no admite lectura por bloques: se lee una vez y se trocea
+        data = pd.read_excel(uploaded_file, dtype=str).fillna('')
+        chunks = (data.iloc[i:i + chunk_size] for i in range(0, len(data), chunk_size))
+    else:
+        content = uploaded_file.read() if hasattr(uploaded_file, 'read') else uploaded_file
+        if isinstance(content, bytes):
+            content = content.decode('utf-8-sig')
+        chunks = pd.read_csv(io.StringIO(content), dtype=str, keep_default_na=False,
+                             sep=None, engine='python', chunksize=chunk_size)
+
+    for chunk in chunks:
+        chunk = chunk.rename(columns=_normalize_column)
+        missing = [c for c in REQUIRED_COLUMNS if c not in chunk.columns]
+        if missing:
+            raise ValueError(f"Faltan columnas obligatorias: {', '.join(missing)}")
+
+        for column in OPTIONAL_COLUMNS:
+            if column not in chunk.columns:
+                chunk[column] = ''
+
+        chunk = chunk[REQUIRED_COLUMNS + OPTIONAL_COLUMNS].astype(str).apply(lambda s: s.str.strip())
+        # Fila en el fichero: índice desde 0 más la cabecera
+        chunk.index = chunk.index + 2
+        yield chunk
+
+def validate_chunk(chunk, seen_nips, seen_emails):
+    """Valida un bloque de forma vectorizada y devuelve una Serie con los errores por fila.
+
+    seen_nips y seen_emails acumulan los valores de bloques anteriores para detectar
+    duplicados en todo el fichero; se actualizan con los del bloque.
+    """
+    chunk['email'] = chunk['email'].str.lower()
+    errors = pd.Series('', index=chunk.index)
+
+    def add(mask, message):
+        nonlocal errors
+        errors = errors + mask.map({True: message + '; ', False: ''})
+
+    for column in REQUIRED_COLUMNS:
+        add(chunk[column] == '', f"'{column}' vacío")
+
+    has_email = chunk['email'] != ''
+    add((chunk['nip'] != '') & ~chunk['nip'].str.match(NIP_PATTERN), "NIP con formato no válido")
+    add((chunk['seccion'] != '') & ~chunk['seccion'].isin(SECCIONES), f"sección no válida (permitidas: {', '.join(SECCIONES)})")
+    add((chunk['grupo'] != '') & ~chunk['grupo'].isin(GRUPOS), f"grupo no válido (permitidos: {', '.join(GRUPOS)})")
+    add(has_email & ~chunk['email'].str.match(EMAIL_PATTERN), "email con formato no válido")
+    add((chunk['nip'] != '') & (chunk['nip'].duplicated(keep='first') | chunk['nip'].isin(seen_nips)), "NIP duplicado en el fichero")
+    add(has_email & (chunk['email'].duplicated(keep='first') | chunk['email'].isin(seen_emails)), "email duplicado en el fichero")
+
+    seen_nips.update(chunk.loc[chunk['nip'] != '', 'nip'])
+    seen_emails.update(chunk.loc[has_email, 'email'])
+
+    return errors.str.rstrip('; ')
+
+def _agent_row(record, is_new):
+    """Fila a guardar con valores de Python (nunca NaN).
+
+    Las columnas opcionales vacías o ausentes en el fichero no se envían para los
+    agentes existentes, para no borrar su email/teléfono ni quitarles el rol de monitor;
+    los agentes nuevos las reciben vacías (es_monitor falso).
+    """
+    row = {column: record[column] for column in REQUIRED_COLUMNS}
+
+    for column in ('email', 'telefono'):
+        if record[column]:
+            row[column] = record[column]
+        elif is_new:
+            row[column] = None
+
+    if record['es_monitor']:
+        row['es_monitor'] = record['es_monitor'].lower() in TRUE_VALUES
+    elif is_new:
+        row['es_monitor'] = False
+
+    return row
+
+def import_chunk(supabase, chunk, errors):
+    """Comprueba el bloque contra la base de datos y hace upsert de las filas válidas.
+
+    Devuelve el informe del bloque (fila, nip, estado, mensaje) y las filas guardadas.
+    """
+    valid = chunk[errors == '']
+    existing = repository.find_agents_by_nip_or_email(supabase, valid['nip'].tolist(), [e for e in valid['email'] if e])
+    existing_nips = {a['nip'] for a in existing}
+    email_owner = {a['email'].lower(): a['nip'] for a in existing if a.get('email')}
+
+    # Un email ya registrado solo es válido si pertenece al mismo NIP
+    owner = valid['email'].map(email_owner)
+    email_conflict = owner.notna() & (owner != valid['nip'])
+    errors = errors.copy()
+    errors.loc[email_conflict[email_conflict].index] = "email ya registrado para otro agente"
+    valid = valid[~email_conflict]
+
+    # Un upsert por cada combinación de columnas: PostgREST exige las mismas claves en todo el lote
+    groups = {}
+    for fila, record in zip(valid.index, valid.to_dict('records')):
+        row = _agent_row(record, record['nip'] not in existing_nips)
+        groups.setdefault(tuple(row), []).append((fila, row))
+
+    # Un grupo que falla (p. ej. una restricción) se marca en el informe y se sigue con el resto
+    saved = []
+    for group in groups.values():
+        try:
+            saved += repository.upsert_agents(supabase, [row for _, row in group])
+        except Exception as e:
+            errors.loc[[fila for fila, _ in group]] = f"error al guardar: {e}"
+
+    report = pd.DataFrame({'fila': chunk.index, 'nip': chunk['nip'].values, 'mensaje': errors.values})
+    report['estado'] = 'error'
+    ok = (report['mensaje'] == '').values
+    report.loc[ok, 'estado'] = report.loc[ok, 'nip'].isin(existing_nips).map({True: 'actualizado', False: 'creado'})
+
+    return report[['fila', 'nip', 'estado', 'mensaje']], saved, existing_nips
+
+def import_roster(supabase, uploaded_file, on_progress=None, on_saved=None):
+    """Importa el fichero completo por bloques y devuelve el informe por fila"""
+    seen_nips, seen_emails = set(), set()
+    reports = []
+
+    for chunk in read_roster(uploaded_file):
+        errors = validate_chunk(chunk, seen_nips, seen_emails)
+        report, saved, existing_nips = import_chunk(supabase, chunk, errors)
+        reports.append(report)
+
+        if on_saved:
+            on_saved(saved, existing_nips)
+        if on_progress:
+            on_progress(sum(len(r) for r in reports))
+
+    if not reports:
+        return pd.DataFrame(columns=['fila', 'nip', 'estado', 'mensaje'])
+
+    return pd.concat(reports, ignore_index=True)
@@ -2,26 +2,41 @@ import streamlit as st
 import pandas as pd
 from db_utils import get_supabase_client
 from auth_utils import get_current_user
+from state_store import get_agents_catalog, patch_agent, invalidate_agents_catalog
+from audit import record_change
+from agent_import import import_roster
+import repository
+from deadlines import load_section, start_sections, show_pending, show_stale
+
+# Número de participaciones por página en el historial
+HISTORY_PAGE_SIZE = 25
 
 def show_agent_management():
     st.title("Gestión de Agentes")
     
-    tabs = st.tabs(["Lista de Agentes", "Registrar Nuevo Agente"])
+    # El historial se dibuja en el mismo rerun que las demás pestañas: su lista de agentes
+    # se lanza antes para no esperar detrás de ellas
+    start_sections((('Agentes',), repository.list_agent_summaries, (get_supabase_client(),)))
+    
+    tabs = st.tabs(["Lista de Agentes", "Registrar Nuevo Agente", "Historial de Participación"])
     
     with tabs[0]:
         show_agents_list()
     
     with tabs[1]:
         show_agent_registration_form()
+    
+    with tabs[2]:
+        show_agent_history()
 
 def show_agents_list():
     st.header("Lista de Agentes")
     
     supabase = get_supabase_client()
     
-    # Obtener todos los agentes
-    response = supabase.table('agentes').select('*').execute()
-    agents = response.data if response.data else []
+    # Obtener todos los agentes (catálogo mantenido en la sesión). Va sin plazo: solo la primera
+    # visita consulta la base de datos y la edición tiene que partir de la lista completa
+    agents = get_agents_catalog(supabase)
     
     if not agents:
         st.info("No hay agentes registrados en el sistema")
@@ -141,8 +156,7 @@ def show_agents_list():
                 
                 # Verificar unicidad de NIP si cambió
                 if 'nip' in changes:
-                    nip_check = supabase.table('agentes').select('id').eq('nip', changes['nip']).neq('id', agent_id).execute()
-                    if nip_check.data and len(nip_check.data) > 0:
+                    if repository.nip_in_use(supabase, changes['nip'], exclude_id=agent_id):
                         st.error(f"Error: El NIP '{changes['nip']}' ya está siendo utilizado por otro agente")
                         error_occurred = True
                         continue
@@ -150,10 +164,15 @@ def show_agents_list():
                 # Aplicar cambios si los hay
                 if changes and not error_occurred:
                     try:
-                        update_response = supabase.table('agentes').update(changes).eq('id', agent_id).execute()
-                        
-                        if update_response.data:
+                        if repository.update_agent(supabase, agent_id, changes):
                             changes_made = True
+                            record_change('agentes', 'UPDATE', agent_id,
+                                          {col: original_row[col] for col in changes}, changes)
+                            # Parchear el catálogo y la copia original sin recargar la tabla
+                            patch_agent(supabase, agent_id, changes)
+                            original_df = st.session_state.original_agents_df
+                            for col, value in changes.items():
+                                original_df.loc[original_df['id'] == agent_id, col] = value
                         else:
                             st.error(f"Error al actualizar el agente con ID {agent_id}")
                             error_occurred = True
@@ -163,10 +182,6 @@ def show_agents_list():
         
         if changes_made and not error_occurred:
             st.success("Cambios guardados correctamente")
-            # Actualizar el DataFrame original
-            response = supabase.table('agentes').select('*').execute()
-            if response.data:
-                st.session_state.original_agents_df = pd.DataFrame(response.data)
             st.rerun()
         elif not error_occurred and not changes_made:
             st.info("No se detectaron cambios")
@@ -176,3 +191,115 @@ def show_agent_registration_form():
     st.header("Registrar Nuevo Agente")
     
     # Resto del código de registro de nuevos agentes...
+    
+    # Importación masiva desde un fichero CSV o Excel
+    st.subheader("Importación Masiva")
+    st.caption(
+        "Columnas obligatorias: nombre, apellidos, nip, seccion, grupo. "
+        "Opcionales: email, telefono, es_monitor. Los NIPs ya registrados se actualizan."
+    )
+    
+    uploaded_file = st.file_uploader("Fichero de agentes", type=['csv', 'xlsx'], key="agents_import_file")
+    
+    if uploaded_file and st.button("Importar Agentes"):
+        supabase = get_supabase_client()
+        progress = st.empty()
+        progress.info("Importando...")
+        
+        def on_progress(processed):
+            progress.info(f"Importando... {processed} filas procesadas")
+        
+        def on_saved(saved, existing_nips):
+            for agent in saved:
+                accion = 'UPDATE' if agent['nip'] in existing_nips else 'INSERT'
+                record_change('agentes', accion, agent['id'], despues=agent)
+        
+        try:
+            report = import_roster(supabase, uploaded_file, on_progress=on_progress, on_saved=on_saved)
+        except ValueError as e:
+            st.error(str(e))
+            return
+        except Exception as e:
+            st.error(f"Error al importar los agentes: {str(e)}")
+            return
+        
+        progress.empty()
+        invalidate_agents_catalog()
+        
+        counts = report['estado'].value_counts()
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Creados", int(counts.get('creado', 0)))
+        col2.metric("Actualizados", int(counts.get('actualizado', 0)))
+        col3.metric("Con errores", int(counts.get('error', 0)))
+        
+        errores = report[report['estado'] == 'error']
+        if not errores.empty:
+            errores_display = errores.copy()
+            errores_display.columns = ['Fila', 'NIP', 'Estado', 'Errores']
+            st.dataframe(errores_display, use_container_width=True, hide_index=True)
+        
+        st.download_button(
+            "Descargar Informe de Importación (CSV)",
+            report.to_csv(index=False).encode('utf-8'),
+            "informe_importacion_agentes.csv",
+            "text/csv",
+            key="download-import-report"
+        )
+
+def show_agent_history():
+    st.header("Historial de Participación")
+    
+    supabase = get_supabase_client()
+    
+    agents, _ = load_section(('Agentes',), repository.list_agent_summaries, supabase)
+    
+    if agents is None:
+        show_pending("Lista de agentes")
+        return
+    
+    if not agents:
+        st.info("No hay agentes registrados en el sistema")
+        return
+    
+    agent_options = {a.id: f"{a.nombre} {a.apellidos} ({a.nip})" for a in agents}
+    agente_id = st.selectbox("Seleccionar agente", options=list(agent_options.keys()), format_func=lambda x: agent_options[x], key="history_agent")
+    
+    # Pila de cursores de las páginas visitadas; se reinicia al cambiar de agente
+    if st.session_state.get('history_agent_id') != agente_id:
+        st.session_state.history_agent_id = agente_id
+        st.session_state.history_cursors = [None]
+    
+    cursors = st.session_state.history_cursors
+    # El cursor es el par (fecha, id) de la última fila de la página anterior
+    page, age = load_section(('Historial', agente_id, cursors[-1]), repository.participation_history_page,
+                             supabase, agente_id, cursors[-1], HISTORY_PAGE_SIZE)
+    
+    if page is None:
+        show_pending("Historial de participación")
+        return
+    
+    rows, has_next = page
+    if not rows:
+        st.info("El agente no tiene participaciones registradas")
+        return
+    
+    df = repository.records_frame(rows, repository.HistoryEntry)
+    df['fecha'] = df['fecha'].dt.strftime('%d/%m/%Y')
+    df['horario'] = df['hora_inicio'].astype(str) + ' - ' + df['hora_fin'].astype(str)
+    df_display = df[['fecha', 'turno', 'horario', 'actividad', 'monitor']]
+    df_display.columns = ['Fecha', 'Turno', 'Horario', 'Actividad', 'Monitor']
+    
+    st.caption(f"Página {len(cursors)}")
+    show_stale(age)
+    st.dataframe(df_display, use_container_width=True, hide_index=True)
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("← Más recientes", disabled=len(cursors) == 1, key="history_prev"):
+            cursors.pop()
+            st.rerun()
+    with col2:
+        if st.button("Más antiguas →", disabled=not has_next, key="history_next"):
+            last = rows[-1]
+            cursors.append((last.fecha, last.id))
+            st.rerun()
@@ -0,0 +1,154 @@
+import streamlit as st
+import pandas as pd
+import plotly.express as px
+from datetime import datetime, timedelta
+from db_utils import get_supabase_client
+import repository
+from deadlines import load_sections, show_pending, show_stale
+
+# Número máximo de periodos que se envían al navegador por serie
+MAX_BUCKETS = 120
+
+# Intervalos de agregación soportados por date_trunc y su duración aproximada en días
+BUCKET_SIZES = [
+    ('day', 1),
+    ('week', 7),
+    ('month', 31),
+    ('quarter', 92),
+    ('year', 366),
+]
+
+BUCKET_LABELS = {
+    'day': 'Día',
+    'week': 'Semana',
+    'month': 'Mes',
+    'quarter': 'Trimestre',
+    'year': 'Año',
+}
+
+def choose_bucket(start_date, end_date, max_buckets=MAX_BUCKETS):
+    """Elige el intervalo más fino que no supere max_buckets periodos en el rango"""
+    days = (end_date - start_date).days + 1
+
+    for bucket, bucket_days in BUCKET_SIZES:
+        if days / bucket_days <= max_buckets:
+            return bucket
+
+    return BUCKET_SIZES[-1][0]
+
+def load_attendance_buckets(supabase, start_date, end_date, bucket):
+    """Participaciones agregadas en la base de datos por periodo, sección y grupo"""
+    rows = repository.attendance_buckets(supabase, start_date, end_date, bucket)
+    df = pd.DataFrame(rows, columns=['periodo', 'seccion', 'grupo', 'total'])
+    df['periodo'] = pd.to_datetime(df['periodo'])
+    return df
+
+def load_reservation_buckets(supabase, start_date, end_date, bucket):
+    """Reservas y asistentes agregados en la base de datos por periodo, actividad y monitor"""
+    rows = repository.reservation_buckets(supabase, start_date, end_date, bucket)
+    df = pd.DataFrame(rows, columns=['periodo', 'actividad_id', 'monitor_id', 'reservas', 'participantes'])
+    df['periodo'] = pd.to_datetime(df['periodo'])
+
+    if df.empty:
+        df['actividad'] = pd.Series(dtype=str)
+        df['monitor'] = pd.Series(dtype=str)
+        return df
+
+    # Resolver nombres solo para los ids presentes en el resultado agregado
+    actividades = repository.activity_names(supabase, df['actividad_id'].unique().tolist())
+    monitores = repository.agent_names(supabase, df['monitor_id'].unique().tolist())
+
+    df['actividad'] = df['actividad_id'].map(actividades).fillna('Desconocida')
+    df['monitor'] = df['monitor_id'].map(monitores).fillna('Desconocido')
+    return df
+
+def show_trend_charts(supabase, start_date, end_date, key_prefix="trends"):
+    """Muestra las gráficas de evolución de asistencia, actividades y carga de monitores"""
+    bucket = choose_bucket(start_date, end_date)
+    bucket_label = BUCKET_LABELS[bucket]
+
+    # Las dos series se piden a la vez, con el tiempo que le queda a la página
+    (attendance, attendance_age), (reservations, reservations_age) = load_sections(
+        (('Asistencia', start_date, end_date, bucket), load_attendance_buckets, (supabase, start_date, end_date, bucket)),
+        (('Actividades', start_date, end_date, bucket), load_reservation_buckets, (supabase, start_date, end_date, bucket)),
+    )
+
+    if attendance is None or reservations is None:
+        show_pending("Tendencias")
+        return
+
+    if attendance.empty and reservations.empty:
+        st.info("No hay datos de participación en el rango de fechas seleccionado")
+        return
+
+    st.caption(f"Datos agrupados por {bucket_label.lower()}")
+    show_stale(max(attendance_age, reservations_age))
+
+    # Gráfica 1: Asistencia por periodo desglosada por sección o grupo
+    st.subheader("Evolución de la Asistencia")
+    breakdown = st.radio("Desglosar por", options=['Sección', 'Grupo'], horizontal=True, key=f"{key_prefix}_breakdown")
+    column = 'seccion' if breakdown == 'Sección' else 'grupo'
+
+    if not attendance.empty:
+        attendance_df = attendance.groupby(['periodo', column], as_index=False)['total'].sum()
+        fig = px.line(
+            attendance_df,
+            x='periodo',
+            y='total',
+            color=column,
+            markers=True,
+            labels={'periodo': bucket_label, 'total': 'Participaciones', column: breakdown}
+        )
+        st.plotly_chart(fig, use_container_width=True)
+    else:
+        st.info("No hay participaciones en el rango de fechas seleccionado")
+
+    if reservations.empty:
+        return
+
+    col1, col2 = st.columns(2)
+
+    # Gráfica 2: Mezcla de actividades
+    with col1:
+        st.subheader("Actividades")
+        actividad_df = reservations.groupby(['periodo', 'actividad'], as_index=False)['reservas'].sum()
+        fig = px.bar(
+            actividad_df,
+            x='periodo',
+            y='reservas',
+            color='actividad',
+            labels={'periodo': bucket_label, 'reservas': 'Reservas', 'actividad': 'Actividad'}
+        )
+        st.plotly_chart(fig, use_container_width=True)
+
+    # Gráfica 3: Carga de los monitores
+    with col2:
+        st.subheader("Carga de Monitores")
+        monitor_df = reservations.groupby('monitor', as_index=False)[['reservas', 'participantes']].sum()
+        fig = px.bar(
+            monitor_df.sort_values('reservas'),
+            x='reservas',
+            y='monitor',
+            orientation='h',
+            hover_data=['participantes'],
+            labels={'reservas': 'Reservas', 'monitor': 'Monitor', 'participantes': 'Participantes'}
+        )
+        st.plotly_chart(fig, use_container_width=True)
+
+def show_analytics():
+    st.title("Análisis de Datos")
+
+    supabase = get_supabase_client()
+
+    # Filtros de fecha para el análisis
+    col1, col2 = st.columns(2)
+    with col1:
+        start_date = st.date_input("Fecha Inicio", value=(datetime.now() - timedelta(days=365)).date(), key="analytics_start")
+    with col2:
+        end_date = st.date_input("Fecha Fin", value=datetime.now().date(), key="analytics_end")
+
+    if start_date > end_date:
+        st.error("La fecha de inicio debe ser anterior a la fecha de fin")
+        return
+
+    show_trend_charts(supabase, start_date, end_date, key_prefix="analytics")
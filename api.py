@@ -0,0 +1,178 @@
+"""API HTTP de solo lectura para otros sistemas (planificación de turnos, RRHH).
+
+Uso:
+    python api.py --host 0.0.0.0 --port 8600
+
+Endpoints (JSON):
+    GET /api/calendario?desde=AAAA-MM-DD&hasta=AAAA-MM-DD
+    GET /api/reservas/<id>/participantes
+    GET /api/agentes/totales?desde=AAAA-MM-DD&hasta=AAAA-MM-DD
+
+Cada respuesta lleva un ETag calculado a partir de versiones_datos.updated_at de
+las tablas de las que depende. Si el cliente envía If-None-Match con el mismo
+valor se responde 304 sin ejecutar las consultas de datos.
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from dotenv import load_dotenv
+from db_utils import get_supabase_client
+import repository
+
+# Cargar variables de entorno
+load_dotenv()
+
+# Si está configurada, se exige en la cabecera Authorization: Bearer <clave>
+API_KEY = os.getenv("API_KEY")
+
+# Número de respuestas guardadas por ETag
+RESPONSE_CACHE_SIZE = 256
+
+_response_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+def _parse_date(params, name):
+    value = params.get(name, [None])[0]
+    if not value:
+        raise ApiError(400, f"Falta el parámetro '{name}'")
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ApiError(400, f"Fecha no válida en '{name}': {value}")
+
+def _date_range(params):
+    start_date = _parse_date(params, 'desde')
+    end_date = _parse_date(params, 'hasta')
+    if start_date > end_date:
+        raise ApiError(400, "La fecha de inicio debe ser anterior a la fecha de fin")
+    return start_date, end_date
+
+def _calendar(supabase, match, params):
+    start_date, end_date = _date_range(params)
+    return [r._asdict() for r in repository.reservation_calendar(supabase, start_date, end_date)]
+
+def _roster(supabase, match, params):
+    return [r._asdict() for r in repository.reservation_roster(supabase, match.group('reserva_id'))]
+
+def _totals(supabase, match, params):
+    start_date, end_date = _date_range(params)
+    return [r._asdict() for r in repository.participation_totals(supabase, start_date, end_date)]
+
+# Ruta, tablas de las que depende la respuesta y función que la genera
+ROUTES = [
+    (re.compile(r'^/api/calendario$'), ('reservas', 'participaciones', 'agentes', 'turnos', 'actividades'), _calendar),
+    (re.compile(r'^/api/reservas/(?P<reserva_id>[0-9a-fA-F-]{36})/participantes$'), ('participaciones', 'agentes'), _roster),
+    (re.compile(r'^/api/agentes/totales$'), ('reservas', 'participaciones', 'agentes'), _totals),
+]
+
+def compute_etag(path, query, versions):
+    digest = hashlib.sha1()
+    digest.update(path.encode('utf-8'))
+    digest.update(query.encode('utf-8'))
+    for tabla in sorted(versions):
+        digest.update(f"{tabla}={versions[tabla]}".encode('utf-8'))
+    return f'"{digest.hexdigest()}"'
+
+def _cached_body(etag):
+    with _cache_lock:
+        body = _response_cache.get(etag)
+        if body is not None:
+            _response_cache.move_to_end(etag)
+        return body
+
+def _store_body(etag, body):
+    with _cache_lock:
+        _response_cache[etag] = body
+        _response_cache.move_to_end(etag)
+        while len(_response_cache) > RESPONSE_CACHE_SIZE:
+            _response_cache.popitem(last=False)
+
+class ApiHandler(BaseHTTPRequestHandler):
+    server_version = "GimnasioAPI/1.0"
+
+    def _send_json(self, status, payload, etag=None):
+        body = payload if isinstance(payload, bytes) else json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        if etag:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _authorized(self):
+        if not API_KEY:
+            return True
+        header = self.headers.get('Authorization', '')
+        return hmac.compare_digest(header, f"Bearer {API_KEY}")
+
+    def do_GET(self):
+        url = urlparse(self.path)
+
+        if not self._authorized():
+            self._send_json(401, {'error': 'No autorizado'})
+            return
+
+        for pattern, tables, handler in ROUTES:
+            match = pattern.match(url.path)
+            if match:
+                break
+        else:
+            self._send_json(404, {'error': 'Recurso no encontrado'})
+            return
+
+        try:
+            supabase = get_supabase_client()
+            etag = compute_etag(url.path, url.query, repository.table_versions(supabase, tables))
+
+            # El cliente ya tiene la versión actual: no se ejecuta ninguna consulta de datos
+            if etag in [tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')]:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+
+            body = _cached_body(etag)
+            if body is None:
+                data = handler(supabase, match, parse_qs(url.query))
+                body = json.dumps({'data': data}, ensure_ascii=False, default=str).encode('utf-8')
+                _store_body(etag, body)
+
+            self._send_json(200, body, etag)
+        except ApiError as e:
+            self._send_json(e.status, {'error': e.message})
+        except Exception as e:
+            self._send_json(500, {'error': str(e)})
+
+def main():
+    parser = argparse.ArgumentParser(description="API de solo lectura del gimnasio")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8600)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), ApiHandler)
+    print(f"API escuchando en http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
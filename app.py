@@ -1,5 +1,12 @@
 import streamlit as st
 from auth_utils import login, logout, reset_password, is_authenticated, get_current_user, is_admin
+from dashboard import show_dashboard
+from analytics import show_analytics
+from agent_management import show_agent_management
+from reservation_management import show_reservation_management
+from kiosk import show_kiosk
+from profiling import profile_page
+from deadlines import page_deadline, show_budget_report
 
 # Configuración inicial de la aplicación
 st.set_page_config(
@@ -10,24 +17,6 @@ st.set_page_config(
 )
 
 # Funciones para mostrar diferentes secciones de la aplicación
-def show_dashboard():
-    st.title("Dashboard")
-    st.write("Bienvenido al panel de control del sistema de gestión del gimnasio.")
-    # Aquí puedes añadir estadísticas, gráficos, etc.
-    st.info("Esta sección mostrará información general y estadísticas del gimnasio.")
-
-def show_agent_management():
-    st.title("Gestión de Agentes")
-    st.write("En esta sección puedes gestionar los agentes de policía registrados.")
-    # Implementación básica
-    st.info("Aquí podrás añadir, editar o eliminar agentes.")
-
-def show_reservation_management():
-    st.title("Gestión de Reservas")
-    st.write("Administra las reservas del gimnasio.")
-    # Implementación básica
-    st.info("Aquí podrás ver, crear y gestionar reservas para diferentes actividades.")
-
 def show_activity_management():
     st.title("Gestión de Actividades")
     st.write("Configura las actividades disponibles en el gimnasio.")
@@ -40,12 +29,6 @@ def show_user_management():
     # Implementación básica - solo para administradores
     st.info("Aquí podrás añadir, editar o eliminar usuarios del sistema.")
 
-def show_analytics():
-    st.title("Análisis de Datos")
-    st.write("Visualiza estadísticas y análisis del uso del gimnasio.")
-    # Implementación básica
-    st.info("Aquí se mostrarán gráficos y estadísticas sobre el uso del gimnasio.")
-
 def show_settings():
     st.title("Configuración")
     st.write("Configura los ajustes del sistema.")
@@ -113,6 +96,7 @@ def show_navigation():
                 options=[
                     "Dashboard", 
                     "Reservas", 
+                    "Kiosko",
                     "Agentes",
                     "Actividades",
                     "Análisis",
@@ -141,13 +125,25 @@ def main():
     # Mostrar menú lateral y obtener la opción seleccionada
     selected_option = show_navigation()
     
-    # Mostrar la sección correspondiente según la opción seleccionada
+    # Mostrar la sección (perfilada si un administrador lo ha solicitado) dentro de su presupuesto de latencia
+    with profile_page(selected_option), page_deadline(selected_option):
+        show_selected_page(selected_option)
+    
+    if is_admin():
+        with st.sidebar:
+            show_budget_report()
+
+# Función para mostrar la sección correspondiente según la opción seleccionada
+def show_selected_page(selected_option):
     if selected_option == "Dashboard":
         show_dashboard()
     
     elif selected_option == "Reservas":
         show_reservation_management()
     
+    elif selected_option == "Kiosko":
+        show_kiosk()
+    
     elif selected_option == "Agentes":
         show_agent_management()
     
@@ -0,0 +1,69 @@
+"""Archivo de los meses cerrados.
+
+Uso:
+    python archive.py                # deja en las tablas activas los últimos 3 meses cerrados
+    python archive.py --meses 6 --dry-run
+
+Mueve las reservas y participaciones anteriores al límite a reservas_archivo y
+participaciones_archivo con la función archivar_hasta de init_db.sql, en una sola
+transacción. Las consultas por rango (totales, tendencias, historial y calendario)
+siguen viendo los datos archivados; las del día a día solo leen las tablas activas,
+que dejan de crecer con el histórico. Pensado para ejecutarse desde cron a
+principios de cada mes:
+
+    0 3 1 * * cd /ruta/a/la/app && python archive.py
+"""
+import argparse
+import os
+import sys
+from datetime import date
+from dotenv import load_dotenv
+from db_utils import get_supabase_client
+from rotation_index import ROTATION_WINDOW_DAYS
+import repository
+
+# Cargar variables de entorno
+load_dotenv()
+
+# Meses cerrados que se mantienen en las tablas activas además del mes en curso
+ARCHIVE_KEEP_MONTHS = int(os.getenv("ARCHIVE_KEEP_MONTHS", "3"))
+
+def archive_limit(today, keep_months):
+    """Primer día del mes que queda keep_months meses antes del mes en curso"""
+    months = today.year * 12 + today.month - 1 - keep_months
+    return date(months // 12, months % 12 + 1, 1)
+
+def main():
+    parser = argparse.ArgumentParser(description="Archiva las reservas y participaciones de los meses cerrados")
+    parser.add_argument('--meses', type=int, default=ARCHIVE_KEEP_MONTHS,
+                        help="Meses cerrados que se mantienen en las tablas activas")
+    parser.add_argument('--dry-run', action='store_true', help="Muestra el límite sin archivar nada")
+    args = parser.parse_args()
+
+    today = date.today()
+    limite = archive_limit(today, args.meses)
+
+    # La rotación y la búsqueda de participantes leen solo las tablas activas
+    if (today - limite).days < ROTATION_WINDOW_DAYS:
+        parser.error(f"Hay que mantener al menos {ROTATION_WINDOW_DAYS} días en las tablas activas")
+
+    supabase = get_supabase_client()
+    actual = repository.archived_until(supabase)
+    if actual is not None and limite <= actual:
+        print(f"Ya está archivado hasta el {actual.isoformat()}")
+        return
+
+    if args.dry_run:
+        print(f"Se archivarían las reservas anteriores al {limite.isoformat()}")
+        return
+
+    try:
+        reservas, participaciones = repository.archive_until(supabase, limite)
+    except Exception as e:
+        print(f"Error al archivar: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    print(f"Archivado hasta el {limite.isoformat()}: {reservas} reservas y {participaciones} participaciones")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+from db_utils import get_supabase_client
+from auth_utils import get_current_user
+from batch_writer import BatchWriter
+import repository
+
+# Cargar variables de entorno
+load_dotenv()
+
+# Fichero local donde se guardan los registros que no se pudieron enviar
+AUDIT_FALLBACK_FILE = os.getenv("AUDIT_FALLBACK_FILE", "auditoria_pendiente.jsonl")
+# Máximo de registros retenidos en memoria antes de escribir directamente al fichero
+AUDIT_MAX_QUEUE = int(os.getenv("AUDIT_MAX_QUEUE", "5000"))
+
+AUDIT_BATCH_SIZE = 100
+AUDIT_FLUSH_SECONDS = 2.0
+
+_writer = None
+_writer_lock = threading.Lock()
+_file_lock = threading.Lock()
+
+def _plain(values):
+    """Convierte registros, tipos de numpy/pandas y fechas a valores serializables en JSON"""
+    if values is None:
+        return None
+
+    # Registros del repositorio (NamedTuple) o diccionarios
+    if hasattr(values, '_asdict'):
+        values = values._asdict()
+
+    result = {}
+    for key, value in dict(values).items():
+        if hasattr(value, 'item'):
+            value = value.item()
+        elif hasattr(value, 'isoformat'):
+            value = value.isoformat()
+        result[key] = value
+    return result
+
+def _insert_batch(batch):
+    repository.insert_audit_entries(get_supabase_client(), batch)
+
+def _append_to_file(batch):
+    """Guarda los registros en el fichero local (solo se añade, nunca se reescribe)"""
+    with _file_lock:
+        with open(AUDIT_FALLBACK_FILE, 'a', encoding='utf-8') as f:
+            for entry in batch:
+                f.write(json.dumps(entry, ensure_ascii=False, default=str) + '\n')
+
+def get_audit_writer():
+    """Cola de auditoría del proceso; se crea la primera vez y se vacía al cerrar"""
+    global _writer
+
+    with _writer_lock:
+        if _writer is None:
+            _writer = BatchWriter(
+                _insert_batch,
+                batch_size=AUDIT_BATCH_SIZE,
+                flush_interval=AUDIT_FLUSH_SECONDS,
+                max_queue=AUDIT_MAX_QUEUE,
+                max_retries=3,
+                on_failure=_append_to_file,
+                name="audit-writer"
+            )
+        return _writer
+
+# Valor por defecto de record_change: leer el usuario de la sesión actual
+_SESSION_USER = object()
+
+def record_change(tabla, accion, registro_id, antes=None, despues=None, user=_SESSION_USER):
+    """Registra un cambio sin bloquear la escritura que lo origina.
+
+    Sin user debe llamarse desde el hilo de la página para poder leer el usuario de
+    la sesión; desde otros hilos se pasa el usuario capturado en la página (o None).
+    """
+    if user is _SESSION_USER:
+        user = get_current_user()
+
+    entry = {
+        'usuario_id': user['id'] if user else None,
+        'usuario': user['username'] if user else None,
+        'tabla': tabla,
+        'accion': accion,
+        'registro_id': str(registro_id) if registro_id is not None else None,
+        'antes': _plain(antes),
+        'despues': _plain(despues),
+        'fecha_cambio': datetime.now(timezone.utc).isoformat()
+    }
+
+    # Si la cola está llena el registro va directo al fichero para no perderlo
+    if not get_audit_writer().submit(entry):
+        _append_to_file([entry])
@@ -1,41 +1,50 @@
 import streamlit as st
 import jwt
-from datetime import datetime, timedelta
+import time
+import uuid
+from datetime import datetime
 from db_utils import get_supabase_client
+from session_store import session_store, TOKEN_EXPIRY_DAYS
+import repository
 
 # Clave secreta para firmar el token JWT
 SECRET_KEY = "tu_clave_secreta_aqui_cambiala_en_produccion"
-TOKEN_EXPIRY_DAYS = 7  # El token durará 7 días
+
+def _session_user(payload):
+    """Datos de sesión a partir de los claims verificados del token"""
+    return {
+        'id': payload['user_id'],
+        'username': payload['username'],
+        'email': payload.get('email'),  # Usar get para manejar tokens antiguos
+        'role': payload['role']
+    }
 
 def login(email, password):
     """Maneja el proceso de login y configura la sesión"""
     supabase = get_supabase_client()
     
     # Buscar el usuario en la base de datos por email
-    response = supabase.table('usuarios').select('*').eq('email', email).execute()
+    user = repository.get_user_credentials(supabase, email)
     
-    if response.data and len(response.data) > 0:
-        user = response.data[0]
-        
+    if user:
         # Verificar contraseña
-        if user['password'] == password:
+        if user.password == password:
             # Crear token JWT
-            expiry = datetime.utcnow() + timedelta(days=TOKEN_EXPIRY_DAYS)
-            token = jwt.encode({
-                'user_id': user['id'],
-                'username': user['username'],
-                'email': user['email'],
-                'role': user['role'],
+            expiry = int(time.time()) + TOKEN_EXPIRY_DAYS * 24 * 3600
+            payload = {
+                'jti': uuid.uuid4().hex,
+                'user_id': user.id,
+                'username': user.username,
+                'email': user.email,
+                'role': user.role,
                 'exp': expiry
-            }, SECRET_KEY, algorithm="HS256")
-            
-            # Guardar token en cookie y en session_state
-            st.session_state.user = {
-                'id': user['id'],
-                'username': user['username'],
-                'email': user['email'],
-                'role': user['role']
             }
+            token = jwt.encode(payload, SECRET_KEY, algorithm="HS256")
+            
+            # Guardar la sesión en el almacén del proceso y en session_state
+            st.session_state.user = _session_user(payload)
+            st.session_state.token_jti = payload['jti']
+            session_store.put(payload['jti'], dict(st.session_state.user), expiry)
             
             # Establecer token en query params
             st.query_params.update({"token": token})
@@ -49,17 +58,11 @@ def reset_password(email, new_password):
     supabase = get_supabase_client()
     
     # Verificar que el usuario existe
-    response = supabase.table('usuarios').select('*').eq('email', email).execute()
+    user_id = repository.get_user_id(supabase, email)
     
-    if response.data and len(response.data) > 0:
-        user = response.data[0]
-        
+    if user_id:
         # Actualizar la contraseña
-        update_response = supabase.table('usuarios').update(
-            {'password': new_password, 'updated_at': datetime.now().isoformat()}
-        ).eq('id', user['id']).execute()
-        
-        if update_response.data:
+        if repository.update_user_password(supabase, user_id, new_password, datetime.now().isoformat()):
             return True
     
     return False
@@ -69,31 +72,52 @@ def logout():
     if 'user' in st.session_state:
         del st.session_state.user
     
+    # Revocar la sesión para que el token deje de ser válido en otras pestañas
+    if 'token_jti' in st.session_state:
+        session_store.revoke(st.session_state.token_jti)
+        del st.session_state.token_jti
+    
     # Limpiar parámetros de consulta para eliminar el token
     st.query_params.clear()
     st.rerun()
 
 def get_current_user():
     """Obtiene el usuario actual desde la sesión o token"""
-    # Primero intentar desde session_state
+    # Primero intentar desde session_state (comprobando que no se haya revocado)
     if 'user' in st.session_state:
-        return st.session_state.user
+        jti = st.session_state.get('token_jti')
+        if jti is None or not session_store.is_revoked(jti):
+            return st.session_state.user
+        del st.session_state.user
+        del st.session_state.token_jti
+        st.query_params.clear()
+        return None
     
     # Si no está en session_state, intentar desde los query params
     params = st.query_params
     if "token" in params:
         token = params["token"]
         try:
-            # Verificar y decodificar el token
-            payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+            # Buscar la sesión ya verificada por su identificador de token
+            jti = jwt.decode(token, options={"verify_signature": False}).get('jti')
+            if jti is not None and not isinstance(jti, str):
+                raise jwt.InvalidTokenError("Identificador de token no válido")
+            user = session_store.get(jti) if jti else None
+            
+            if user is None:
+                if jti and session_store.is_revoked(jti):
+                    raise jwt.InvalidTokenError("Token revocado")
+                
+                # Verificar y decodificar el token
+                payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+                user = _session_user(payload)
+                if jti:
+                    session_store.put(jti, user, payload['exp'])
             
             # Si el token es válido, restaurar la sesión
-            st.session_state.user = {
-                'id': payload['user_id'],
-                'username': payload['username'],
-                'email': payload.get('email'),  # Usar get para manejar tokens antiguos
-                'role': payload['role']
-            }
+            st.session_state.user = dict(user)
+            if jti:
+                st.session_state.token_jti = jti
             return st.session_state.user
         except jwt.ExpiredSignatureError:
             # Token expirado
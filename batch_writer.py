@@ -0,0 +1,146 @@
+import atexit
+import queue
+import threading
+import time
+
+class BatchWriter:
+    """Cola de escritura diferida que envía los elementos en lotes desde un hilo propio.
+
+    flush_fn recibe una lista de elementos y debe lanzar una excepción si el envío
+    falla; el lote se reintenta con espera exponencial hasta max_retries veces y,
+    si sigue fallando, se entrega a on_failure (o se guarda en self.failed).
+    Con key_fn se descartan los elementos cuya clave ya está pendiente de envío.
+    """
+
+    def __init__(self, flush_fn, batch_size=50, flush_interval=1.0, max_queue=10000,
+                 max_retries=5, retry_delay=0.5, key_fn=None, on_failure=None, name="batch-writer"):
+        self.flush_fn = flush_fn
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.key_fn = key_fn
+        self.on_failure = on_failure
+
+        self.written = 0
+        self.failed = []
+        self.dropped = 0
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._pending_keys = set()
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._outstanding = 0
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    @property
+    def pending(self):
+        """Número de elementos encolados o en envío"""
+        with self._lock:
+            return self._outstanding
+
+    def submit(self, item):
+        """Encola un elemento sin bloquear. Devuelve False si es duplicado o la cola está llena"""
+        if self._closed:
+            return False
+
+        key = self.key_fn(item) if self.key_fn else None
+
+        with self._lock:
+            if key is not None and key in self._pending_keys:
+                return False
+            try:
+                self._queue.put_nowait(item)
+            except queue.Full:
+                self.dropped += 1
+                return False
+            if key is not None:
+                self._pending_keys.add(key)
+            self._outstanding += 1
+
+        return True
+
+    def take_failed(self):
+        """Devuelve los elementos fallidos y vacía la lista (para reintentarlos)"""
+        with self._lock:
+            failed, self.failed = self.failed, []
+        return failed
+
+    def flush(self, timeout=None):
+        """Espera a que se envíen todos los elementos encolados hasta ahora"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        with self._idle:
+            while self._outstanding > 0:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._idle.wait(remaining if remaining is not None else self.flush_interval)
+
+        return True
+
+    def close(self, timeout=10):
+        """Envía lo pendiente y detiene el hilo (se llama también al cerrar el proceso)"""
+        if self._closed:
+            return
+        self.flush(timeout)
+        self._closed = True
+        self._thread.join(timeout=self.flush_interval * 2)
+
+    def _next_batch(self):
+        try:
+            first = self._queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            return []
+
+        batch = [first]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _send(self, batch):
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.flush_fn(batch)
+                return True
+            except Exception:
+                if attempt == self.max_retries:
+                    break
+                time.sleep(self.retry_delay * (2 ** attempt))
+
+        return False
+
+    def _keep_failed(self, batch):
+        with self._lock:
+            self.failed.extend(batch)
+
+    def _run(self):
+        while not (self._closed and self._queue.empty()):
+            batch = self._next_batch()
+            if not batch:
+                continue
+
+            if self._send(batch):
+                self.written += len(batch)
+            elif self.on_failure:
+                try:
+                    self.on_failure(batch)
+                except Exception:
+                    self._keep_failed(batch)
+            else:
+                self._keep_failed(batch)
+
+            with self._idle:
+                if self.key_fn:
+                    for item in batch:
+                        self._pending_keys.discard(self.key_fn(item))
+                self._outstanding -= len(batch)
+                self._idle.notify_all()
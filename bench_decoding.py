@@ -0,0 +1,118 @@
+"""Comparativa de decodificación de lecturas masivas: JSON frente a CSV.
+
+Uso:
+    python bench_decoding.py --rows 10000 100000 1000000
+
+Genera filas sintéticas con las columnas de historial_participaciones, serializadas
+como las devolvería PostgREST en JSON y en CSV, y mide para cada tamaño el tiempo
+de decodificación y el pico de memoria de:
+
+  json: json.loads -> lista de diccionarios -> pd.DataFrame (camino anterior)
+  csv:  repository.decode_csv -> columnas con tipo (camino de lectura masiva, con
+        pyarrow si está instalado y el lector C de pandas si no)
+
+El pico de memoria es el de tracemalloc (Python y numpy); las asignaciones del pool
+de Arrow no pasan por tracemalloc y se muestran aparte al final.
+"""
+import argparse
+import csv
+import gc
+import io
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+import uuid
+from datetime import date, timedelta
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BASE_DIR)
+
+import pandas as pd
+import repository
+from repository import HISTORY_DTYPES, decode_csv
+
+TURNOS = [('Mañana', '08:00:00', '14:00:00'), ('Tarde', '14:00:00', '22:00:00'), ('Noche', '22:00:00', '08:00:00')]
+ACTIVIDADES = ['Acondicionamiento Físico', 'Defensa Personal', 'Natación', 'Tiro']
+
+def generate_rows(count, seed=0):
+    rng = random.Random(seed)
+    agentes = [str(uuid.UUID(int=rng.getrandbits(128))) for _ in range(max(1, count // 20))]
+    reservas = [str(uuid.UUID(int=rng.getrandbits(128))) for _ in range(max(1, count // 12))]
+    monitores = [f"Monitor{i} Apellido{i}" for i in range(12)]
+    start = date(2020, 1, 1)
+
+    for _ in range(count):
+        turno, inicio, fin = rng.choice(TURNOS)
+        yield {
+            'id': str(uuid.UUID(int=rng.getrandbits(128))),
+            'agente_id': rng.choice(agentes),
+            'reserva_id': rng.choice(reservas),
+            'fecha': (start + timedelta(days=rng.randrange(2000))).isoformat(),
+            'turno': turno,
+            'hora_inicio': inicio,
+            'hora_fin': fin,
+            'actividad': rng.choice(ACTIVIDADES),
+            'monitor': rng.choice(monitores),
+        }
+
+def encode(count):
+    """Devuelve el mismo resultado como texto JSON y como texto CSV"""
+    json_parts = []
+    csv_buffer = io.StringIO()
+    writer = csv.writer(csv_buffer, lineterminator='\n')
+    writer.writerow(HISTORY_DTYPES)
+
+    for row in generate_rows(count):
+        json_parts.append(json.dumps(row, ensure_ascii=False))
+        writer.writerow(row.values())
+
+    return '[' + ','.join(json_parts) + ']', csv_buffer.getvalue()
+
+def decode_json(text):
+    df = pd.DataFrame(json.loads(text))
+    df['fecha'] = pd.to_datetime(df['fecha'])
+    return df
+
+def measure(decode, text):
+    """Tiempo sin trazar la memoria y, en una segunda pasada, el pico de memoria asignada"""
+    gc.collect()
+    started = time.perf_counter()
+    df = decode(text)
+    elapsed = time.perf_counter() - started
+    frame_mb = df.memory_usage(deep=True).sum() / (1024 * 1024)
+    del df
+
+    gc.collect()
+    tracemalloc.start()
+    decode(text)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / (1024 * 1024), frame_mb
+
+def main():
+    parser = argparse.ArgumentParser(description="Comparativa de decodificación JSON frente a CSV")
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000],
+                        help="Tamaños de resultado a probar")
+    args = parser.parse_args()
+
+    print(f"Lector CSV: {'pyarrow' if repository.pa is not None else 'pandas (C)'}")
+    print(f"{'Filas':>9} {'Formato':>8} {'Bytes MB':>9} {'Tiempo s':>9} {'Pico MB':>8} {'DataFrame MB':>13}")
+
+    for count in args.rows:
+        json_text, csv_text = encode(count)
+
+        for name, decode, text in (('json', decode_json, json_text), ('csv', lambda t: decode_csv(t, HISTORY_DTYPES), csv_text)):
+            elapsed, peak_mb, frame_mb = measure(decode, text)
+            print(f"{count:>9} {name:>8} {len(text.encode('utf-8')) / (1024 * 1024):>9.1f} {elapsed:>9.2f} "
+                  f"{peak_mb:>8.0f} {frame_mb:>13.0f}")
+
+        del json_text, csv_text
+
+    if repository.pa is not None:
+        print(f"Pico del pool de Arrow: {repository.pa.default_memory_pool().max_memory() / (1024 * 1024):.0f} MB")
+
+if __name__ == "__main__":
+    main()
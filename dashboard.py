@@ -2,6 +2,9 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
 from db_utils import get_supabase_client
+from analytics import show_trend_charts
+import repository
+from deadlines import load_section, show_pending, show_stale
 
 def show_dashboard():
     st.title("Dashboard de Participación")
@@ -19,54 +22,23 @@ def show_dashboard():
         st.error("La fecha de inicio debe ser anterior a la fecha de fin")
         return
     
-    # Cargar datos sin usar la función RPC
+    # Agentes en CSV decodificado directamente en columnas con tipo
+    df, age = load_section(('Participaciones', start_date, end_date), repository.participation_totals_frame, supabase, start_date, end_date)
     
-    # 1. Obtener todos los agentes
-    agentes_response = supabase.table('agentes').select('*').execute()
-    agentes = agentes_response.data if agentes_response.data else []
+    if df is None:
+        show_pending("Participaciones por agente")
+        show_trend_charts(supabase, start_date, end_date, key_prefix="dashboard")
+        return
     
-    if not agentes:
+    if df.empty:
         st.info("No hay agentes registrados en el sistema")
         return
     
-    # 2. Para cada agente, contar participaciones
-    dashboard_data = []
-    
-    for agente in agentes:
-        # Obtener participaciones del agente
-        participaciones_response = supabase.table('participaciones').select('*').eq('agente_id', agente['id']).execute()
-        participaciones = participaciones_response.data if participaciones_response.data else []
-        
-        # Contar participaciones en el rango de fechas
-        total_participaciones = 0
-        for p in participaciones:
-            # Obtener la reserva correspondiente
-            reserva_response = supabase.table('reservas').select('*').eq('id', p['reserva_id']).execute()
-            if reserva_response.data:
-                # Convertir fecha a objeto date para comparar
-                reserva_fecha_str = reserva_response.data[0]['fecha'].split('T')[0] if 'T' in reserva_response.data[0]['fecha'] else reserva_response.data[0]['fecha']
-                reserva_fecha = datetime.strptime(reserva_fecha_str, "%Y-%m-%d").date()
-                
-                # Verificar si está en el rango
-                if start_date <= reserva_fecha <= end_date:
-                    total_participaciones += 1
-        
-        # Añadir al conjunto de datos
-        dashboard_data.append({
-            'nombre': agente['nombre'],
-            'apellidos': agente['apellidos'],
-            'nip': agente['nip'],
-            'seccion': agente['seccion'],
-            'grupo': agente['grupo'],
-            'total_participaciones': total_participaciones
-        })
-    
     # Procesar y mostrar los datos
-    if dashboard_data:
-        df = pd.DataFrame(dashboard_data)
-        
+    if not df.empty:
         # Visualización 1: Tabla de participaciones por agente
         st.subheader("Participaciones por Agente")
+        show_stale(age)
         df_display = df.copy()
         df_display['Nombre Completo'] = df_display['nombre'] + ' ' + df_display['apellidos']
         df_display = df_display[['Nombre Completo', 'nip', 'seccion', 'grupo', 'total_participaciones']]
@@ -76,13 +48,13 @@ def show_dashboard():
         
         # Visualización 2: Estadísticas por sección
         st.subheader("Participaciones por Sección")
-        seccion_df = df.groupby('seccion')['total_participaciones'].sum().reset_index()
+        seccion_df = df.groupby('seccion', observed=False)['total_participaciones'].sum().reset_index()
         seccion_df.columns = ['Sección', 'Total Participaciones']
         st.dataframe(seccion_df, use_container_width=True)
         
         # Visualización 3: Estadísticas por grupo
         st.subheader("Participaciones por Grupo")
-        grupo_df = df.groupby('grupo')['total_participaciones'].sum().reset_index()
+        grupo_df = df.groupby('grupo', observed=False)['total_participaciones'].sum().reset_index()
         grupo_df.columns = ['Grupo', 'Total Participaciones']
         st.dataframe(grupo_df, use_container_width=True)
         
@@ -104,5 +76,29 @@ def show_dashboard():
             "text/csv",
             key="download-csv-report"
         )
+        
+        # Historial detallado del rango, solo bajo demanda por su tamaño
+        if st.button("Preparar Historial Detallado"):
+            historial = repository.participation_history_frame(supabase, start_date, end_date)
+            nombres = df.set_index('agente_id')[['nombre', 'apellidos', 'nip']]
+            historial = historial.join(nombres, on='agente_id').sort_values(['fecha', 'turno'])
+            historial['fecha'] = historial['fecha'].dt.strftime('%d/%m/%Y')
+            historial = historial[['fecha', 'turno', 'actividad', 'monitor', 'nombre', 'apellidos', 'nip']]
+            historial.columns = ['Fecha', 'Turno', 'Actividad', 'Monitor', 'Nombre', 'Apellidos', 'NIP']
+            st.session_state.dashboard_history_csv = ((start_date, end_date), historial.to_csv(index=False).encode('utf-8'))
+        
+        prepared = st.session_state.get('dashboard_history_csv')
+        if prepared and prepared[0] == (start_date, end_date):
+            st.download_button(
+                "Descargar Historial Detallado (CSV)",
+                prepared[1],
+                "historial_participaciones.csv",
+                "text/csv",
+                key="download-history-csv"
+            )
+        
+        # Visualización 5: Tendencias agregadas por periodo
+        st.header("Tendencias")
+        show_trend_charts(supabase, start_date, end_date, key_prefix="dashboard")
     else:
         st.info("No hay datos de participación en el rango de fechas seleccionado")
@@ -5,8 +5,19 @@ from dotenv import load_dotenv
 # Cargar variables de entorno
 load_dotenv()
 
+# Cliente alternativo (por ejemplo, el backend simulado de las pruebas de carga)
+_client_override = None
+
+def set_supabase_client(client):
+    """Sustituye el cliente de Supabase por otro con la misma interfaz (None para restaurar)"""
+    global _client_override
+    _client_override = client
+
 def get_supabase_client():
     """Obtener el cliente de Supabase"""
+    if _client_override is not None:
+        return _client_override
+    
     supabase_url = os.getenv("SUPABASE_URL")
     supabase_key = os.getenv("SUPABASE_KEY")
     
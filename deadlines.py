@@ -0,0 +1,232 @@
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+import pandas as pd
+import streamlit as st
+from dotenv import load_dotenv
+
+# Cargar variables de entorno
+load_dotenv()
+
+# Presupuesto de latencia (segundos) de cada página; el resto usa el valor por defecto
+DEFAULT_PAGE_BUDGET = float(os.getenv("PAGE_BUDGET_SECONDS", "2.0"))
+PAGE_BUDGETS = {
+    "Dashboard": 3.0,
+    "Análisis": 3.0,
+    "Reservas": 2.0,
+    "Agentes": 2.0,
+    "Kiosko": 1.0,
+}
+
+# Resultados anteriores que se conservan para mostrarlos si una sección no llega a tiempo
+STALE_MAX_ENTRIES = 256
+# Desbordamientos recientes que se guardan para el informe
+OVERRUN_LOG_SIZE = 200
+
+_current = ContextVar('page_deadline', default=None)
+
+# Hilos compartidos en los que se ejecutan las consultas con plazo. Nunca hay más consultas
+# en curso que hilos: si todos están ocupados (backend lento) la sección usa su último
+# resultado en lugar de encolarse detrás de consultas que ya han perdido su plazo
+LOADER_WORKERS = 8
+_executor = ThreadPoolExecutor(max_workers=LOADER_WORKERS, thread_name_prefix="deadline")
+
+class PageDeadline:
+    """Plazo de una ejecución de página: las consultas heredan el tiempo que queda"""
+
+    def __init__(self, page, budget):
+        self.page = page
+        self.budget = budget
+        self.started = time.monotonic()
+        self.missed = []
+        # Consultas lanzadas por adelantado con start_sections, por clave
+        self.loads = {}
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def remaining(self):
+        return max(0.0, self.budget - self.elapsed())
+
+class BudgetLog:
+    """Estadísticas por página de duración y desbordamientos del presupuesto"""
+
+    def __init__(self, size=OVERRUN_LOG_SIZE):
+        self._lock = threading.Lock()
+        self._pages = {}
+        self._recent = deque(maxlen=size)
+
+    def record(self, deadline):
+        elapsed_ms = deadline.elapsed() * 1000
+        overrun = elapsed_ms > deadline.budget * 1000
+
+        with self._lock:
+            stats = self._pages.setdefault(deadline.page, {'renders': 0, 'overruns': 0, 'missed': 0, 'max_ms': 0.0})
+            stats['budget_ms'] = deadline.budget * 1000
+            stats['renders'] += 1
+            stats['overruns'] += overrun
+            stats['missed'] += len(deadline.missed)
+            stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+
+            if overrun or deadline.missed:
+                self._recent.append({
+                    'Hora': datetime.now().strftime('%H:%M:%S'),
+                    'Página': deadline.page,
+                    'Duración (ms)': round(elapsed_ms),
+                    'Presupuesto (ms)': round(deadline.budget * 1000),
+                    'Secciones fuera de plazo': ', '.join(deadline.missed)
+                })
+
+    def summary(self):
+        with self._lock:
+            rows = [
+                {'Página': page, 'Ejecuciones': s['renders'], 'Desbordamientos': s['overruns'],
+                 'Secciones fuera de plazo': s['missed'], 'Máximo (ms)': round(s['max_ms']),
+                 'Presupuesto (ms)': round(s['budget_ms'])}
+                for page, s in self._pages.items()
+            ]
+            return pd.DataFrame(rows), pd.DataFrame(list(reversed(self._recent)))
+
+class StaleResults:
+    """Últimos resultados de cada sección y consultas que siguen en curso tras su plazo"""
+
+    def __init__(self, max_entries=STALE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._results = OrderedDict()
+        self._in_flight = {}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._results.get(key)
+            if entry is not None:
+                self._results.move_to_end(key)
+            return entry
+
+    def store(self, key, value):
+        with self._lock:
+            self._results[key] = (time.time(), value)
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+
+    def submit(self, key, loader, args):
+        """Lanza la consulta o reutiliza la que ya está en curso para la misma sección.
+
+        Devuelve None si ya hay tantas consultas en curso como hilos.
+        """
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                return future
+            if len(self._in_flight) >= LOADER_WORKERS:
+                return None
+
+            future = _executor.submit(loader, *args)
+            self._in_flight[key] = future
+
+        def done(finished):
+            with self._lock:
+                self._in_flight.pop(key, None)
+            if finished.exception() is None:
+                self.store(key, finished.result())
+
+        future.add_done_callback(done)
+        return future
+
+# Compartidos por todas las sesiones del proceso
+budget_log = BudgetLog()
+stale_results = StaleResults()
+
+@contextmanager
+def page_deadline(page, budget=None):
+    """Abre el plazo de la página y registra su duración al terminar"""
+    deadline = PageDeadline(page, budget if budget is not None else PAGE_BUDGETS.get(page, DEFAULT_PAGE_BUDGET))
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+        budget_log.record(deadline)
+
+def start_sections(*sections):
+    """Lanza sin esperar las consultas (key, loader, args) de todas las pestañas de la página.
+
+    Streamlit dibuja todas las pestañas en cada rerun, una detrás de otra: si cada una
+    lanzara sus consultas al llegar a ella, una pestaña lenta gastaría el plazo de las
+    siguientes. Lanzadas al principio, todas esperan a la vez y load_sections las recoge
+    por su clave. Fuera de una página con plazo no hace nada.
+    """
+    deadline = _current.get()
+    if deadline is None:
+        return
+
+    for key, loader, args in sections:
+        if deadline.loads.get(key) is None:
+            deadline.loads[key] = stale_results.submit(key, loader, args)
+
+def load_sections(*sections):
+    """Ejecuta varias consultas (key, loader, args) en paralelo con el tiempo que le queda a la página.
+
+    Devuelve una lista de (datos, antigüedad en segundos). Una consulta que no termina
+    a tiempo devuelve el último resultado conocido de su sección (o None si no lo hay)
+    y sigue en segundo plano para que el siguiente rerun la encuentre hecha; si no
+    quedan hilos libres ni siquiera se lanza y se usa también el último resultado.
+    Fuera de una página con plazo se comporta como llamadas normales.
+    """
+    deadline = _current.get()
+    if deadline is None:
+        return [(loader(*args), 0) for _, loader, args in sections]
+
+    futures = [(key, deadline.loads.get(key) or stale_results.submit(key, loader, args))
+               for key, loader, args in sections]
+    results = []
+
+    for key, future in futures:
+        if future is not None:
+            try:
+                results.append((future.result(timeout=deadline.remaining()), 0))
+                continue
+            except FutureTimeoutError:
+                pass
+        deadline.missed.append(key[0] if isinstance(key, tuple) else str(key))
+
+        previous = stale_results.get(key)
+        if previous is None:
+            results.append((None, None))
+        else:
+            loaded_at, value = previous
+            results.append((value, time.time() - loaded_at))
+
+    return results
+
+def load_section(key, loader, *args):
+    """Una sola consulta con el plazo de la página; ver load_sections"""
+    return load_sections((key, loader, args))[0]
+
+def show_pending(label):
+    """Marcador de una sección que no ha llegado a tiempo y no tiene datos anteriores"""
+    st.info(f"{label}: cargando... La consulta está tardando más de lo previsto.")
+    if st.button("Actualizar", key=f"pending_{label}"):
+        st.rerun()
+
+def show_stale(age):
+    """Aviso de que la sección muestra datos anteriores mientras se actualizan"""
+    if age:
+        st.caption(f"Mostrando datos de hace {age:.0f} s; se están actualizando.")
+
+def show_budget_report():
+    """Informe de presupuestos de latencia por página (para ajustar PAGE_BUDGETS)"""
+    summary, recent = budget_log.summary()
+    with st.expander("Presupuestos de latencia"):
+        if summary.empty:
+            st.caption("Sin datos todavía")
+            return
+        st.dataframe(summary, use_container_width=True, hide_index=True)
+        if not recent.empty:
+            st.dataframe(recent, use_container_width=True, hide_index=True)
@@ -0,0 +1,578 @@
+"""Backend en memoria con la interfaz del cliente de Supabase usada por la aplicación.
+
+Sirve para ejecutar la aplicación sin red (pruebas de carga, desarrollo local).
+Cada consulta espera una latencia configurable para simular el viaje de ida y
+vuelta a Supabase. Solo implementa las operaciones que usa la aplicación.
+"""
+import csv
+import io
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+
+# Relaciones usadas en los select embebidos: (tabla, tabla relacionada) -> (columna local, columna remota, cardinalidad)
+RELATIONS = {
+    ('reservas', 'turnos'): ('turno_id', 'id', 'one'),
+    ('reservas', 'actividades'): ('actividad_id', 'id', 'one'),
+    ('reservas', 'agentes'): ('monitor_id', 'id', 'one'),
+    ('reservas', 'participaciones'): ('id', 'reserva_id', 'many'),
+    ('reservas', 'lista_espera'): ('id', 'reserva_id', 'many'),
+    ('participaciones', 'agentes'): ('agente_id', 'id', 'one'),
+    ('participaciones', 'reservas'): ('reserva_id', 'id', 'one'),
+    ('reservas_archivo', 'turnos'): ('turno_id', 'id', 'one'),
+    ('reservas_archivo', 'actividades'): ('actividad_id', 'id', 'one'),
+    ('reservas_archivo', 'agentes'): ('monitor_id', 'id', 'one'),
+    ('reservas_archivo', 'participaciones_archivo'): ('id', 'reserva_id', 'many'),
+}
+
+# Restricciones UNIQUE de init_db.sql
+UNIQUE_KEYS = {
+    'agentes': [('nip',), ('email',)],
+    'actividades': [('nombre',)],
+    'reservas': [('fecha', 'turno_id')],
+    'participaciones': [('reserva_id', 'agente_id')],
+    'lista_espera': [('reserva_id', 'agente_id')],
+    'usuarios': [('email',)],
+}
+
+class FakeBackendError(Exception):
+    pass
+
+class FakeResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    return value
+
+def _to_csv(rows, columns):
+    """Texto CSV como el que devuelve PostgREST con Accept: text/csv"""
+    header = list(rows[0]) if rows else [c for c in _split_columns(columns) if c != '*']
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(header)
+    for row in rows:
+        writer.writerow([_csv_value(row.get(c)) for c in header])
+    return buffer.getvalue()
+
+def _split_columns(columns):
+    """Divide un select de PostgREST por comas de primer nivel"""
+    parts, depth, current = [], 0, ''
+    for char in columns:
+        if char == ',' and depth == 0:
+            parts.append(current.strip())
+            current = ''
+            continue
+        depth += char == '('
+        depth -= char == ')'
+        current += char
+    if current.strip():
+        parts.append(current.strip())
+    return parts
+
+# Operadores de los filtros lógicos de PostgREST (or=(...), and(...))
+OPERATORS = {
+    'eq': lambda v, x: v == x,
+    'neq': lambda v, x: v != x,
+    'gt': lambda v, x: v is not None and v > x,
+    'gte': lambda v, x: v is not None and v >= x,
+    'lt': lambda v, x: v is not None and v < x,
+    'lte': lambda v, x: v is not None and v <= x,
+    'in': lambda v, x: v in x,
+}
+
+def _list_value(value):
+    """Valores de un filtro in.(a,"b c",...) de PostgREST"""
+    reader = csv.reader([value[1:-1]], quotechar='"', escapechar='\\', skipinitialspace=True)
+    return set(next(reader, []))
+
+def _logic_test(expression, combine=any):
+    """Convierte "a.eq.1,and(b.lt.2,c.eq.3)" en una función sobre la fila completa"""
+    tests = []
+    for part in _split_columns(expression):
+        if part.startswith(('and(', 'or(')):
+            name, inner = part[:-1].split('(', 1)
+            tests.append(_logic_test(inner, all if name == 'and' else any))
+        else:
+            column, operator, value = part.split('.', 2)
+            if operator == 'in':
+                value = _list_value(value)
+            tests.append(lambda row, c=column, o=OPERATORS[operator], x=value: o(row.get(c), x))
+    return lambda row: combine(test(row) for test in tests)
+
+class FakeQuery:
+    def __init__(self, backend, table):
+        self._backend = backend
+        self._table = table
+        self._operation = 'select'
+        self._columns = '*'
+        self._filters = []
+        self._order = []
+        self._limit = None
+        self._offset = 0
+        self._payload = None
+        self._on_conflict = None
+        self._ignore_duplicates = False
+        self._csv = False
+
+    # --- Operaciones ---
+    def select(self, columns='*', **kwargs):
+        self._columns = columns
+        return self
+
+    def insert(self, payload, **kwargs):
+        self._operation, self._payload = 'insert', payload
+        return self
+
+    def upsert(self, payload, on_conflict='', ignore_duplicates=False, **kwargs):
+        self._operation, self._payload = 'upsert', payload
+        self._on_conflict = tuple(c.strip() for c in on_conflict.split(',')) if on_conflict else None
+        self._ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, payload, **kwargs):
+        self._operation, self._payload = 'update', payload
+        return self
+
+    def delete(self, **kwargs):
+        self._operation = 'delete'
+        return self
+
+    # --- Filtros ---
+    def _filter(self, column, test):
+        self._filters.append((column, test))
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, lambda v: v == value)
+
+    def neq(self, column, value):
+        return self._filter(column, lambda v: v != value)
+
+    def gt(self, column, value):
+        return self._filter(column, lambda v: v is not None and v > value)
+
+    def gte(self, column, value):
+        return self._filter(column, lambda v: v is not None and v >= value)
+
+    def lt(self, column, value):
+        return self._filter(column, lambda v: v is not None and v < value)
+
+    def lte(self, column, value):
+        return self._filter(column, lambda v: v is not None and v <= value)
+
+    def or_(self, filters, **kwargs):
+        # Filtro sobre la fila completa (columna None)
+        return self._filter(None, _logic_test(filters))
+
+    def in_(self, column, values):
+        values = set(values)
+        return self._filter(column, lambda v: v in values)
+
+    def is_(self, column, value):
+        expected = None if value in (None, 'null') else value
+        return self._filter(column, lambda v: v is expected or v == expected)
+
+    def order(self, column, desc=False, **kwargs):
+        self._order.append((column, desc))
+        return self
+
+    def limit(self, count, **kwargs):
+        self._limit = count
+        return self
+
+    def range(self, start, end, **kwargs):
+        self._offset, self._limit = start, end - start + 1
+        return self
+
+    def csv(self):
+        self._csv = True
+        return self
+
+    # --- Ejecución ---
+    def _matches(self, row):
+        return all(test(row if column is None else row.get(column)) for column, test in self._filters)
+
+    def execute(self):
+        self._backend.wait()
+        with self._backend.lock:
+            return getattr(self, f'_execute_{self._operation}')()
+
+    def _execute_select(self):
+        rows = [r for r in self._backend.rows(self._table) if self._matches(r)]
+        for column, desc in reversed(self._order):
+            rows.sort(key=lambda r: (r.get(column) is None, r.get(column)), reverse=desc)
+        rows = rows[self._offset:]
+        if self._limit is not None:
+            rows = rows[:self._limit]
+        rows = [self._backend.project(self._table, r, self._columns) for r in rows]
+        return FakeResponse(_to_csv(rows, self._columns) if self._csv else rows)
+
+    def _execute_insert(self, upsert=False):
+        payload = self._payload if isinstance(self._payload, list) else [self._payload]
+        inserted = []
+        for values in payload:
+            row = {'id': str(uuid.uuid4()), 'created_at': _now(), 'updated_at': _now(), **values}
+            existing = self._backend.find_conflict(self._table, row, self._on_conflict if upsert else None)
+            if existing is not None:
+                if upsert and self._ignore_duplicates:
+                    continue
+                if upsert:
+                    existing.update(values)
+                    existing['updated_at'] = _now()
+                    inserted.append(dict(existing))
+                    continue
+                raise FakeBackendError(f"duplicate key value violates unique constraint on {self._table}")
+            self._backend.before_insert(self._table, row)
+            self._backend.tables.setdefault(self._table, []).append(row)
+            inserted.append(dict(row))
+        self._backend.touch(self._table)
+        return FakeResponse(inserted)
+
+    def _execute_upsert(self):
+        return self._execute_insert(upsert=True)
+
+    def _execute_update(self):
+        updated = []
+        for row in self._backend.tables.get(self._table, []):
+            if self._matches(row):
+                row.update(self._payload)
+                row['updated_at'] = _now()
+                updated.append(dict(row))
+        if self._table == 'reservas' and 'capacidad' in self._payload:
+            self._backend.promote_waitlist({r['id'] for r in updated})
+        self._backend.touch(self._table)
+        return FakeResponse(updated)
+
+    def _execute_delete(self):
+        rows = self._backend.tables.get(self._table, [])
+        deleted = [dict(r) for r in rows if self._matches(r)]
+        self._backend.tables[self._table] = [r for r in rows if not self._matches(r)]
+        if self._table == 'participaciones':
+            self._backend.promote_waitlist({r['reserva_id'] for r in deleted})
+        self._backend.touch(self._table)
+        return FakeResponse(deleted)
+
+class FakeRpc:
+    def __init__(self, backend, name, params):
+        self._backend = backend
+        self._function = getattr(backend, f'rpc_{name}')
+        self._params = params
+
+    def execute(self):
+        self._backend.wait()
+        with self._backend.lock:
+            return FakeResponse(self._function(**self._params))
+
+class FakeSupabase:
+    """Cliente simulado: table(), rpc() y una latencia por consulta (segundos, con jitter)"""
+
+    def __init__(self, latency=0.0, jitter=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.tables = {}
+        self.lock = threading.RLock()
+        self.queries = 0
+        self._random = random.Random(seed)
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def rpc(self, name, params=None):
+        return FakeRpc(self, name, params or {})
+
+    def wait(self):
+        with self.lock:
+            self.queries += 1
+            delay = self.latency + self._random.uniform(0, self.jitter) if self.jitter else self.latency
+        if delay > 0:
+            time.sleep(delay)
+
+    # --- Utilidades internas ---
+    def rows(self, table):
+        if table == 'historial_participaciones':
+            return self._history_view('reservas', 'participaciones')
+        if table == 'historial_participaciones_archivo':
+            return self._history_view('reservas_archivo', 'participaciones_archivo')
+        return self.tables.get(table, [])
+
+    def touch(self, table):
+        for version in self.tables.get('versiones_datos', []):
+            if version['tabla'] == table:
+                version['updated_at'] = _now()
+
+    def find_conflict(self, table, row, on_conflict=None):
+        keys = [on_conflict] if on_conflict else UNIQUE_KEYS.get(table, [])
+        for existing in self.tables.get(table, []):
+            if existing['id'] == row['id']:
+                return existing
+            for key in keys:
+                if all(row.get(c) is not None and existing.get(c) == row.get(c) for c in key):
+                    return existing
+        return None
+
+    def _by_id(self, table):
+        return {r['id']: r for r in self.tables.get(table, [])}
+
+    def project(self, table, row, columns):
+        result = {}
+        for part in _split_columns(columns):
+            if part == '*':
+                result.update(row)
+            elif '(' in part:
+                name, inner = part[:-1].split('(', 1)
+                alias, _, related = name.partition(':')
+                related = related or alias
+                local, remote, cardinality = RELATIONS[(table, related.strip())]
+                matches = [r for r in self.tables.get(related.strip(), []) if r.get(remote) == row.get(local)]
+                if cardinality == 'many':
+                    if inner.strip() == 'count':
+                        result[alias.strip()] = [{'count': len(matches)}]
+                    else:
+                        result[alias.strip()] = [self.project(related.strip(), m, inner) for m in matches]
+                else:
+                    result[alias.strip()] = self.project(related.strip(), matches[0], inner) if matches else None
+            else:
+                alias, _, column = part.partition(':')
+                column = column or alias
+                result[alias.strip()] = row.get(column.strip())
+        return result
+
+    def _history_view(self, reservas_table, participaciones_table):
+        reservas = self._by_id(reservas_table)
+        turnos = self._by_id('turnos')
+        actividades = self._by_id('actividades')
+        agentes = self._by_id('agentes')
+        rows = []
+        for p in self.tables.get(participaciones_table, []):
+            r = reservas.get(p['reserva_id'])
+            if not r:
+                continue
+            t = turnos.get(r['turno_id'], {})
+            m = agentes.get(r['monitor_id'])
+            rows.append({
+                'id': p['id'], 'agente_id': p['agente_id'], 'reserva_id': r['id'], 'fecha': r['fecha'],
+                'turno': t.get('nombre'), 'hora_inicio': t.get('hora_inicio'), 'hora_fin': t.get('hora_fin'),
+                'actividad': actividades.get(r['actividad_id'], {}).get('nombre'),
+                'monitor': f"{m['nombre']} {m['apellidos']}" if m else None
+            })
+        return rows
+
+    def _reservations_in_range(self, fecha_inicio, fecha_fin):
+        # Tablas activas y archivo, como reservas_en_rango
+        for table in ('reservas', 'reservas_archivo'):
+            for r in self.tables.get(table, []):
+                if fecha_inicio <= r['fecha'] <= fecha_fin:
+                    yield r
+
+    def _participations_in_range(self, fecha_inicio, fecha_fin):
+        reservas = {r['id']: r for r in self._reservations_in_range(fecha_inicio, fecha_fin)}
+        for table in ('participaciones', 'participaciones_archivo'):
+            for p in self.tables.get(table, []):
+                r = reservas.get(p['reserva_id'])
+                if r:
+                    yield p, r
+
+    # --- Aforo y lista de espera (triggers de init_db.sql) ---
+    def _enrolled(self, reserva_id):
+        return sum(1 for p in self.tables.get('participaciones', []) if p['reserva_id'] == reserva_id)
+
+    def _full(self, reserva_id):
+        capacidad = self._by_id('reservas').get(reserva_id, {}).get('capacidad')
+        return capacidad is not None and self._enrolled(reserva_id) >= capacidad
+
+    def before_insert(self, table, row):
+        if table == 'reservas' and row.get('capacidad') is None:
+            row['capacidad'] = self._by_id('actividades').get(row['actividad_id'], {}).get('capacidad')
+        if table == 'participaciones' and self._full(row['reserva_id']):
+            raise FakeBackendError('new row for relation "reservas" violates check constraint "reservas_aforo"')
+
+    def promote_waitlist(self, reserva_ids):
+        promoted = []
+        for reserva_id in reserva_ids:
+            queue = sorted((e for e in self.tables.get('lista_espera', []) if e['reserva_id'] == reserva_id),
+                           key=lambda e: (e['created_at'], e['id']))
+            for entry in queue:
+                if self._full(reserva_id):
+                    break
+                self.tables['lista_espera'].remove(entry)
+                participacion = {'id': str(uuid.uuid4()), 'reserva_id': reserva_id, 'agente_id': entry['agente_id'],
+                                 'created_at': _now(), 'updated_at': _now()}
+                self.tables.setdefault('participaciones', []).append(participacion)
+                promoted.append(participacion)
+        return promoted
+
+    # --- Funciones SQL de init_db.sql ---
+    def rpc_inscribir_agente(self, p_reserva_id, p_agente_id):
+        existing = next((p for p in self.tables.get('participaciones', [])
+                         if p['reserva_id'] == p_reserva_id and p['agente_id'] == p_agente_id), None)
+        if existing:
+            return [{'estado': 'ya_inscrito', 'id': existing['id']}]
+
+        if self._full(p_reserva_id):
+            espera = self.tables.setdefault('lista_espera', [])
+            entry = next((e for e in espera if e['reserva_id'] == p_reserva_id and e['agente_id'] == p_agente_id), None)
+            if entry is None:
+                entry = {'id': str(uuid.uuid4()), 'reserva_id': p_reserva_id, 'agente_id': p_agente_id, 'created_at': _now()}
+                espera.append(entry)
+            return [{'estado': 'en_espera', 'id': entry['id']}]
+
+        participacion = {'id': str(uuid.uuid4()), 'reserva_id': p_reserva_id, 'agente_id': p_agente_id,
+                         'created_at': _now(), 'updated_at': _now()}
+        self.tables.setdefault('participaciones', []).append(participacion)
+        self.tables['lista_espera'] = [e for e in self.tables.get('lista_espera', [])
+                                       if not (e['reserva_id'] == p_reserva_id and e['agente_id'] == p_agente_id)]
+        self.touch('participaciones')
+        return [{'estado': 'inscrito', 'id': participacion['id']}]
+
+    def rpc_inscribir_agentes(self, filas):
+        results = []
+        for reserva_id, agente_id in sorted({(f['reserva_id'], f['agente_id']) for f in filas}):
+            for r in self.rpc_inscribir_agente(reserva_id, agente_id):
+                results.append({'reserva_id': reserva_id, 'agente_id': agente_id, **r})
+        return results
+
+    def rpc_retirar_participacion(self, p_participacion_id):
+        participaciones = self.tables.get('participaciones', [])
+        retirada = next((p for p in participaciones if p['id'] == p_participacion_id), None)
+        if retirada is None:
+            return []
+
+        participaciones.remove(retirada)
+        promoted = self.promote_waitlist({retirada['reserva_id']})
+        self.touch('participaciones')
+        return [{'id': retirada['id'], 'agente_id': retirada['agente_id'], 'estado': 'retirada'}] + [
+            {'id': p['id'], 'agente_id': p['agente_id'], 'estado': 'promovida'} for p in promoted
+        ]
+
+    def rpc_cambiar_aforo(self, p_reserva_id, p_capacidad):
+        reserva = self._by_id('reservas').get(p_reserva_id)
+        if reserva is None:
+            return []
+        if p_capacidad is not None and self._enrolled(p_reserva_id) > p_capacidad:
+            raise FakeBackendError('new row for relation "reservas" violates check constraint "reservas_aforo"')
+
+        reserva['capacidad'] = p_capacidad
+        promoted = self.promote_waitlist({p_reserva_id})
+        self.touch('reservas')
+        self.touch('participaciones')
+        return [{'id': p_reserva_id, 'agente_id': None, 'estado': 'actualizada'}] + [
+            {'id': p['id'], 'agente_id': p['agente_id'], 'estado': 'promovida'} for p in promoted
+        ]
+
+    def rpc_agentes_por_nip_o_email(self, p_nips, p_emails):
+        nips, emails = set(p_nips), set(p_emails)
+        return [{'id': a['id'], 'nip': a['nip'], 'email': a.get('email')} for a in self.tables.get('agentes', [])
+                if a['nip'] in nips or (a.get('email') or '').lower() in emails]
+
+    def rpc_totales_participacion(self, fecha_inicio, fecha_fin):
+        totals = Counter(p['agente_id'] for p, _ in self._participations_in_range(fecha_inicio, fecha_fin))
+        return [{'agente_id': agente_id, 'total': total} for agente_id, total in totals.items()]
+
+    def rpc_participaciones_por_periodo(self, fecha_inicio, fecha_fin, intervalo):
+        agentes = self._by_id('agentes')
+        totals = Counter()
+        for p, r in self._participations_in_range(fecha_inicio, fecha_fin):
+            agente = agentes.get(p['agente_id'], {})
+            totals[(_truncate(r['fecha'], intervalo), agente.get('seccion'), agente.get('grupo'))] += 1
+        return [{'periodo': k[0], 'seccion': k[1], 'grupo': k[2], 'total': v} for k, v in totals.items()]
+
+    def rpc_reservas_por_periodo(self, fecha_inicio, fecha_fin, intervalo):
+        participantes = Counter(p['reserva_id'] for p, _ in self._participations_in_range(fecha_inicio, fecha_fin))
+        reservas, asistentes = Counter(), Counter()
+        for r in self._reservations_in_range(fecha_inicio, fecha_fin):
+            key = (_truncate(r['fecha'], intervalo), r['actividad_id'], r['monitor_id'])
+            reservas[key] += 1
+            asistentes[key] += participantes[r['id']]
+        return [
+            {'periodo': k[0], 'actividad_id': k[1], 'monitor_id': k[2], 'reservas': v, 'participantes': asistentes[k]}
+            for k, v in reservas.items()
+        ]
+
+    def rpc_archivar_hasta(self, fecha_limite):
+        estado = self.tables.setdefault('archivo_estado', [{'id': 1, 'archivado_hasta': None}])[0]
+        reservas = [r for r in self.tables.get('reservas', []) if r['fecha'] < fecha_limite]
+        ids = {r['id'] for r in reservas}
+        participaciones = [p for p in self.tables.get('participaciones', []) if p['reserva_id'] in ids]
+
+        self.tables.setdefault('reservas_archivo', []).extend(reservas)
+        self.tables.setdefault('participaciones_archivo', []).extend(participaciones)
+        self.tables['reservas'] = [r for r in self.tables['reservas'] if r['id'] not in ids]
+        self.tables['participaciones'] = [p for p in self.tables.get('participaciones', []) if p['reserva_id'] not in ids]
+        self.tables['lista_espera'] = [e for e in self.tables.get('lista_espera', []) if e['reserva_id'] not in ids]
+        estado['archivado_hasta'] = max(filter(None, [estado['archivado_hasta'], fecha_limite]))
+        return [{'reservas': len(reservas), 'participaciones': len(participaciones)}]
+
+def _truncate(fecha, intervalo):
+    day = date.fromisoformat(fecha[:10])
+    if intervalo == 'week':
+        day -= timedelta(days=day.weekday())
+    elif intervalo == 'month':
+        day = day.replace(day=1)
+    elif intervalo == 'quarter':
+        day = day.replace(month=(day.month - 1) // 3 * 3 + 1, day=1)
+    elif intervalo == 'year':
+        day = day.replace(month=1, day=1)
+    return day.isoformat()
+
+SECCIONES = ['Motorista', 'Patrullas', 'GOA', 'Atestados']
+GRUPOS = ['G-1', 'G-2', 'G-3']
+
+def seed_backend(backend, agents=300, monitors=12, days_back=60, days_forward=30,
+                 participants_per_reservation=12, seed=0):
+    """Rellena el backend con datos parecidos a los reales y un usuario admin@test / admin"""
+    rnd = random.Random(seed)
+    tables = backend.tables
+
+    tables['usuarios'] = [{'id': str(uuid.uuid4()), 'username': 'admin', 'email': 'admin@test',
+                           'password': 'admin', 'role': 'admin', 'updated_at': _now()}]
+    tables['turnos'] = [
+        {'id': str(uuid.uuid4()), 'nombre': nombre, 'hora_inicio': inicio, 'hora_fin': fin}
+        for nombre, inicio, fin in [('Mañana', '08:00:00', '14:00:00'), ('Tarde', '14:00:00', '22:00:00'),
+                                    ('Noche', '22:00:00', '08:00:00')]
+    ]
+    tables['actividades'] = [
+        {'id': str(uuid.uuid4()), 'nombre': nombre, 'descripcion': None, 'capacidad': capacidad}
+        for nombre, capacidad in [('Defensa Personal', participants_per_reservation + 2), ('Acondicionamiento Físico', None),
+                                  ('Tiro', participants_per_reservation + 2), ('Natación', None)]
+    ]
+    tables['agentes'] = [
+        {'id': str(uuid.uuid4()), 'nombre': f"Agente{i}", 'apellidos': f"Apellido{i}", 'nip': f"{100000 + i}",
+         'seccion': rnd.choice(SECCIONES), 'grupo': rnd.choice(GRUPOS), 'email': f"agente{i}@test",
+         'telefono': None, 'es_monitor': i < monitors, 'created_at': _now(), 'updated_at': _now()}
+        for i in range(agents)
+    ]
+    tables['versiones_datos'] = [
+        {'tabla': t, 'updated_at': _now()} for t in ['agentes', 'actividades', 'turnos', 'reservas', 'participaciones']
+    ]
+
+    monitor_ids = [a['id'] for a in tables['agentes'] if a['es_monitor']]
+    agent_ids = [a['id'] for a in tables['agentes']]
+    tables['reservas'], tables['participaciones'] = [], []
+
+    today = date.today()
+    for offset in range(-days_back, days_forward + 1):
+        fecha = (today + timedelta(days=offset)).isoformat()
+        for turno in tables['turnos']:
+            actividad = rnd.choice(tables['actividades'])
+            reserva = {'id': str(uuid.uuid4()), 'fecha': fecha, 'turno_id': turno['id'],
+                       'actividad_id': actividad['id'], 'capacidad': actividad['capacidad'],
+                       'monitor_id': rnd.choice(monitor_ids), 'created_at': _now(), 'updated_at': _now()}
+            tables['reservas'].append(reserva)
+            if offset <= 0:
+                for agente_id in rnd.sample(agent_ids, participants_per_reservation):
+                    tables['participaciones'].append({'id': str(uuid.uuid4()), 'reserva_id': reserva['id'],
+                                                      'agente_id': agente_id, 'created_at': _now(),
+                                                      'updated_at': _now()})
+    return backend
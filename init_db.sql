@@ -18,6 +18,8 @@ CREATE TABLE actividades (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
     nombre TEXT NOT NULL UNIQUE,
     descripcion TEXT,
+    -- Aforo por defecto de las reservas de la actividad (NULL = sin límite)
+    capacidad INTEGER CHECK (capacidad > 0),
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
@@ -43,3 +45,561 @@ INSERT INTO turnos (nombre, hora_inicio, hora_fin) VALUES
 ('Tarde', '14:00:00', '22:00:00'),
 ('Noche', '22:00:00', '08:00:00');
 
+-- Tabla de Reservas (una por fecha y turno)
+CREATE TABLE reservas (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    fecha DATE NOT NULL,
+    turno_id UUID NOT NULL REFERENCES turnos(id),
+    actividad_id UUID NOT NULL REFERENCES actividades(id),
+    monitor_id UUID NOT NULL REFERENCES agentes(id),
+    -- Aforo de esta reserva (NULL = sin límite); si no se indica se toma el de la actividad
+    capacidad INTEGER CHECK (capacidad > 0),
+    -- Inscritos, mantenido por trigger: la restricción de aforo se comprueba en la misma escritura
+    num_participantes INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    UNIQUE (fecha, turno_id),
+    CONSTRAINT reservas_aforo CHECK (capacidad IS NULL OR num_participantes <= capacidad)
+);
+
+-- Tabla de Participaciones (agentes inscritos en una reserva)
+CREATE TABLE participaciones (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    reserva_id UUID NOT NULL REFERENCES reservas(id) ON DELETE CASCADE,
+    agente_id UUID NOT NULL REFERENCES agentes(id),
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    UNIQUE (reserva_id, agente_id)
+);
+
+-- Lista de espera de las reservas completas, atendida por orden de llegada
+CREATE TABLE lista_espera (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    reserva_id UUID NOT NULL REFERENCES reservas(id) ON DELETE CASCADE,
+    agente_id UUID NOT NULL REFERENCES agentes(id) ON DELETE CASCADE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    UNIQUE (reserva_id, agente_id)
+);
+
+CREATE INDEX idx_reservas_fecha ON reservas (fecha);
+CREATE INDEX idx_lista_espera_orden ON lista_espera (reserva_id, created_at, id);
+CREATE INDEX idx_participaciones_agente ON participaciones (agente_id);
+-- El email identifica al agente sin distinguir mayúsculas
+CREATE UNIQUE INDEX idx_agentes_email_lower ON agentes (lower(email));
+
+-- Archivo de periodos cerrados: misma estructura que las tablas activas.
+-- Todas las reservas con fecha anterior a archivo_estado.archivado_hasta están aquí
+-- y no en reservas/participaciones, que solo guardan el periodo reciente.
+CREATE TABLE reservas_archivo (
+    id UUID PRIMARY KEY,
+    fecha DATE NOT NULL,
+    turno_id UUID NOT NULL REFERENCES turnos(id),
+    actividad_id UUID NOT NULL REFERENCES actividades(id),
+    monitor_id UUID NOT NULL REFERENCES agentes(id),
+    created_at TIMESTAMP WITH TIME ZONE,
+    updated_at TIMESTAMP WITH TIME ZONE,
+    UNIQUE (fecha, turno_id)
+);
+
+CREATE TABLE participaciones_archivo (
+    id UUID PRIMARY KEY,
+    reserva_id UUID NOT NULL REFERENCES reservas_archivo(id) ON DELETE CASCADE,
+    agente_id UUID NOT NULL REFERENCES agentes(id),
+    created_at TIMESTAMP WITH TIME ZONE,
+    updated_at TIMESTAMP WITH TIME ZONE,
+    UNIQUE (reserva_id, agente_id)
+);
+
+CREATE INDEX idx_participaciones_archivo_agente ON participaciones_archivo (agente_id);
+
+-- Límite del archivo (fila única); NULL mientras no se haya archivado nada
+CREATE TABLE archivo_estado (
+    id INT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    archivado_hasta DATE
+);
+
+INSERT INTO archivo_estado (id) VALUES (1);
+
+-- Participaciones (activas y, si el rango empieza antes del límite, archivadas) con su fecha.
+-- La condición sobre archivo_estado no depende de las filas: el planificador la evalúa
+-- una vez y no recorre el archivo cuando el rango no lo alcanza.
+CREATE OR REPLACE FUNCTION participaciones_en_rango(fecha_inicio DATE, fecha_fin DATE)
+RETURNS TABLE (id UUID, reserva_id UUID, agente_id UUID, fecha DATE)
+LANGUAGE sql STABLE AS $$
+    SELECT p.id, p.reserva_id, p.agente_id, r.fecha
+    FROM participaciones p
+    JOIN reservas r ON r.id = p.reserva_id
+    WHERE r.fecha BETWEEN fecha_inicio AND fecha_fin
+    UNION ALL
+    SELECT p.id, p.reserva_id, p.agente_id, r.fecha
+    FROM participaciones_archivo p
+    JOIN reservas_archivo r ON r.id = p.reserva_id
+    WHERE r.fecha BETWEEN fecha_inicio AND fecha_fin
+      AND fecha_inicio < (SELECT archivado_hasta FROM archivo_estado)
+$$;
+
+-- Reservas activas y archivadas del rango, con el mismo criterio
+CREATE OR REPLACE FUNCTION reservas_en_rango(fecha_inicio DATE, fecha_fin DATE)
+RETURNS TABLE (id UUID, fecha DATE, actividad_id UUID, monitor_id UUID)
+LANGUAGE sql STABLE AS $$
+    SELECT r.id, r.fecha, r.actividad_id, r.monitor_id
+    FROM reservas r
+    WHERE r.fecha BETWEEN fecha_inicio AND fecha_fin
+    UNION ALL
+    SELECT r.id, r.fecha, r.actividad_id, r.monitor_id
+    FROM reservas_archivo r
+    WHERE r.fecha BETWEEN fecha_inicio AND fecha_fin
+      AND fecha_inicio < (SELECT archivado_hasta FROM archivo_estado)
+$$;
+
+-- Participaciones agregadas por periodo (day, week, month, quarter, year) y sección/grupo.
+-- Las gráficas reciben un punto por periodo en lugar de una fila por participación.
+CREATE OR REPLACE FUNCTION participaciones_por_periodo(fecha_inicio DATE, fecha_fin DATE, intervalo TEXT)
+RETURNS TABLE (periodo DATE, seccion TEXT, grupo TEXT, total BIGINT)
+LANGUAGE sql STABLE AS $$
+    SELECT date_trunc(intervalo, p.fecha)::date, a.seccion, a.grupo, COUNT(*)
+    FROM participaciones_en_rango(fecha_inicio, fecha_fin) p
+    JOIN agentes a ON a.id = p.agente_id
+    GROUP BY 1, 2, 3
+$$;
+
+-- Reservas y asistentes agregados por periodo, actividad y monitor
+CREATE OR REPLACE FUNCTION reservas_por_periodo(fecha_inicio DATE, fecha_fin DATE, intervalo TEXT)
+RETURNS TABLE (periodo DATE, actividad_id UUID, monitor_id UUID, reservas BIGINT, participantes BIGINT)
+LANGUAGE sql STABLE AS $$
+    SELECT date_trunc(intervalo, r.fecha)::date, r.actividad_id, r.monitor_id,
+           COUNT(DISTINCT r.id), COUNT(p.id)
+    FROM reservas_en_rango(fecha_inicio, fecha_fin) r
+    LEFT JOIN participaciones_en_rango(fecha_inicio, fecha_fin) p ON p.reserva_id = r.id
+    GROUP BY 1, 2, 3
+$$;
+
+-- Historial de participaciones con los datos de la reserva, paginable por (fecha, id)
+CREATE OR REPLACE VIEW historial_participaciones AS
+SELECT p.id, p.agente_id, p.reserva_id, r.fecha,
+       t.nombre AS turno, t.hora_inicio, t.hora_fin,
+       ac.nombre AS actividad,
+       m.nombre || ' ' || m.apellidos AS monitor
+FROM participaciones p
+JOIN reservas r ON r.id = p.reserva_id
+LEFT JOIN turnos t ON t.id = r.turno_id
+LEFT JOIN actividades ac ON ac.id = r.actividad_id
+LEFT JOIN agentes m ON m.id = r.monitor_id;
+
+-- El mismo historial sobre el archivo (la aplicación lo consulta solo si el rango lo alcanza)
+CREATE OR REPLACE VIEW historial_participaciones_archivo AS
+SELECT p.id, p.agente_id, p.reserva_id, r.fecha,
+       t.nombre AS turno, t.hora_inicio, t.hora_fin,
+       ac.nombre AS actividad,
+       m.nombre || ' ' || m.apellidos AS monitor
+FROM participaciones_archivo p
+JOIN reservas_archivo r ON r.id = p.reserva_id
+LEFT JOIN turnos t ON t.id = r.turno_id
+LEFT JOIN actividades ac ON ac.id = r.actividad_id
+LEFT JOIN agentes m ON m.id = r.monitor_id;
+
+-- Registro de auditoría de cambios (se escribe en lotes desde la aplicación)
+CREATE TABLE auditoria (
+    id BIGSERIAL PRIMARY KEY,
+    usuario_id UUID,
+    usuario TEXT,
+    tabla TEXT NOT NULL,
+    accion TEXT NOT NULL CHECK (accion IN ('INSERT', 'UPDATE', 'DELETE')),
+    registro_id TEXT,
+    antes JSONB,
+    despues JSONB,
+    fecha_cambio TIMESTAMP WITH TIME ZONE NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE INDEX idx_auditoria_tabla_registro ON auditoria (tabla, registro_id);
+
+-- Agentes con alguno de los NIPs o emails indicados (emails en minúsculas), para la importación
+CREATE OR REPLACE FUNCTION agentes_por_nip_o_email(p_nips TEXT[], p_emails TEXT[])
+RETURNS TABLE (id UUID, nip TEXT, email TEXT)
+LANGUAGE sql STABLE AS $$
+    SELECT a.id, a.nip::TEXT, a.email
+    FROM agentes a
+    WHERE a.nip = ANY(p_nips) OR lower(a.email) = ANY(p_emails)
+$$;
+
+-- Total de participaciones por agente en un rango de fechas
+CREATE OR REPLACE FUNCTION totales_participacion(fecha_inicio DATE, fecha_fin DATE)
+RETURNS TABLE (agente_id UUID, total BIGINT)
+LANGUAGE sql STABLE AS $$
+    SELECT p.agente_id, COUNT(*)
+    FROM participaciones_en_rango(fecha_inicio, fecha_fin) p
+    GROUP BY p.agente_id
+$$;
+
+-- Última modificación de cada tabla, usada para calcular los ETag de la API.
+-- Se actualiza con un trigger por sentencia, incluidos los borrados.
+CREATE TABLE versiones_datos (
+    tabla TEXT PRIMARY KEY,
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+INSERT INTO versiones_datos (tabla) VALUES
+('agentes'), ('actividades'), ('turnos'), ('reservas'), ('participaciones');
+
+CREATE OR REPLACE FUNCTION marcar_version_tabla()
+RETURNS TRIGGER LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE versiones_datos SET updated_at = NOW() WHERE tabla = TG_TABLE_NAME;
+    RETURN NULL;
+END;
+$$;
+
+CREATE TRIGGER version_agentes AFTER INSERT OR UPDATE OR DELETE ON agentes
+    FOR EACH STATEMENT EXECUTE FUNCTION marcar_version_tabla();
+CREATE TRIGGER version_actividades AFTER INSERT OR UPDATE OR DELETE ON actividades
+    FOR EACH STATEMENT EXECUTE FUNCTION marcar_version_tabla();
+CREATE TRIGGER version_turnos AFTER INSERT OR UPDATE OR DELETE ON turnos
+    FOR EACH STATEMENT EXECUTE FUNCTION marcar_version_tabla();
+CREATE TRIGGER version_reservas AFTER INSERT OR UPDATE OR DELETE ON reservas
+    FOR EACH STATEMENT EXECUTE FUNCTION marcar_version_tabla();
+CREATE TRIGGER version_participaciones AFTER INSERT OR UPDATE OR DELETE ON participaciones
+    FOR EACH STATEMENT EXECUTE FUNCTION marcar_version_tabla();
+
+-- Última participación de cada agente, mantenida por trigger para la rotación
+CREATE TABLE rotacion_agentes (
+    agente_id UUID PRIMARY KEY REFERENCES agentes(id) ON DELETE CASCADE,
+    ultima_participacion DATE NOT NULL
+);
+
+-- Una inscripción solo puede adelantar la última fecha: no hace falta recorrer el historial
+CREATE OR REPLACE FUNCTION rotacion_inscripciones()
+RETURNS TRIGGER LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO rotacion_agentes (agente_id, ultima_participacion)
+    SELECT n.agente_id, MAX(r.fecha)
+    FROM nuevas n JOIN reservas r ON r.id = n.reserva_id
+    GROUP BY n.agente_id
+    ON CONFLICT (agente_id) DO UPDATE
+    SET ultima_participacion = GREATEST(rotacion_agentes.ultima_participacion, EXCLUDED.ultima_participacion);
+    RETURN NULL;
+END;
+$$;
+
+-- Una baja puede retrasarla: se recalcula solo para los agentes afectados. Sin
+-- participaciones activas la última es la más reciente del archivo (todas las
+-- archivadas son anteriores a las activas, así que solo se consulta en ese caso)
+CREATE OR REPLACE FUNCTION rotacion_bajas()
+RETURNS TRIGGER LANGUAGE plpgsql AS $$
+BEGIN
+    -- Al archivar, las filas que salen son anteriores a las activas: la última fecha no cambia
+    IF current_setting('gimnasio.archivando', true) = 'on' THEN
+        RETURN NULL;
+    END IF;
+
+    UPDATE rotacion_agentes ra SET ultima_participacion = u.ultima
+    FROM (
+        SELECT b.agente_id, COALESCE(
+            (SELECT MAX(r.fecha) FROM participaciones p JOIN reservas r ON r.id = p.reserva_id
+             WHERE p.agente_id = b.agente_id),
+            (SELECT MAX(r.fecha) FROM participaciones_archivo p JOIN reservas_archivo r ON r.id = p.reserva_id
+             WHERE p.agente_id = b.agente_id)
+        ) AS ultima
+        FROM (SELECT DISTINCT agente_id FROM borradas) b
+    ) u
+    WHERE ra.agente_id = u.agente_id AND u.ultima IS NOT NULL
+      AND ra.ultima_participacion IS DISTINCT FROM u.ultima;
+
+    DELETE FROM rotacion_agentes ra
+    WHERE ra.agente_id IN (SELECT agente_id FROM borradas)
+      AND NOT EXISTS (SELECT 1 FROM participaciones p WHERE p.agente_id = ra.agente_id)
+      AND NOT EXISTS (SELECT 1 FROM participaciones_archivo p WHERE p.agente_id = ra.agente_id);
+    RETURN NULL;
+END;
+$$;
+
+CREATE TRIGGER rotacion_participaciones_insert AFTER INSERT ON participaciones
+    REFERENCING NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION rotacion_inscripciones();
+CREATE TRIGGER rotacion_participaciones_delete AFTER DELETE ON participaciones
+    REFERENCING OLD TABLE AS borradas
+    FOR EACH STATEMENT EXECUTE FUNCTION rotacion_bajas();
+
+-- Las tablas activas solo guardan fechas posteriores al límite del archivo: una reserva
+-- anterior no se vería en las consultas que completan con el archivo y chocaría con él
+-- al volver a archivar. Solo se consulta el límite para fechas de meses ya cerrados.
+CREATE OR REPLACE FUNCTION comprobar_fecha_archivo()
+RETURNS TRIGGER LANGUAGE plpgsql AS $$
+DECLARE
+    v_limite DATE;
+BEGIN
+    IF NEW.fecha < date_trunc('month', CURRENT_DATE)::date THEN
+        -- FOR SHARE espera a un archivado en curso y lee el límite que deja
+        SELECT archivado_hasta INTO v_limite FROM archivo_estado WHERE id = 1 FOR SHARE;
+        IF NEW.fecha < v_limite THEN
+            RAISE EXCEPTION 'La fecha % pertenece a un periodo archivado (hasta %)', NEW.fecha, v_limite
+                USING ERRCODE = 'check_violation';
+        END IF;
+    END IF;
+    RETURN NEW;
+END;
+$$;
+
+CREATE TRIGGER fecha_no_archivada BEFORE INSERT OR UPDATE OF fecha ON reservas
+    FOR EACH ROW EXECUTE FUNCTION comprobar_fecha_archivo();
+
+-- Mueve al archivo las reservas (y sus participaciones) anteriores a fecha_limite,
+-- que debe ser el primer día de un mes ya cerrado. Todo ocurre en una transacción.
+CREATE OR REPLACE FUNCTION archivar_hasta(fecha_limite DATE)
+RETURNS TABLE (reservas BIGINT, participaciones BIGINT)
+LANGUAGE plpgsql AS $$
+DECLARE
+    v_reservas BIGINT;
+    v_participaciones BIGINT;
+BEGIN
+    IF fecha_limite <> date_trunc('month', fecha_limite)::date THEN
+        RAISE EXCEPTION 'El límite de archivo debe ser el primer día de un mes: %', fecha_limite;
+    END IF;
+    IF fecha_limite > date_trunc('month', CURRENT_DATE)::date THEN
+        RAISE EXCEPTION 'Solo se pueden archivar meses cerrados: %', fecha_limite;
+    END IF;
+
+    PERFORM set_config('gimnasio.archivando', 'on', true);
+
+    -- El límite se mueve primero: la fila de archivo_estado queda bloqueada y las reservas
+    -- anteriores que se intenten crear mientras tanto esperan y se rechazan (fecha_no_archivada)
+    UPDATE archivo_estado
+    SET archivado_hasta = GREATEST(COALESCE(archivado_hasta, fecha_limite), fecha_limite);
+
+    -- Bloquear las reservas que salen impide que se les añadan participaciones entre la
+    -- copia y el borrado (la clave foránea de participaciones necesita un bloqueo compatible)
+    PERFORM 1 FROM reservas WHERE fecha < fecha_limite ORDER BY id FOR UPDATE;
+
+    INSERT INTO reservas_archivo (id, fecha, turno_id, actividad_id, monitor_id, created_at, updated_at)
+    SELECT id, fecha, turno_id, actividad_id, monitor_id, created_at, updated_at
+    FROM reservas WHERE fecha < fecha_limite;
+    GET DIAGNOSTICS v_reservas = ROW_COUNT;
+
+    INSERT INTO participaciones_archivo (id, reserva_id, agente_id, created_at, updated_at)
+    SELECT p.id, p.reserva_id, p.agente_id, p.created_at, p.updated_at
+    FROM participaciones p JOIN reservas r ON r.id = p.reserva_id
+    WHERE r.fecha < fecha_limite;
+    GET DIAGNOSTICS v_participaciones = ROW_COUNT;
+
+    -- Las participaciones se borran en cascada
+    DELETE FROM reservas WHERE fecha < fecha_limite;
+
+    PERFORM set_config('gimnasio.archivando', 'off', true);
+
+    RETURN QUERY SELECT v_reservas, v_participaciones;
+END;
+$$;
+
+-- Aforo y lista de espera.
+-- num_participantes se actualiza en la misma sentencia que inserta o borra
+-- participaciones; la restricción reservas_aforo hace que una inscripción que
+-- supere el aforo falle sin contar antes, y el bloqueo de la fila de la reserva
+-- ordena las inscripciones concurrentes.
+
+-- Aforo de la actividad para las reservas que no indican uno propio
+CREATE OR REPLACE FUNCTION aforo_por_defecto()
+RETURNS TRIGGER LANGUAGE plpgsql AS $$
+BEGIN
+    IF NEW.capacidad IS NULL THEN
+        SELECT a.capacidad INTO NEW.capacidad FROM actividades a WHERE a.id = NEW.actividad_id;
+    END IF;
+    NEW.num_participantes := 0;
+    RETURN NEW;
+END;
+$$;
+
+CREATE TRIGGER aforo_reservas_insert BEFORE INSERT ON reservas
+    FOR EACH ROW EXECUTE FUNCTION aforo_por_defecto();
+
+-- Pasa a participantes, en una sola sentencia, a los primeros de la lista de espera
+-- de cada reserva mientras queden plazas libres
+CREATE OR REPLACE FUNCTION promover_lista_espera(p_reservas UUID[])
+RETURNS VOID LANGUAGE sql AS $$
+    WITH libres AS (
+        SELECT r.id, r.capacidad - r.num_participantes AS plazas
+        FROM reservas r
+        WHERE r.id = ANY(p_reservas)
+    ), candidatos AS (
+        SELECT e.id, l.plazas,
+               ROW_NUMBER() OVER (PARTITION BY e.reserva_id ORDER BY e.created_at, e.id) AS puesto
+        FROM lista_espera e
+        JOIN libres l ON l.id = e.reserva_id
+    ), promovidos AS (
+        DELETE FROM lista_espera e
+        USING candidatos c
+        WHERE e.id = c.id AND (c.plazas IS NULL OR c.puesto <= c.plazas)
+        RETURNING e.reserva_id, e.agente_id, e.created_at, e.id
+    )
+    INSERT INTO participaciones (reserva_id, agente_id)
+    SELECT reserva_id, agente_id FROM promovidos ORDER BY created_at, id
+    ON CONFLICT (reserva_id, agente_id) DO NOTHING
+$$;
+
+CREATE OR REPLACE FUNCTION contar_inscripciones()
+RETURNS TRIGGER LANGUAGE plpgsql AS $$
+BEGIN
+    -- Las reservas se bloquean siempre en el mismo orden para que dos lotes no se interbloqueen
+    PERFORM 1 FROM reservas WHERE id IN (SELECT reserva_id FROM nuevas) ORDER BY id FOR UPDATE;
+
+    UPDATE reservas r SET num_participantes = r.num_participantes + n.total
+    FROM (SELECT reserva_id, COUNT(*) AS total FROM nuevas GROUP BY reserva_id) n
+    WHERE r.id = n.reserva_id;
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION liberar_plazas()
+RETURNS TRIGGER LANGUAGE plpgsql AS $$
+BEGIN
+    -- Al archivar se borran las reservas enteras: no hay plazas que liberar
+    IF current_setting('gimnasio.archivando', true) = 'on' THEN
+        RETURN NULL;
+    END IF;
+
+    PERFORM 1 FROM reservas WHERE id IN (SELECT reserva_id FROM borradas) ORDER BY id FOR UPDATE;
+
+    UPDATE reservas r SET num_participantes = r.num_participantes - b.total
+    FROM (SELECT reserva_id, COUNT(*) AS total FROM borradas GROUP BY reserva_id) b
+    WHERE r.id = b.reserva_id;
+
+    PERFORM promover_lista_espera(ARRAY(SELECT DISTINCT reserva_id FROM borradas));
+    RETURN NULL;
+END;
+$$;
+
+CREATE TRIGGER aforo_participaciones_insert AFTER INSERT ON participaciones
+    REFERENCING NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION contar_inscripciones();
+CREATE TRIGGER aforo_participaciones_delete AFTER DELETE ON participaciones
+    REFERENCING OLD TABLE AS borradas
+    FOR EACH STATEMENT EXECUTE FUNCTION liberar_plazas();
+
+-- Si se amplía el aforo de una reserva se atiende la lista de espera
+CREATE OR REPLACE FUNCTION aforo_ampliado()
+RETURNS TRIGGER LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM promover_lista_espera(ARRAY[NEW.id]);
+    RETURN NULL;
+END;
+$$;
+
+CREATE TRIGGER aforo_reservas_update AFTER UPDATE OF capacidad ON reservas
+    FOR EACH ROW WHEN (NEW.capacidad IS DISTINCT FROM OLD.capacidad)
+    EXECUTE FUNCTION aforo_ampliado();
+
+-- Cambia el aforo de una reserva. Devuelve la reserva ('actualizada') y las
+-- participaciones que la ampliación ha pasado desde la lista de espera ('promovida').
+CREATE OR REPLACE FUNCTION cambiar_aforo(p_reserva_id UUID, p_capacidad INTEGER)
+RETURNS TABLE (id UUID, agente_id UUID, estado TEXT)
+LANGUAGE plpgsql AS $$
+#variable_conflict use_column
+DECLARE
+    v_espera UUID[];
+BEGIN
+    -- Con la reserva bloqueada la lista de espera no cambia hasta el final
+    PERFORM 1 FROM reservas r WHERE r.id = p_reserva_id FOR UPDATE;
+    IF NOT FOUND THEN
+        RETURN;
+    END IF;
+    SELECT ARRAY_AGG(e.agente_id) INTO v_espera FROM lista_espera e WHERE e.reserva_id = p_reserva_id;
+
+    UPDATE reservas r SET capacidad = p_capacidad WHERE r.id = p_reserva_id;
+
+    RETURN QUERY SELECT p_reserva_id, NULL::UUID, 'actualizada'::TEXT;
+    RETURN QUERY
+    SELECT p.id, p.agente_id, 'promovida'::TEXT
+    FROM participaciones p
+    WHERE p.reserva_id = p_reserva_id AND p.agente_id = ANY(COALESCE(v_espera, '{}'));
+END;
+$$;
+
+-- Inscribe a un agente con una sola escritura condicional: 'inscrito', 'ya_inscrito'
+-- o, si la reserva está completa, 'en_espera' (id de la participación o de la espera)
+CREATE OR REPLACE FUNCTION inscribir_agente(p_reserva_id UUID, p_agente_id UUID)
+RETURNS TABLE (estado TEXT, id UUID)
+LANGUAGE plpgsql AS $$
+#variable_conflict use_column
+DECLARE
+    v_id UUID;
+BEGIN
+    -- El bloqueo se mantiene hasta el final: si la reserva está completa, nadie puede
+    -- liberar una plaza entre el intento fallido y la entrada en la lista de espera
+    PERFORM 1 FROM reservas r WHERE r.id = p_reserva_id FOR UPDATE;
+
+    BEGIN
+        INSERT INTO participaciones (reserva_id, agente_id) VALUES (p_reserva_id, p_agente_id)
+        ON CONFLICT (reserva_id, agente_id) DO NOTHING
+        RETURNING participaciones.id INTO v_id;
+    EXCEPTION WHEN check_violation THEN
+        INSERT INTO lista_espera (reserva_id, agente_id) VALUES (p_reserva_id, p_agente_id)
+        ON CONFLICT (reserva_id, agente_id) DO NOTHING;
+
+        SELECT e.id INTO v_id FROM lista_espera e
+        WHERE e.reserva_id = p_reserva_id AND e.agente_id = p_agente_id;
+        RETURN QUERY SELECT 'en_espera'::TEXT, v_id;
+        RETURN;
+    END;
+
+    IF v_id IS NULL THEN
+        SELECT p.id INTO v_id FROM participaciones p
+        WHERE p.reserva_id = p_reserva_id AND p.agente_id = p_agente_id;
+        RETURN QUERY SELECT 'ya_inscrito'::TEXT, v_id;
+        RETURN;
+    END IF;
+
+    DELETE FROM lista_espera e WHERE e.reserva_id = p_reserva_id AND e.agente_id = p_agente_id;
+    RETURN QUERY SELECT 'inscrito'::TEXT, v_id;
+END;
+$$;
+
+-- Inscribe un lote de filas {reserva_id, agente_id} (fichajes del kiosko) en una petición
+CREATE OR REPLACE FUNCTION inscribir_agentes(filas JSONB)
+RETURNS TABLE (reserva_id UUID, agente_id UUID, estado TEXT, id UUID)
+LANGUAGE plpgsql AS $$
+DECLARE
+    v_fila RECORD;
+BEGIN
+    FOR v_fila IN
+        SELECT DISTINCT f.reserva_id, f.agente_id
+        FROM jsonb_to_recordset(filas) AS f(reserva_id UUID, agente_id UUID)
+        ORDER BY 1, 2
+    LOOP
+        RETURN QUERY
+        SELECT v_fila.reserva_id, v_fila.agente_id, i.estado, i.id
+        FROM inscribir_agente(v_fila.reserva_id, v_fila.agente_id) i;
+    END LOOP;
+END;
+$$;
+
+-- Retira una participación. Devuelve la fila retirada ('retirada') y las que la lista de
+-- espera ha pasado a participantes en la misma transacción ('promovida').
+CREATE OR REPLACE FUNCTION retirar_participacion(p_participacion_id UUID)
+RETURNS TABLE (id UUID, agente_id UUID, estado TEXT)
+LANGUAGE plpgsql AS $$
+#variable_conflict use_column
+DECLARE
+    v_reserva UUID;
+    v_agente UUID;
+    v_espera UUID[];
+BEGIN
+    SELECT p.reserva_id INTO v_reserva FROM participaciones p WHERE p.id = p_participacion_id;
+    IF v_reserva IS NULL THEN
+        RETURN;
+    END IF;
+
+    -- Con la reserva bloqueada nadie más puede promover ni ocupar plazas de la lista
+    PERFORM 1 FROM reservas r WHERE r.id = v_reserva FOR UPDATE;
+    SELECT ARRAY_AGG(e.agente_id) INTO v_espera FROM lista_espera e WHERE e.reserva_id = v_reserva;
+
+    DELETE FROM participaciones p WHERE p.id = p_participacion_id RETURNING p.agente_id INTO v_agente;
+    IF v_agente IS NULL THEN
+        RETURN;
+    END IF;
+
+    RETURN QUERY SELECT p_participacion_id, v_agente, 'retirada'::TEXT;
+    RETURN QUERY
+    SELECT p.id, p.agente_id, 'promovida'::TEXT
+    FROM participaciones p
+    WHERE p.reserva_id = v_reserva AND p.agente_id = ANY(COALESCE(v_espera, '{}'));
+END;
+$$;
@@ -0,0 +1,201 @@
+import threading
+import time
+from datetime import datetime, timedelta
+import streamlit as st
+from db_utils import get_supabase_client
+from batch_writer import BatchWriter
+from audit import record_change
+from auth_utils import get_current_user
+from rotation_index import rotation_index
+import repository
+
+# Segundos tras los que se recarga el índice de NIPs y la reserva del turno actual
+AGENT_INDEX_TTL_SECONDS = 600
+SLOT_TTL_SECONDS = 60
+
+# Parámetros de la cola de fichajes
+CHECKIN_BATCH_SIZE = 30
+CHECKIN_FLUSH_SECONDS = 1.0
+
+def _parse_time(value):
+    return datetime.strptime(value, "%H:%M:%S").time() if value else None
+
+class KioskIndex:
+    """Índice en memoria de agentes por NIP y de la reserva del turno en curso"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._agents_by_nip = {}
+        self._agents_loaded_at = 0
+        self._slot = None
+        self._slot_loaded_at = 0
+        # Agentes en la lista de espera de la reserva del turno, recargada con ella
+        self._waitlist = set()
+
+    def agent(self, supabase, nip):
+        """Busca un agente por NIP, recargando el índice si ha caducado"""
+        with self._lock:
+            if time.time() - self._agents_loaded_at > AGENT_INDEX_TTL_SECONDS:
+                agents = repository.list_agent_summaries(supabase)
+                self._agents_by_nip = {a.nip.strip().upper(): a for a in agents}
+                self._agents_loaded_at = time.time()
+
+            return self._agents_by_nip.get(nip.strip().upper())
+
+    def current_reservation(self, supabase, now=None):
+        """Devuelve la reserva del turno en curso (o None si no hay ninguna)"""
+        now = now or datetime.now()
+
+        with self._lock:
+            if self._slot is not None and time.time() - self._slot_loaded_at <= SLOT_TTL_SECONDS:
+                return self._slot
+
+            fecha, turno = self._current_turno(supabase, now)
+            reserva = None
+            waitlist = set()
+
+            if turno:
+                reserva = repository.get_slot_reservation(supabase, fecha, turno.id)
+
+            if reserva:
+                _, espera = repository.reservation_enrollment(supabase, reserva.id)
+                waitlist = {e.agente_id for e in espera}
+
+            self._slot = reserva
+            self._waitlist = waitlist
+            self._slot_loaded_at = time.time()
+            return reserva
+
+    def _current_turno(self, supabase, now):
+        """Turno que contiene la hora actual; el de noche pertenece al día en que empieza"""
+        for turno in repository.list_turnos(supabase):
+            inicio = _parse_time(turno.hora_inicio)
+            fin = _parse_time(turno.hora_fin)
+            if inicio is None or fin is None:
+                continue
+
+            if inicio < fin:
+                if inicio <= now.time() < fin:
+                    return now.date(), turno
+            elif now.time() >= inicio:
+                return now.date(), turno
+            elif now.time() < fin:
+                return now.date() - timedelta(days=1), turno
+
+        return now.date(), None
+
+    def mark_waitlisted(self, reserva_id, agente_ids):
+        """Anota los fichajes que han quedado en espera si son de la reserva del turno"""
+        with self._lock:
+            if self._slot is not None and self._slot.id == reserva_id:
+                self._waitlist.update(agente_ids)
+
+    def waitlisted(self, reserva_id, agente_id):
+        with self._lock:
+            return self._slot is not None and self._slot.id == reserva_id and agente_id in self._waitlist
+
+    def invalidate(self):
+        with self._lock:
+            self._agents_loaded_at = 0
+            self._slot = None
+
+def _insert_checkins(index, batch):
+    """Inscribe un lote de fichajes respetando el aforo; los ya registrados se ignoran.
+
+    La auditoría se escribe aquí, con el resultado de cada fila: participación
+    nueva, entrada en la lista de espera o nada si el agente ya estaba inscrito.
+    """
+    rows = [{'reserva_id': c['reserva_id'], 'agente_id': c['agente_id']} for c in batch]
+    results = repository.enroll_agents(get_supabase_client(), rows)
+    estados = {(r['reserva_id'], r['agente_id']): r['estado'] for r in results}
+    checkins = {(c['reserva_id'], c['agente_id']): c for c in batch}
+
+    for r in results:
+        tabla = {'inscrito': 'participaciones', 'en_espera': 'lista_espera'}.get(r['estado'])
+        if tabla:
+            record_change(tabla, 'INSERT', r['id'], despues={'reserva_id': r['reserva_id'], 'agente_id': r['agente_id']},
+                          user=checkins[(r['reserva_id'], r['agente_id'])]['usuario'])
+
+    for reserva_id in {c['reserva_id'] for c in batch}:
+        index.mark_waitlisted(reserva_id, [agente_id for (r, agente_id), estado in estados.items()
+                                           if r == reserva_id and estado == 'en_espera'])
+
+    # Solo cuentan para la rotación las participaciones nuevas
+    for checkin in batch:
+        if estados.get((checkin['reserva_id'], checkin['agente_id'])) == 'inscrito':
+            rotation_index.record(checkin['agente_id'], checkin['fecha'])
+
+@st.cache_resource
+def get_kiosk():
+    """Índice y cola de fichajes compartidos por todas las sesiones del proceso"""
+    index = KioskIndex()
+    writer = BatchWriter(
+        lambda batch: _insert_checkins(index, batch),
+        batch_size=CHECKIN_BATCH_SIZE,
+        flush_interval=CHECKIN_FLUSH_SECONDS,
+        key_fn=lambda c: (c['reserva_id'], c['agente_id']),
+        name="kiosk-checkins"
+    )
+    return index, writer
+
+def show_kiosk():
+    st.title("Kiosko de Asistencia")
+
+    supabase = get_supabase_client()
+    index, writer = get_kiosk()
+
+    reserva = index.current_reservation(supabase)
+
+    if not reserva:
+        st.info("No hay ninguna reserva programada para el turno actual")
+        if st.button("Actualizar"):
+            index.invalidate()
+            st.rerun()
+        return
+
+    st.subheader(f"{reserva.actividad or 'Actividad desconocida'} - {reserva.turno or 'Turno desconocido'}")
+    st.caption(f"{reserva.fecha} · {reserva.hora_inicio or '?'} - {reserva.hora_fin or '?'} · "
+               f"Monitor: {reserva.monitor or ''}")
+
+    # Fichajes de esta sesión del kiosko, para avisar de duplicados sin consultar la base de datos
+    registered = st.session_state.setdefault('kiosk_checkins', {})
+    checked_in = registered.setdefault(reserva.id, [])
+
+    with st.form("kiosk_form", clear_on_submit=True):
+        nip = st.text_input("Introduce o escanea tu NIP")
+        submit = st.form_submit_button("Registrar Asistencia")
+
+    if submit and nip:
+        agente = index.agent(supabase, nip)
+
+        if not agente:
+            st.error(f"No se encontró ningún agente con NIP {nip}")
+        elif any(c['agente_id'] == agente.id for c in checked_in):
+            st.warning(f"{agente.nombre} {agente.apellidos} ya está registrado")
+        elif writer.submit({'reserva_id': reserva.id, 'agente_id': agente.id, 'fecha': reserva.fecha,
+                            'usuario': get_current_user()}):
+            # La inscripción (y su auditoría) se decide al enviar el lote, según el aforo
+            checked_in.append({'agente_id': agente.id, 'nombre': f"{agente.nombre} {agente.apellidos}",
+                               'nip': agente.nip, 'hora': datetime.now().strftime('%H:%M:%S')})
+            st.success(f"Fichaje recibido: {agente.nombre} {agente.apellidos}")
+        else:
+            st.warning("El registro ya está en cola o la cola está llena; inténtalo de nuevo")
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Registrados", len(checked_in))
+    col2.metric("Pendientes de envío", writer.pending)
+    col3.metric("Fallidos", len(writer.failed))
+
+    if writer.failed and st.button("Reintentar fallidos"):
+        for checkin in writer.take_failed():
+            writer.submit(checkin)
+        st.rerun()
+
+    if checked_in:
+        st.dataframe(
+            [{'Hora': c['hora'], 'Nombre': c['nombre'], 'NIP': c['nip'],
+              'Estado': 'En espera (aforo completo)' if index.waitlisted(reserva.id, c['agente_id']) else 'Registrado'}
+             for c in reversed(checked_in)],
+            use_container_width=True,
+            hide_index=True
+        )
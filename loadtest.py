@@ -0,0 +1,205 @@
+"""Prueba de carga: N sesiones concurrentes de la aplicación contra el backend simulado.
+
+Uso:
+    python loadtest.py --sessions 1 5 10 20 --latency 0.03 --jitter 0.02 --rounds 3
+
+Cada sesión recorre el flujo real de app.main con la API de pruebas de Streamlit
+(login, navegación, calendario y participantes en Reservas, Dashboard) en su propio
+proceso: AppTest usa el runtime global de Streamlit y varias sesiones en un mismo
+proceso se rompen entre sí. Cada proceso genera su copia del backend simulado con
+la misma semilla y todas las sesiones de un nivel arrancan a la vez. Para cada
+nivel de concurrencia se informa de la latencia por rerun (p50/p95/p99), el
+rendimiento en reruns por segundo y la memoria sumada de los procesos. Si alguna
+sesión falla, el nivel se marca como fallido y no se dan sus tiempos.
+"""
+import argparse
+import multiprocessing
+import os
+import queue
+import resource
+import statistics
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BASE_DIR)
+
+from streamlit.testing.v1 import AppTest
+from db_utils import set_supabase_client
+from fake_backend import FakeSupabase, seed_backend
+
+APP_PATH = os.path.join(BASE_DIR, "app.py")
+LOGIN_EMAIL = "admin@test"
+LOGIN_PASSWORD = "admin"
+# Tiempo máximo para que cada proceso arranque y genere su backend (y margen de la sesión)
+SETUP_TIMEOUT_SECONDS = 120
+
+def peak_rss_mb():
+    """Memoria residente máxima alcanzada por el proceso"""
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / (1024 * 1024) if sys.platform == "darwin" else maxrss / 1024
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+class SessionResult:
+    def __init__(self):
+        self.latencies = []
+        self.errors = []
+        self.queries = 0
+        self.rss_mb = 0.0
+
+def _timed_run(at, result, step, timeout):
+    start = time.perf_counter()
+    at.run(timeout=timeout)
+    result.latencies.append(time.perf_counter() - start)
+    if at.exception:
+        result.errors.append(f"{step}: {at.exception[0].value}")
+
+def _click(at, label):
+    for button in at.button:
+        if button.label == label:
+            button.click()
+            return True
+    return False
+
+def run_session(rounds, timeout):
+    """Recorre el flujo completo de un usuario y devuelve las latencias de cada rerun"""
+    result = SessionResult()
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+
+    try:
+        _timed_run(at, result, "inicio", timeout)
+
+        at.text_input[0].input(LOGIN_EMAIL)
+        at.text_input[1].input(LOGIN_PASSWORD)
+        _click(at, "Iniciar Sesión")
+        _timed_run(at, result, "login", timeout)
+
+        for _ in range(rounds):
+            at.sidebar.radio[0].set_value("Reservas")
+            _timed_run(at, result, "reservas", timeout)
+
+            if _click(at, "Añadir Participante"):
+                _timed_run(at, result, "añadir participante", timeout)
+
+            at.sidebar.radio[0].set_value("Dashboard")
+            _timed_run(at, result, "dashboard", timeout)
+    except Exception as e:
+        result.errors.append(f"{type(e).__name__}: {e}")
+
+    return result
+
+def session_process(args, start, results):
+    """Una sesión en su propio proceso: genera el backend, espera la salida común y recorre el flujo"""
+    backend = seed_backend(FakeSupabase(latency=args.latency, jitter=args.jitter), agents=args.agents)
+    set_supabase_client(backend)
+    results.put(('ready', None))
+    start.wait()
+
+    queries_before = backend.queries
+    result = run_session(args.rounds, args.timeout)
+    result.queries = backend.queries - queries_before
+    result.rss_mb = peak_rss_mb()
+    results.put(('done', result))
+
+def run_level(sessions, args):
+    # spawn: cada proceso arranca con un intérprete limpio, sin el runtime de Streamlit heredado
+    context = multiprocessing.get_context('spawn')
+    start = context.Event()
+    results = context.Queue()
+    processes = [context.Process(target=session_process, args=(args, start, results), daemon=True)
+                 for _ in range(sessions)]
+    for process in processes:
+        process.start()
+
+    deadline = time.monotonic() + SETUP_TIMEOUT_SECONDS
+    session_results = []
+
+    def receive():
+        try:
+            return results.get(timeout=max(0.1, deadline - time.monotonic()))
+        except queue.Empty:
+            return None, None
+
+    # El tiempo se mide desde que todas las sesiones tienen su backend listo
+    ready = 0
+    while ready < sessions and time.monotonic() < deadline:
+        kind, _ = receive()
+        ready += kind == 'ready'
+
+    start.set()
+    begin = time.perf_counter()
+    deadline = time.monotonic() + SETUP_TIMEOUT_SECONDS + args.timeout * (3 + 3 * args.rounds)
+    while len(session_results) < ready and time.monotonic() < deadline:
+        kind, result = receive()
+        if kind == 'done':
+            session_results.append(result)
+    elapsed = time.perf_counter() - begin
+
+    for process in processes:
+        process.join(timeout=1)
+        if process.is_alive():
+            process.terminate()
+
+    latencies = [l for r in session_results for l in r.latencies]
+    errors = [e for r in session_results for e in r.errors]
+    if len(session_results) < sessions:
+        errors.append(f"{sessions - len(session_results)} sesiones no terminaron (proceso caído o fuera de tiempo)")
+    failed = bool(errors)
+
+    return {
+        'sessions': sessions,
+        'failed': failed,
+        'reruns': len(latencies),
+        'p50': None if failed else percentile(latencies, 50) * 1000,
+        'p95': None if failed else percentile(latencies, 95) * 1000,
+        'p99': None if failed else percentile(latencies, 99) * 1000,
+        'mean': None if failed or not latencies else statistics.mean(latencies) * 1000,
+        'throughput': None if failed or not elapsed else len(latencies) / elapsed,
+        'queries': sum(r.queries for r in session_results),
+        'rss_mb': sum(r.rss_mb for r in session_results),
+        'errors': errors,
+    }
+
+def _column(value, width, decimals=0):
+    return f"{'-':>{width}}" if value is None else f"{value:>{width}.{decimals}f}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de la aplicación con backend simulado")
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1, 5, 10, 20],
+                        help="Niveles de concurrencia a probar")
+    parser.add_argument('--rounds', type=int, default=3, help="Vueltas de navegación por sesión")
+    parser.add_argument('--latency', type=float, default=0.03, help="Latencia por consulta en segundos")
+    parser.add_argument('--jitter', type=float, default=0.02, help="Variación aleatoria de la latencia en segundos")
+    parser.add_argument('--agents', type=int, default=300, help="Número de agentes en el backend simulado")
+    parser.add_argument('--timeout', type=float, default=60, help="Tiempo máximo por rerun en segundos")
+    args = parser.parse_args()
+
+    print(f"Latencia simulada: {args.latency * 1000:.0f} ms ± {args.jitter * 1000:.0f} ms, "
+          f"{args.agents} agentes, {args.rounds} vueltas por sesión, un proceso por sesión")
+    print(f"{'Sesiones':>8} {'Reruns':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'Media ms':>9} "
+          f"{'Reruns/s':>9} {'RSS MB':>8} {'Errores':>8}")
+
+    failed = False
+    for sessions in args.sessions:
+        level = run_level(sessions, args)
+        failed |= level['failed']
+        print(f"{level['sessions']:>8} {level['reruns']:>7} {_column(level['p50'], 8)} {_column(level['p95'], 8)} "
+              f"{_column(level['p99'], 8)} {_column(level['mean'], 9)} {_column(level['throughput'], 9, 1)} "
+              f"{level['rss_mb']:>8.0f} {len(level['errors']):>8}")
+        if level['failed']:
+            print(f"{'':>8} FALLO: alguna sesión ha dado error; los tiempos de este nivel no son válidos")
+        elif level['reruns']:
+            print(f"{'':>8} consultas por rerun: {level['queries'] / level['reruns']:.1f}")
+        for error in sorted(set(level['errors']))[:5]:
+            print(f"{'':>8} ! {error}")
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import calendar
+from datetime import date
+
+def month_slots(year, month, turnos, reserved=()):
+    """Huecos (fecha, turno_id) del mes que todavía no tienen reserva"""
+    reserved = set(reserved)
+    days = calendar.monthrange(year, month)[1]
+
+    return [
+        (date(year, month, day), turno.id)
+        for day in range(1, days + 1)
+        for turno in turnos
+        if (date(year, month, day), turno.id) not in reserved
+    ]
+
+def distribute_activities(slots, weights):
+    """Reparte las actividades entre los huecos siguiendo sus pesos.
+
+    Cada hueco se asigna a la actividad que más se ha quedado por debajo de su
+    cuota, de modo que la mezcla es proporcional también dentro del mes.
+    """
+    total_weight = sum(weights.values())
+    if total_weight <= 0:
+        raise ValueError("Al menos una actividad debe tener peso positivo")
+
+    shares = {actividad_id: weight / total_weight for actividad_id, weight in weights.items() if weight > 0}
+    counts = {actividad_id: 0 for actividad_id in shares}
+    result = {}
+
+    for index, slot in enumerate(sorted(slots)):
+        actividad_id = max(shares, key=lambda a: shares[a] * (index + 1) - counts[a])
+        counts[actividad_id] += 1
+        result[slot] = actividad_id
+
+    return result
+
+def _match(slots, options, capacity):
+    """Asignación de huecos a monitores con capacidad limitada (caminos de aumento)"""
+    owner = {}
+    assigned = {monitor_id: [] for monitor_id in capacity}
+
+    def try_assign(slot, visited):
+        for monitor_id in options[slot]:
+            if monitor_id in visited:
+                continue
+            visited.add(monitor_id)
+
+            if len(assigned[monitor_id]) < capacity[monitor_id]:
+                assigned[monitor_id].append(slot)
+                owner[slot] = monitor_id
+                return True
+
+            # Intentar mover a otro monitor alguno de los huecos que ya tiene
+            for other in list(assigned[monitor_id]):
+                if try_assign(other, visited):
+                    assigned[monitor_id].remove(other)
+                    assigned[monitor_id].append(slot)
+                    owner[slot] = monitor_id
+                    return True
+
+        return False
+
+    for slot in slots:
+        if not try_assign(slot, set()):
+            return None
+
+    return owner
+
+def assign_monitors(slots, monitor_ids, unavailable=None, existing_load=None):
+    """Asigna un monitor a cada hueco minimizando la carga máxima de cualquier monitor.
+
+    unavailable: monitor_id -> conjunto de fechas (o pares (fecha, turno_id)) en que no puede.
+    existing_load: monitor_id -> reservas que ya tiene en el mes.
+    Devuelve (asignación hueco -> monitor_id, huecos sin ningún monitor disponible).
+    """
+    unavailable = unavailable or {}
+    existing_load = existing_load or {}
+
+    options = {}
+    for slot in slots:
+        fecha, _ = slot
+        available = [
+            m for m in monitor_ids
+            if fecha not in unavailable.get(m, ()) and slot not in unavailable.get(m, ())
+        ]
+        # Primero los monitores con menos carga previa para repartir mejor los empates
+        options[slot] = sorted(available, key=lambda m: existing_load.get(m, 0))
+
+    unassignable = [slot for slot in slots if not options[slot]]
+    # Los huecos más restringidos primero: menos reasignaciones
+    pending = sorted((s for s in slots if options[s]), key=lambda s: (len(options[s]), s))
+
+    if not pending or not monitor_ids:
+        return {}, unassignable + pending
+
+    base = max((existing_load.get(m, 0) for m in monitor_ids), default=0)
+    low = max(base, -(-(len(pending) + sum(existing_load.get(m, 0) for m in monitor_ids)) // len(monitor_ids)))
+    high = base + len(pending)
+    best = None
+
+    # Búsqueda binaria de la menor carga máxima factible
+    while low <= high:
+        limit = (low + high) // 2
+        capacity = {m: max(0, limit - existing_load.get(m, 0)) for m in monitor_ids}
+        owner = _match(pending, options, capacity)
+
+        if owner is not None:
+            best = owner
+            high = limit - 1
+        else:
+            low = limit + 1
+
+    return best or {}, unassignable
+
+def plan_month(year, month, turnos, actividad_weights, monitor_ids, unavailable=None, existing_reservations=()):
+    """Calcula las reservas de un mes: una por (fecha, turno) libre, con actividad y monitor.
+
+    existing_reservations son las reservas ya creadas en el mes (ReservationSlot con fecha,
+    turno_id y monitor_id); sus huecos se respetan y cuentan como carga de su monitor.
+    Devuelve (filas listas para insertar, huecos que no se pudieron cubrir).
+    """
+    reserved = set()
+    existing_load = {}
+    for reserva in existing_reservations:
+        fecha = date.fromisoformat(str(reserva.fecha)[:10])
+        reserved.add((fecha, reserva.turno_id))
+        existing_load[reserva.monitor_id] = existing_load.get(reserva.monitor_id, 0) + 1
+
+    slots = month_slots(year, month, turnos, reserved)
+    activities = distribute_activities(slots, actividad_weights)
+    monitors, unassignable = assign_monitors(slots, monitor_ids, unavailable, existing_load)
+
+    rows = [
+        {
+            'fecha': fecha.isoformat(),
+            'turno_id': turno_id,
+            'actividad_id': activities[(fecha, turno_id)],
+            'monitor_id': monitors[(fecha, turno_id)]
+        }
+        for fecha, turno_id in sorted(monitors)
+    ]
+
+    return rows, unassignable
@@ -0,0 +1,74 @@
+import cProfile
+import os
+import pstats
+import re
+from contextlib import contextmanager
+from datetime import datetime
+import pandas as pd
+import streamlit as st
+from dotenv import load_dotenv
+from auth_utils import is_admin
+
+# Cargar variables de entorno
+load_dotenv()
+
+# Directorio donde se guardan los perfiles (.pstats) para analizarlos después
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+# Número de funciones que se muestran en el informe
+PROFILE_TOP_N = 25
+
+def profiling_requested():
+    """Solo los administradores pueden perfilar, con ?profile=1 o la casilla del menú"""
+    if not is_admin():
+        return False
+
+    default = st.query_params.get("profile") in ("1", "true")
+    return st.sidebar.checkbox("Perfilar esta página", value=default, key="profile_rerun")
+
+def _save_profile(profiler, page_name):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    slug = re.sub(r'[^a-z0-9]+', '_', page_name.lower()).strip('_') or 'pagina'
+    path = os.path.join(PROFILE_DIR, f"{slug}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.pstats")
+    profiler.dump_stats(path)
+    return path
+
+def _top_functions(profiler, limit=PROFILE_TOP_N):
+    stats = pstats.Stats(profiler)
+    rows = []
+
+    for (filename, line, function), (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            'Función': function,
+            'Fichero': f"{os.path.basename(filename)}:{line}",
+            'Llamadas': ncalls,
+            'Tiempo propio (ms)': tottime * 1000,
+            'Tiempo acumulado (ms)': cumtime * 1000
+        })
+
+    df = pd.DataFrame(rows)
+    return df.sort_values('Tiempo acumulado (ms)', ascending=False).head(limit)
+
+def _show_report(profiler, page_name, path):
+    with st.expander(f"Perfil de CPU: {page_name}", expanded=True):
+        st.caption(f"Guardado en {path}")
+        st.dataframe(_top_functions(profiler), use_container_width=True, hide_index=True)
+
+@contextmanager
+def profile_page(page_name):
+    """Perfila la ejecución de la página si se ha solicitado; si no, no añade nada"""
+    if not profiling_requested():
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    except BaseException:
+        # st.rerun/st.stop interrumpen la página: se guarda el perfil sin mostrarlo
+        profiler.disable()
+        _save_profile(profiler, page_name)
+        raise
+    else:
+        profiler.disable()
+        _show_report(profiler, page_name, _save_profile(profiler, page_name))
@@ -0,0 +1,645 @@
+"""Consultas con nombre sobre Supabase.
+
+Cada consulta declara las columnas que necesita (nunca select('*')) y devuelve
+registros compactos (NamedTuple, sin diccionario por instancia) o DataFrames con
+tipos, en lugar de listas de diccionarios completos. Las páginas y tareas llaman
+a estas funciones en vez de construir las consultas con supabase.table(...).
+"""
+import io
+from datetime import date, timedelta
+from typing import NamedTuple, Optional
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+except ImportError:  # pyarrow es opcional: sin él se usa el lector C de pandas
+    pa = None
+
+# Valores permitidos según las restricciones CHECK de init_db.sql
+SECCIONES = ('Motorista', 'Patrullas', 'GOA', 'Atestados')
+GRUPOS = ('G-1', 'G-2', 'G-3')
+
+# Límite de filas por respuesta de PostgREST
+PAGE_SIZE = 1000
+
+# --- Registros ----------------------------------------------------------------
+
+class AgentSummary(NamedTuple):
+    id: str
+    nombre: str
+    apellidos: str
+    nip: str
+
+class AgentRow(NamedTuple):
+    id: str
+    nombre: str
+    apellidos: str
+    nip: str
+    seccion: str
+    grupo: str
+    es_monitor: bool
+
+class AgentTotal(NamedTuple):
+    agente_id: str
+    nombre: str
+    apellidos: str
+    nip: str
+    seccion: str
+    grupo: str
+    total_participaciones: int
+
+class Activity(NamedTuple):
+    id: str
+    nombre: str
+    descripcion: Optional[str]
+    capacidad: Optional[int]
+
+class Turno(NamedTuple):
+    id: str
+    nombre: str
+    hora_inicio: Optional[str]
+    hora_fin: Optional[str]
+
+class ReservationSlot(NamedTuple):
+    fecha: str
+    turno_id: str
+    monitor_id: str
+
+class ReservationDetail(NamedTuple):
+    id: str
+    fecha: str
+    turno_id: str
+    actividad_id: str
+    monitor_id: str
+    turno: Optional[str]
+    hora_inicio: Optional[str]
+    hora_fin: Optional[str]
+    actividad: Optional[str]
+    monitor: Optional[str]
+    capacidad: Optional[int] = None
+
+class CalendarEntry(NamedTuple):
+    id: str
+    fecha: str
+    turno: str
+    hora_inicio: str
+    hora_fin: str
+    actividad: str
+    monitor: str
+    num_participantes: int
+
+class ParticipationRef(NamedTuple):
+    id: str
+    agente_id: str
+
+class WaitlistRef(NamedTuple):
+    id: str
+    agente_id: str
+    created_at: str
+
+class Enrollment(NamedTuple):
+    # 'inscrito', 'ya_inscrito' o 'en_espera'; id de la participación o de la entrada en espera
+    estado: str
+    id: str
+
+class RosterEntry(NamedTuple):
+    id: str
+    agente_id: str
+    nombre: str
+    apellidos: str
+    nip: str
+    seccion: str
+    grupo: str
+
+class HistoryEntry(NamedTuple):
+    id: str
+    reserva_id: str
+    fecha: str
+    turno: Optional[str]
+    hora_inicio: Optional[str]
+    hora_fin: Optional[str]
+    actividad: Optional[str]
+    monitor: Optional[str]
+
+class UserCredentials(NamedTuple):
+    id: str
+    username: str
+    email: str
+    role: str
+    password: str
+
+def _columns(record):
+    return ', '.join(record._fields)
+
+def _decode(record, rows):
+    fields = record._fields
+    return [record._make([row.get(f) for f in fields]) for row in rows or []]
+
+def _full_name(agente):
+    return f"{agente['nombre']} {agente['apellidos']}" if agente else None
+
+# Columnas embebidas de una reserva: turno, actividad y monitor en la misma consulta
+RESERVATION_DETAIL_SELECT = (
+    'id, fecha, turno_id, actividad_id, monitor_id, capacidad, '
+    'turno:turnos(nombre, hora_inicio, hora_fin), '
+    'actividad:actividades(nombre), '
+    'monitor:agentes(nombre, apellidos)'
+)
+
+def _decode_reservation(row):
+    turno = row.get('turno') or {}
+    actividad = row.get('actividad') or {}
+    return ReservationDetail(
+        row['id'], row['fecha'], row.get('turno_id'), row.get('actividad_id'), row.get('monitor_id'),
+        turno.get('nombre'), turno.get('hora_inicio'), turno.get('hora_fin'),
+        actividad.get('nombre'), _full_name(row.get('monitor')), row.get('capacidad')
+    )
+
+# --- DataFrames con tipos -----------------------------------------------------
+
+def records_frame(records, record):
+    """DataFrame con tipos compactos: categorías para sección/grupo, fechas y enteros"""
+    df = pd.DataFrame.from_records(records, columns=list(record._fields))
+    if 'seccion' in df:
+        df['seccion'] = pd.Categorical(df['seccion'], categories=SECCIONES)
+    if 'grupo' in df:
+        df['grupo'] = pd.Categorical(df['grupo'], categories=GRUPOS)
+    if 'es_monitor' in df:
+        df['es_monitor'] = df['es_monitor'].fillna(False).astype(bool)
+    if 'fecha' in df:
+        df['fecha'] = pd.to_datetime(df['fecha'])
+    for column in ('total_participaciones', 'num_participantes'):
+        if column in df:
+            df[column] = df[column].astype('int32')
+    return df
+
+# --- Agentes ------------------------------------------------------------------
+
+def list_agents(supabase):
+    response = supabase.table('agentes').select(_columns(AgentRow)).execute()
+    return _decode(AgentRow, response.data)
+
+def list_agent_summaries(supabase, monitors_only=False):
+    query = supabase.table('agentes').select(_columns(AgentSummary))
+    if monitors_only:
+        query = query.eq('es_monitor', True)
+    response = query.order('apellidos').execute()
+    return _decode(AgentSummary, response.data)
+
+def agent_names(supabase, ids):
+    """Nombre completo de los agentes indicados"""
+    if not ids:
+        return {}
+    response = supabase.table('agentes').select('id, nombre, apellidos').in_('id', list(ids)).execute()
+    return {a['id']: _full_name(a) for a in response.data or []}
+
+def nip_in_use(supabase, nip, exclude_id=None):
+    query = supabase.table('agentes').select('id').eq('nip', nip)
+    if exclude_id is not None:
+        query = query.neq('id', exclude_id)
+    return bool(query.limit(1).execute().data)
+
+def update_agent(supabase, agent_id, changes):
+    response = supabase.table('agentes').update(changes).eq('id', agent_id).execute()
+    return response.data or []
+
+def find_agents_by_nip_or_email(supabase, nips, emails):
+    """Agentes con alguno de los NIPs o emails indicados, en una sola consulta.
+
+    Los emails se comparan sin distinguir mayúsculas (función agentes_por_nip_o_email).
+    """
+    if not nips and not emails:
+        return []
+
+    response = supabase.rpc('agentes_por_nip_o_email', {
+        'p_nips': list(nips),
+        'p_emails': [e.lower() for e in emails]
+    }).execute()
+    return response.data or []
+
+def upsert_agents(supabase, rows):
+    response = supabase.table('agentes').upsert(rows, on_conflict='nip').execute()
+    return response.data or []
+
+# --- Actividades y turnos -----------------------------------------------------
+
+def list_activities(supabase):
+    response = supabase.table('actividades').select(_columns(Activity)).order('nombre').execute()
+    return _decode(Activity, response.data)
+
+def activity_names(supabase, ids):
+    if not ids:
+        return {}
+    response = supabase.table('actividades').select('id, nombre').in_('id', list(ids)).execute()
+    return {a['id']: a['nombre'] for a in response.data or []}
+
+def activity_name_in_use(supabase, nombre):
+    return bool(supabase.table('actividades').select('id').eq('nombre', nombre).limit(1).execute().data)
+
+def insert_activity(supabase, data):
+    return supabase.table('actividades').insert(data).execute().data or []
+
+def update_activity(supabase, activity_id, data):
+    return supabase.table('actividades').update(data).eq('id', activity_id).execute().data or []
+
+def list_turnos(supabase):
+    response = supabase.table('turnos').select(_columns(Turno)).order('hora_inicio').execute()
+    return _decode(Turno, response.data)
+
+# --- Reservas -----------------------------------------------------------------
+
+def _calendar_entries(rows):
+    entries = []
+    for reserva in rows or []:
+        turno = reserva.get('turno')
+        actividad = reserva.get('actividad')
+        conteo = reserva.get('participaciones') or [{'count': 0}]
+        entries.append(CalendarEntry(
+            reserva['id'],
+            reserva['fecha'],
+            turno['nombre'] if turno else 'Desconocido',
+            turno['hora_inicio'] if turno else 'Desconocido',
+            turno['hora_fin'] if turno else 'Desconocido',
+            actividad['nombre'] if actividad else 'Desconocida',
+            _full_name(reserva.get('monitor')) or 'Desconocido',
+            conteo[0]['count']
+        ))
+    return entries
+
+def reservation_calendar(supabase, start_date, end_date):
+    """Reservas del rango con turno, actividad, monitor y número de participantes en una consulta.
+
+    Si el rango empieza antes del límite de archivo se añaden las reservas archivadas.
+    """
+    response = supabase.table('reservas').select(
+        'id, fecha, turno:turnos(nombre, hora_inicio, hora_fin), actividad:actividades(nombre), '
+        'monitor:agentes(nombre, apellidos), participaciones(count)'
+    ).gte('fecha', start_date.isoformat()).lte('fecha', end_date.isoformat()).order('fecha').execute()
+    entries = _calendar_entries(response.data)
+
+    boundary = archived_until(supabase)
+    if boundary is not None and start_date < boundary:
+        archived = supabase.table('reservas_archivo').select(
+            'id, fecha, turno:turnos(nombre, hora_inicio, hora_fin), actividad:actividades(nombre), '
+            'monitor:agentes(nombre, apellidos), participaciones:participaciones_archivo(count)'
+        ).gte('fecha', start_date.isoformat()).lt('fecha', min(end_date + timedelta(days=1), boundary).isoformat()).order('fecha').execute()
+        entries = _calendar_entries(archived.data) + entries
+
+    return entries
+
+def reservations_on(supabase, fecha):
+    """Reservas de un día con turno, actividad y monitor"""
+    response = supabase.table('reservas').select(RESERVATION_DETAIL_SELECT).eq('fecha', fecha.isoformat()).execute()
+    return [_decode_reservation(r) for r in response.data or []]
+
+def get_reservation(supabase, reserva_id):
+    response = supabase.table('reservas').select(RESERVATION_DETAIL_SELECT).eq('id', reserva_id).execute()
+    return _decode_reservation(response.data[0]) if response.data else None
+
+def get_slot_reservation(supabase, fecha, turno_id):
+    response = supabase.table('reservas').select(RESERVATION_DETAIL_SELECT).eq(
+        'fecha', fecha.isoformat()).eq('turno_id', turno_id).execute()
+    return _decode_reservation(response.data[0]) if response.data else None
+
+def day_rosters(supabase, fecha):
+    """Reservas de un día con sus participantes, en una sola consulta.
+
+    Devuelve una lista de (ReservationDetail, [RosterEntry]) ordenada por hora de inicio.
+    """
+    response = supabase.table('reservas').select(
+        RESERVATION_DETAIL_SELECT + ', participaciones(id, agente:agentes(id, nombre, apellidos, nip, seccion, grupo))'
+    ).eq('fecha', fecha.isoformat()).execute()
+
+    rosters = []
+    for row in response.data or []:
+        roster = [
+            RosterEntry(p['id'], a['id'], a['nombre'], a['apellidos'], a['nip'], a['seccion'], a['grupo'])
+            for p in row.get('participaciones') or []
+            for a in [p.get('agente')] if a
+        ]
+        roster.sort(key=lambda entry: (entry.apellidos, entry.nombre))
+        rosters.append((_decode_reservation(row), roster))
+
+    rosters.sort(key=lambda item: item[0].hora_inicio or '')
+    return rosters
+
+def slot_taken(supabase, fecha, turno_id):
+    response = supabase.table('reservas').select('id').eq('fecha', fecha.isoformat()).eq('turno_id', turno_id).limit(1).execute()
+    return bool(response.data)
+
+def reservation_slots(supabase, start_date, end_date):
+    """Fecha, turno y monitor de las reservas del rango (para planificar)"""
+    response = supabase.table('reservas').select(_columns(ReservationSlot)).gte(
+        'fecha', start_date.isoformat()).lte('fecha', end_date.isoformat()).execute()
+    return _decode(ReservationSlot, response.data)
+
+def insert_reservations(supabase, rows):
+    """Inserta una o varias reservas en una sola petición"""
+    return supabase.table('reservas').insert(rows).execute().data or []
+
+# --- Participaciones ----------------------------------------------------------
+
+def reservation_enrollment(supabase, reserva_id):
+    """Participaciones y lista de espera (por orden de llegada) de una reserva en una consulta"""
+    response = supabase.table('reservas').select(
+        f'participaciones({_columns(ParticipationRef)}), lista_espera({_columns(WaitlistRef)})'
+    ).eq('id', reserva_id).execute()
+    if not response.data:
+        return [], []
+
+    row = response.data[0]
+    espera = sorted(_decode(WaitlistRef, row.get('lista_espera')), key=lambda e: (e.created_at, e.id))
+    return _decode(ParticipationRef, row.get('participaciones')), espera
+
+def reservation_roster(supabase, reserva_id):
+    """Participantes de una reserva con los datos de cada agente en una consulta"""
+    response = supabase.table('participaciones').select(
+        'id, agente:agentes(id, nombre, apellidos, nip, seccion, grupo)'
+    ).eq('reserva_id', reserva_id).execute()
+
+    roster = []
+    for p in response.data or []:
+        agente = p.get('agente')
+        if agente:
+            roster.append(RosterEntry(p['id'], agente['id'], agente['nombre'], agente['apellidos'],
+                                      agente['nip'], agente['seccion'], agente['grupo']))
+    return roster
+
+def enroll_agent(supabase, reserva_id, agente_id):
+    """Inscribe a un agente respetando el aforo, en una sola escritura (función inscribir_agente).
+
+    Si la reserva está completa el agente queda en la lista de espera.
+    """
+    response = supabase.rpc('inscribir_agente', {'p_reserva_id': reserva_id, 'p_agente_id': agente_id}).execute()
+    return _decode(Enrollment, response.data)[0] if response.data else None
+
+def enroll_agents(supabase, rows):
+    """Inscribe un lote de {reserva_id, agente_id} en una petición; devuelve el estado de cada fila"""
+    response = supabase.rpc('inscribir_agentes', {'filas': rows}).execute()
+    return response.data or []
+
+def withdraw_participation(supabase, participacion_id):
+    """Retira una participación y devuelve (retirada, [ParticipationRef promovidas desde la espera])"""
+    response = supabase.rpc('retirar_participacion', {'p_participacion_id': participacion_id}).execute()
+    rows = response.data or []
+    retirada = next((ParticipationRef(r['id'], r['agente_id']) for r in rows if r['estado'] == 'retirada'), None)
+    promovidas = [ParticipationRef(r['id'], r['agente_id']) for r in rows if r['estado'] == 'promovida']
+    return retirada, promovidas
+
+def leave_waitlist(supabase, espera_id):
+    return supabase.table('lista_espera').delete().eq('id', espera_id).execute().data or []
+
+def update_reservation_capacity(supabase, reserva_id, capacidad):
+    """Cambia el aforo y devuelve (actualizada, [ParticipationRef promovidas desde la espera])"""
+    response = supabase.rpc('cambiar_aforo', {'p_reserva_id': reserva_id, 'p_capacidad': capacidad}).execute()
+    rows = response.data or []
+    actualizada = any(r['estado'] == 'actualizada' for r in rows)
+    promovidas = [ParticipationRef(r['id'], r['agente_id']) for r in rows if r['estado'] == 'promovida']
+    return actualizada, promovidas
+
+def _history_page(supabase, view, agente_id, cursor, limit):
+    query = supabase.table(view).select(_columns(HistoryEntry)).eq('agente_id', agente_id)
+
+    if cursor:
+        fecha, last_id = cursor
+        query = query.or_(f"fecha.lt.{fecha},and(fecha.eq.{fecha},id.lt.{last_id})")
+
+    response = query.order('fecha', desc=True).order('id', desc=True).limit(limit).execute()
+    return _decode(HistoryEntry, response.data)
+
+def participation_history_page(supabase, agente_id, cursor=None, page_size=25):
+    """Página del historial de un agente ordenada por (fecha, id) descendente, sin OFFSET.
+
+    Todas las fechas archivadas son anteriores a las de la tabla activa, así que
+    cuando se acaban las filas activas la página se completa con el archivo usando
+    el mismo cursor.
+    """
+    # Se pide una fila extra para saber si existe una página siguiente
+    rows = _history_page(supabase, 'historial_participaciones', agente_id, cursor, page_size + 1)
+
+    if len(rows) <= page_size and archived_until(supabase) is not None:
+        rows += _history_page(supabase, 'historial_participaciones_archivo', agente_id, cursor,
+                              page_size + 1 - len(rows))
+
+    return rows[:page_size], len(rows) > page_size
+
+def participation_dates_since(supabase, start_date):
+    """(agente_id, fecha) de todas las participaciones desde start_date, paginando"""
+    rows = []
+    start = 0
+    while True:
+        response = supabase.table('historial_participaciones').select('agente_id, fecha').gte(
+            'fecha', start_date.isoformat()).order('id').range(start, start + PAGE_SIZE - 1).execute()
+        page = response.data or []
+        rows.extend((r['agente_id'], r['fecha']) for r in page)
+        if len(page) < PAGE_SIZE:
+            return rows
+        start += PAGE_SIZE
+
+def last_participations(supabase, agente_ids=None):
+    """Última participación de cada agente (o solo de agente_ids) según rotacion_agentes"""
+    query = supabase.table('rotacion_agentes').select('agente_id, ultima_participacion')
+    if agente_ids is not None:
+        query = query.in_('agente_id', list(agente_ids))
+    response = query.execute()
+    return {r['agente_id']: r['ultima_participacion'] for r in response.data or []}
+
+# --- Agregados (funciones SQL) ------------------------------------------------
+
+def participation_totals(supabase, start_date, end_date):
+    """Total de participaciones de cada agente en el rango (agregado en la base de datos)"""
+    agentes = supabase.table('agentes').select('id, nombre, apellidos, nip, seccion, grupo').execute().data or []
+    if not agentes:
+        return []
+
+    totales = _participation_counts(supabase, start_date, end_date)
+    return [
+        AgentTotal(a['id'], a['nombre'], a['apellidos'], a['nip'], a['seccion'], a['grupo'], totales.get(a['id'], 0))
+        for a in agentes
+    ]
+
+def _participation_counts(supabase, start_date, end_date):
+    response = supabase.rpc('totales_participacion', {
+        'fecha_inicio': start_date.isoformat(),
+        'fecha_fin': end_date.isoformat()
+    }).execute()
+    return {t['agente_id']: t['total'] for t in response.data or []}
+
+def attendance_buckets(supabase, start_date, end_date, bucket):
+    response = supabase.rpc('participaciones_por_periodo', {
+        'fecha_inicio': start_date.isoformat(),
+        'fecha_fin': end_date.isoformat(),
+        'intervalo': bucket
+    }).execute()
+    return response.data or []
+
+def reservation_buckets(supabase, start_date, end_date, bucket):
+    response = supabase.rpc('reservas_por_periodo', {
+        'fecha_inicio': start_date.isoformat(),
+        'fecha_fin': end_date.isoformat(),
+        'intervalo': bucket
+    }).execute()
+    return response.data or []
+
+# --- Usuarios, auditoría y versiones -----------------------------------------
+
+def get_user_credentials(supabase, email):
+    response = supabase.table('usuarios').select(_columns(UserCredentials)).eq('email', email).limit(1).execute()
+    rows = _decode(UserCredentials, response.data)
+    return rows[0] if rows else None
+
+def get_user_id(supabase, email):
+    response = supabase.table('usuarios').select('id').eq('email', email).limit(1).execute()
+    return response.data[0]['id'] if response.data else None
+
+def update_user_password(supabase, user_id, password, updated_at):
+    response = supabase.table('usuarios').update({'password': password, 'updated_at': updated_at}).eq('id', user_id).execute()
+    return bool(response.data)
+
+def insert_audit_entries(supabase, entries):
+    supabase.table('auditoria').insert(entries).execute()
+
+def table_versions(supabase, tables):
+    """Fecha de última modificación de cada tabla en una sola consulta"""
+    response = supabase.table('versiones_datos').select('tabla, updated_at').in_('tabla', list(tables)).execute()
+    return {v['tabla']: v['updated_at'] for v in response.data or []}
+
+def archived_until(supabase):
+    """Primer día que sigue en las tablas activas; lo anterior está en las de archivo (None si no hay)"""
+    response = supabase.table('archivo_estado').select('archivado_hasta').eq('id', 1).execute()
+    value = response.data[0]['archivado_hasta'] if response.data else None
+    return date.fromisoformat(value) if value else None
+
+def archive_until(supabase, limite):
+    """Mueve al archivo las reservas anteriores a limite (día 1 de un mes); devuelve (reservas, participaciones)"""
+    response = supabase.rpc('archivar_hasta', {'fecha_limite': limite.isoformat()}).execute()
+    row = response.data[0] if response.data else {'reservas': 0, 'participaciones': 0}
+    return row['reservas'], row['participaciones']
+
+# --- Lecturas masivas en CSV --------------------------------------------------
+#
+# Las tablas grandes se piden a PostgREST como text/csv y se decodifican
+# directamente en columnas con tipo, sin pasar por una lista de diccionarios.
+
+AGENT_DTYPES = {
+    'id': 'str',
+    'nombre': 'str',
+    'apellidos': 'str',
+    'nip': 'str',
+    'seccion': pd.CategoricalDtype(SECCIONES),
+    'grupo': pd.CategoricalDtype(GRUPOS),
+    # Columna sin NOT NULL: booleano con nulos de pandas
+    'es_monitor': 'boolean',
+}
+
+HISTORY_DTYPES = {
+    'id': 'str',
+    'agente_id': 'str',
+    'reserva_id': 'str',
+    'fecha': 'datetime64[ns]',
+    'turno': 'category',
+    'hora_inicio': 'category',
+    'hora_fin': 'category',
+    'actividad': 'category',
+    'monitor': 'category',
+}
+
+# Representación de los booleanos en la salida CSV de PostgreSQL
+CSV_TRUE_VALUES = ['t', 'true']
+CSV_FALSE_VALUES = ['f', 'false']
+
+def _arrow_type(dtype):
+    if dtype in ('bool', 'boolean'):
+        return pa.bool_()
+    if dtype == 'datetime64[ns]':
+        return pa.timestamp('s')
+    return pa.string()
+
+def _decode_csv_arrow(data, dtypes):
+    """Lector CSV multihilo de Arrow con los tipos de cada columna declarados (sin inferencia)"""
+    table = pa_csv.read_csv(pa.py_buffer(data), convert_options=pa_csv.ConvertOptions(
+        column_types={c: _arrow_type(dtype) for c, dtype in dtypes.items()},
+        true_values=CSV_TRUE_VALUES,
+        false_values=CSV_FALSE_VALUES,
+        strings_can_be_null=True,
+    ))
+    df = table.to_pandas()
+    return df.astype({c: dtype for c, dtype in dtypes.items() if dtype not in ('bool', 'datetime64[ns]', 'str')})
+
+def decode_csv(text, dtypes):
+    """Decodifica una respuesta CSV de PostgREST en un DataFrame con los tipos indicados"""
+    if not text or not isinstance(text, str):
+        return pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in dtypes.items()})
+
+    if pa is not None:
+        return _decode_csv_arrow(text.encode('utf-8'), dtypes)
+
+    dates = [c for c, dtype in dtypes.items() if dtype == 'datetime64[ns]']
+    # BytesIO comparte el buffer de los bytes; StringIO copiaría el texto a 4 bytes por carácter
+    df = pd.read_csv(
+        io.BytesIO(text.encode('utf-8')),
+        dtype={c: dtype for c, dtype in dtypes.items() if c not in dates},
+        true_values=CSV_TRUE_VALUES,
+        false_values=CSV_FALSE_VALUES,
+        keep_default_na=False,
+        na_values=[''],
+    )
+    for column in dates:
+        df[column] = pd.to_datetime(df[column], format='ISO8601')
+    return df
+
+def _read_csv_pages(build_query, dtypes, page_size=PAGE_SIZE):
+    """Lee todas las páginas de una consulta en CSV; build_query crea la consulta filtrada y ordenada"""
+    frames = []
+    start = 0
+    while True:
+        text = build_query().range(start, start + page_size - 1).csv().execute().data
+        frame = decode_csv(text, dtypes)
+        frames.append(frame)
+        if len(frame) < page_size:
+            break
+        start += page_size
+
+    if len(frames) == 1:
+        return frames[0]
+
+    # Cada página infiere sus propias categorías: se unifican al concatenar
+    df = pd.concat(frames, ignore_index=True)
+    return df.astype({c: dtype for c, dtype in dtypes.items() if dtype == 'category'})
+
+def agents_frame(supabase):
+    """Tabla completa de agentes como DataFrame con tipos"""
+    columns = ', '.join(AGENT_DTYPES)
+    return _read_csv_pages(lambda: supabase.table('agentes').select(columns).order('id'), AGENT_DTYPES)
+
+def participation_history_frame(supabase, start_date, end_date):
+    """Participaciones del rango con fecha, turno, actividad y monitor como DataFrame con tipos.
+
+    Si el rango empieza antes del límite de archivo se leen también las archivadas.
+    """
+    columns = ', '.join(HISTORY_DTYPES)
+    views = ['historial_participaciones']
+    boundary = archived_until(supabase)
+    if boundary is not None and start_date < boundary:
+        views.append('historial_participaciones_archivo')
+
+    frames = [
+        _read_csv_pages(
+            lambda view=view: supabase.table(view).select(columns).gte(
+                'fecha', start_date.isoformat()).lte('fecha', end_date.isoformat()).order('id'),
+            HISTORY_DTYPES
+        )
+        for view in views
+    ]
+    if len(frames) == 1:
+        return frames[0]
+    df = pd.concat(frames, ignore_index=True)
+    return df.astype({c: dtype for c, dtype in HISTORY_DTYPES.items() if dtype == 'category'})
+
+def participation_totals_frame(supabase, start_date, end_date):
+    """Agentes con su total de participaciones en el rango, como DataFrame con tipos"""
+    df = agents_frame(supabase).drop(columns='es_monitor').rename(columns={'id': 'agente_id'})
+    totales = _participation_counts(supabase, start_date, end_date)
+    df['total_participaciones'] = df['agente_id'].map(totales).fillna(0).astype('int32')
+    return df
@@ -0,0 +1,118 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from dotenv import load_dotenv
+from db_utils import get_supabase_client
+import repository
+
+# Cargar variables de entorno
+load_dotenv()
+
+# Días anteriores y posteriores que se precargan al consultar una fecha
+PREFETCH_DAYS = int(os.getenv("PREFETCH_DAYS", "3"))
+# Número máximo de días guardados en la caché (se descartan los menos usados)
+PREFETCH_MAX_ENTRIES = int(os.getenv("PREFETCH_MAX_ENTRIES", "60"))
+# Segundos durante los que un día cacheado se considera actual
+PREFETCH_TTL_SECONDS = int(os.getenv("PREFETCH_TTL_SECONDS", "120"))
+
+def fetch_day_summaries(supabase, fecha):
+    """Pares (id, descripción) de las reservas de un día, obtenidos en una única consulta"""
+    summaries = []
+    for reserva in repository.reservations_on(supabase, fecha):
+        turno_info = f"{reserva.turno} ({reserva.hora_inicio} - {reserva.hora_fin})" if reserva.turno else "Turno desconocido"
+        actividad_info = reserva.actividad or "Actividad desconocida"
+
+        summaries.append((reserva.id, f"{fecha} - {turno_info} - {actividad_info}"))
+
+    return summaries
+
+class DaySummaryCache:
+    """Caché LRU acotada de resúmenes de reservas por día, con caducidad y precarga"""
+
+    def __init__(self, max_entries=PREFETCH_MAX_ENTRIES, ttl_seconds=PREFETCH_TTL_SECONDS, workers=2):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        # Generación de cada día: invalidate la incrementa y las cargas lanzadas antes no se guardan
+        self._generations = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+
+    def _fresh(self, fecha):
+        entry = self._entries.get(fecha)
+        if entry is None:
+            return None
+
+        loaded_at, summaries = entry
+        if time.time() - loaded_at > self.ttl_seconds:
+            del self._entries[fecha]
+            return None
+
+        self._entries.move_to_end(fecha)
+        return summaries
+
+    def _store(self, fecha, generation, summaries):
+        with self._lock:
+            if self._generations.get(fecha, 0) != generation:
+                return
+            self._entries[fecha] = (time.time(), summaries)
+            self._entries.move_to_end(fecha)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._in_flight.pop(fecha, None)
+
+    def _load(self, fecha, generation):
+        try:
+            summaries = fetch_day_summaries(get_supabase_client(), fecha)
+        except Exception:
+            with self._lock:
+                if self._generations.get(fecha, 0) == generation:
+                    self._in_flight.pop(fecha, None)
+            raise
+
+        self._store(fecha, generation, summaries)
+        return summaries
+
+    def get(self, fecha):
+        """Devuelve los resúmenes del día, esperando a una precarga en curso si la hay"""
+        with self._lock:
+            summaries = self._fresh(fecha)
+            if summaries is not None:
+                return summaries
+            future = self._in_flight.get(fecha)
+            generation = self._generations.get(fecha, 0)
+
+        if future is not None:
+            try:
+                return future.result()
+            except Exception:
+                pass
+
+        return self._load(fecha, generation)
+
+    def prefetch_around(self, fecha, days=PREFETCH_DAYS):
+        """Precarga en segundo plano los días cercanos que no estén ya en caché"""
+        for offset in range(1, days + 1):
+            for day in (fecha + timedelta(days=offset), fecha - timedelta(days=offset)):
+                with self._lock:
+                    if self._fresh(day) is not None or day in self._in_flight:
+                        continue
+                    self._in_flight[day] = self._executor.submit(self._load, day, self._generations.get(day, 0))
+
+    def invalidate(self, fecha):
+        """Descarta el día tras crear o modificar una de sus reservas.
+
+        Una precarga en curso puede haber leído el día antes del cambio: se deja de
+        esperar y su resultado no se guarda.
+        """
+        with self._lock:
+            self._entries.pop(fecha, None)
+            self._in_flight.pop(fecha, None)
+            self._generations[fecha] = self._generations.get(fecha, 0) + 1
+
+# Caché compartida por todas las sesiones del proceso
+day_cache = DaySummaryCache()
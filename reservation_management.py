@@ -1,14 +1,45 @@
+import calendar
 import streamlit as st
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from db_utils import get_supabase_client
 from auth_utils import get_current_user
+from reservation_cache import day_cache
+from audit import record_change
+from planner import plan_month
+from rotation_index import rotation_index, ROTATION_WINDOW_DAYS
+from state_store import (get_reservation_state, get_agents_catalog, apply_enrollment, apply_participant_removed,
+                         apply_waitlist_removed, apply_capacity_changed)
+import repository
+from deadlines import load_section, load_sections, start_sections, show_pending, show_stale
+from repository import CalendarEntry
+
+def _start_tab_loads(supabase):
+    """Lanza a la vez las consultas de todas las pestañas, con los filtros que tienen en la sesión"""
+    today = datetime.now().date()
+    start_date = st.session_state.get('calendar_start', today)
+    end_date = st.session_state.get('calendar_end', today + timedelta(days=30))
+    fecha_busqueda = st.session_state.get('reservations_day', today)
+    
+    sections = [
+        (('Actividades',), repository.list_activities, (supabase,)),
+        (('Turnos',), repository.list_turnos, (supabase,)),
+        (('Monitores',), repository.list_agent_summaries, (supabase, True)),
+        (('Reservas del día', fecha_busqueda), day_cache.get, (fecha_busqueda,)),
+    ]
+    if start_date <= end_date:
+        sections.append((('Calendario', start_date, end_date), repository.reservation_calendar,
+                         (supabase, start_date, end_date)))
+    start_sections(*sections)
 
 def show_reservation_management():
     st.title("Reservas del Gimnasio")
     
+    # Todas las pestañas se dibujan en cada rerun: sus consultas comparten el plazo de la página
+    _start_tab_loads(get_supabase_client())
+    
     # Tabs para organizar la interfaz
-    tabs = st.tabs(["Calendario de Reservas", "Nueva Reserva", "Gestionar Reservas"])
+    tabs = st.tabs(["Calendario de Reservas", "Nueva Reserva", "Gestionar Reservas", "Planificación Mensual"])
     
     # Tab de Calendario de Reservas
     with tabs[0]:
@@ -21,6 +52,10 @@ def show_reservation_management():
     # Tab de Gestión de Reservas
     with tabs[2]:
         show_reservation_management_tab()
+    
+    # Tab de Planificación Mensual
+    with tabs[3]:
+        show_monthly_planner()
 
 def show_reservation_calendar():
     st.header("Calendario de Reservas")
@@ -30,68 +65,49 @@ def show_reservation_calendar():
     # Filtros de fecha para el calendario
     col1, col2 = st.columns(2)
     with col1:
-        start_date = st.date_input("Fecha Inicio", value=datetime.now().date())
+        start_date = st.date_input("Fecha Inicio", value=datetime.now().date(), key="calendar_start")
     with col2:
-        end_date = st.date_input("Fecha Fin", value=(datetime.now() + timedelta(days=30)).date())
+        end_date = st.date_input("Fecha Fin", value=(datetime.now() + timedelta(days=30)).date(), key="calendar_end")
     
     if start_date > end_date:
         st.error("La fecha de inicio debe ser anterior a la fecha de fin")
         return
     
-    # Obtener las reservas directamente, sin usar RPC
-    reservas = []
+    reservas, age = load_section(('Calendario', start_date, end_date), repository.reservation_calendar, supabase, start_date, end_date)
     
-    # Consultar todas las reservas en el rango de fechas
-    reservas_response = supabase.table('reservas').select('*').gte('fecha', start_date.isoformat()).lte('fecha', end_date.isoformat()).execute()
-    
-    if reservas_response.data:
-        # Para cada reserva, obtener información adicional
-        for reserva in reservas_response.data:
-            # Obtener datos del turno
-            turno_response = supabase.table('turnos').select('*').eq('id', reserva['turno_id']).execute()
-            turno = turno_response.data[0] if turno_response.data else None
-            
-            # Obtener datos de la actividad
-            actividad_response = supabase.table('actividades').select('*').eq('id', reserva['actividad_id']).execute()
-            actividad = actividad_response.data[0] if actividad_response.data else None
-            
-            # Obtener datos del monitor
-            monitor_response = supabase.table('agentes').select('*').eq('id', reserva['monitor_id']).execute()
-            monitor = monitor_response.data[0] if monitor_response.data else None
-            
-            # Obtener participantes
-            participantes_response = supabase.table('participaciones').select('*').eq('reserva_id', reserva['id']).execute()
-            num_participantes = len(participantes_response.data) if participantes_response.data else 0
-            
-            # Añadir información completa a la lista de reservas
-            reservas.append({
-                'id': reserva['id'],
-                'fecha': reserva['fecha'],
-                'turno': turno['nombre'] if turno else 'Desconocido',
-                'hora_inicio': turno['hora_inicio'] if turno else 'Desconocido',
-                'hora_fin': turno['hora_fin'] if turno else 'Desconocido',
-                'actividad': actividad['nombre'] if actividad else 'Desconocida',
-                'monitor': f"{monitor['nombre']} {monitor['apellidos']}" if monitor else 'Desconocido',
-                'num_participantes': num_participantes
-            })
+    if reservas is None:
+        show_pending("Calendario de reservas")
+        return
     
     if not reservas:
         st.info(f"No hay reservas programadas entre {start_date} y {end_date}")
         return
     
     # Crear DataFrame para mostrar las reservas
-    df = pd.DataFrame(reservas)
+    df = repository.records_frame(reservas, CalendarEntry)
     
     # Convertir fecha para mejor visualización
-    df['fecha'] = pd.to_datetime(df['fecha']).dt.strftime('%d/%m/%Y')
+    df['fecha'] = df['fecha'].dt.strftime('%d/%m/%Y')
     
     # Organizar las columnas para mejor visualización
     df_display = df[['fecha', 'turno', 'hora_inicio', 'hora_fin', 'actividad', 'monitor', 'num_participantes']]
     df_display.columns = ['Fecha', 'Turno', 'Hora Inicio', 'Hora Fin', 'Actividad', 'Monitor', 'Participantes']
     
     # Mostrar la tabla de reservas
+    show_stale(age)
     st.dataframe(df_display, use_container_width=True)
 
+def _form_catalogs(supabase):
+    """Actividades, turnos y monitores en paralelo con el plazo de la página (None si no llegan)"""
+    (actividades, _), (turnos, _), (monitores, _) = load_sections(
+        (('Actividades',), repository.list_activities, (supabase,)),
+        (('Turnos',), repository.list_turnos, (supabase,)),
+        (('Monitores',), repository.list_agent_summaries, (supabase, True)),
+    )
+    if actividades is None or turnos is None or monitores is None:
+        return None
+    return actividades, turnos, monitores
+
 def show_new_reservation():
     st.header("Nueva Reserva")
     
@@ -102,27 +118,23 @@ def show_new_reservation():
         st.error("Debes iniciar sesión para crear reservas")
         return
     
-    # Obtener datos necesarios para el formulario
-    # Actividades
-    actividades_response = supabase.table('actividades').select('*').execute()
-    actividades = actividades_response.data if actividades_response.data else []
+    # Obtener datos necesarios para el formulario: actividades, turnos y monitores
+    catalogs = _form_catalogs(supabase)
+    
+    if catalogs is None:
+        show_pending("Datos de la nueva reserva")
+        return
+    
+    actividades, turnos, monitores = catalogs
     
     if not actividades:
         st.error("No hay actividades registradas en el sistema")
         return
     
-    # Turnos
-    turnos_response = supabase.table('turnos').select('*').execute()
-    turnos = turnos_response.data if turnos_response.data else []
-    
     if not turnos:
         st.error("No hay turnos registrados en el sistema")
         return
     
-    # Monitores (agentes que son monitores)
-    monitores_response = supabase.table('agentes').select('*').eq('es_monitor', True).execute()
-    monitores = monitores_response.data if monitores_response.data else []
-    
     if not monitores:
         st.error("No hay monitores registrados en el sistema")
         return
@@ -133,25 +145,27 @@ def show_new_reservation():
         fecha = st.date_input("Fecha", min_value=datetime.now().date())
         
         # Turno
-        turno_options = {turno['id']: f"{turno['nombre']} ({turno['hora_inicio']} - {turno['hora_fin']})" for turno in turnos}
+        turno_options = {turno.id: f"{turno.nombre} ({turno.hora_inicio} - {turno.hora_fin})" for turno in turnos}
         turno_id = st.selectbox("Turno", options=list(turno_options.keys()), format_func=lambda x: turno_options[x])
         
         # Actividad
-        actividad_options = {actividad['id']: actividad['nombre'] for actividad in actividades}
+        actividad_options = {actividad.id: actividad.nombre for actividad in actividades}
         actividad_id = st.selectbox("Actividad", options=list(actividad_options.keys()), format_func=lambda x: actividad_options[x])
         
         # Monitor
-        monitor_options = {monitor['id']: f"{monitor['nombre']} {monitor['apellidos']} ({monitor['nip']})" for monitor in monitores}
+        monitor_options = {monitor.id: f"{monitor.nombre} {monitor.apellidos} ({monitor.nip})" for monitor in monitores}
         monitor_id = st.selectbox("Monitor", options=list(monitor_options.keys()), format_func=lambda x: monitor_options[x])
         
+        # Aforo propio de esta reserva; si no se indica se usa el de la actividad
+        capacidad = st.number_input("Aforo (0 = el de la actividad)", min_value=0, step=1, value=0)
+        
         # Botón para enviar el formulario
         submit = st.form_submit_button("Crear Reserva")
         
         if submit:
+            # Las lecturas y escrituras tras pulsar un botón van sin plazo: necesitan el dato actual
             # Verificar si ya existe una reserva para esa fecha y turno
-            check_response = supabase.table('reservas').select('*').eq('fecha', fecha.isoformat()).eq('turno_id', turno_id).execute()
-            
-            if check_response.data and len(check_response.data) > 0:
+            if repository.slot_taken(supabase, fecha, turno_id):
                 st.error(f"Ya existe una reserva para el {fecha} en ese turno")
             else:
                 # Crear la reserva
@@ -161,56 +175,148 @@ def show_new_reservation():
                     'actividad_id': actividad_id,
                     'monitor_id': monitor_id
                 }
+                if capacidad:
+                    data['capacidad'] = capacidad
                 
-                response = supabase.table('reservas').insert(data).execute()
+                created = repository.insert_reservations(supabase, data)
                 
-                if response.data:
+                if created:
+                    record_change('reservas', 'INSERT', created[0]['id'], despues=created[0])
+                    day_cache.invalidate(fecha)
                     st.success(f"Reserva creada correctamente para el {fecha}")
                     # Mostrar botón para gestionar participantes
-                    reserva_id = response.data[0]['id']
+                    reserva_id = created[0]['id']
                     st.session_state.created_reservation_id = reserva_id
                     st.info("Puedes añadir participantes en la pestaña 'Gestionar Reservas'")
                 else:
                     st.error("Error al crear la reserva")
 
-def show_reservation_management_tab():
-    st.header("Gestionar Reservas")
+def show_monthly_planner():
+    st.header("Planificación Mensual")
     
     supabase = get_supabase_client()
     
-    # Permitir buscar una reserva existente
-    fecha_busqueda = st.date_input("Buscar reservas por fecha", value=datetime.now().date())
+    # Datos necesarios para la planificación
+    catalogs = _form_catalogs(supabase)
     
-    # Obtener reservas para la fecha seleccionada
-    reservas_response = supabase.table('reservas').select('*').eq('fecha', fecha_busqueda.isoformat()).execute()
-    reservas = reservas_response.data if reservas_response.data else []
+    if catalogs is None:
+        show_pending("Datos de la planificación")
+        return
     
-    if not reservas:
-        st.info(f"No hay reservas para el {fecha_busqueda}")
+    actividades, turnos, monitores = catalogs
+    
+    if not actividades or not turnos or not monitores:
+        st.error("Se necesitan actividades, turnos y monitores registrados para planificar")
         return
     
-    # Preparar opciones para el selectbox
-    reservas_info = []
-    for reserva in reservas:
-        # Obtener datos del turno
-        turno_response = supabase.table('turnos').select('*').eq('id', reserva['turno_id']).execute()
-        turno = turno_response.data[0] if turno_response.data else None
+    # Mes a planificar (el actual y los once siguientes)
+    today = datetime.now().date()
+    months = [((today.year * 12 + today.month - 1 + i) // 12, (today.month - 1 + i) % 12 + 1) for i in range(12)]
+    year, month = st.selectbox("Mes", options=months, format_func=lambda m: f"{m[1]:02d}/{m[0]}", key="planner_month")
+    days_in_month = calendar.monthrange(year, month)[1]
+    month_days = [date(year, month, d) for d in range(1, days_in_month + 1)]
+    
+    # Peso de cada actividad en la mezcla del mes
+    st.subheader("Mezcla de Actividades")
+    weight_cols = st.columns(len(actividades))
+    weights = {}
+    for col, actividad in zip(weight_cols, actividades):
+        with col:
+            weights[actividad.id] = st.number_input(actividad.nombre, min_value=0, value=1, step=1, key=f"planner_weight_{actividad.id}")
+    
+    # Días en que cada monitor no está disponible
+    unavailable = {}
+    with st.expander("Indisponibilidad de Monitores"):
+        for monitor in monitores:
+            unavailable[monitor.id] = set(st.multiselect(
+                f"{monitor.nombre} {monitor.apellidos} ({monitor.nip})",
+                options=month_days,
+                format_func=lambda d: d.strftime('%d/%m'),
+                key=f"planner_unavailable_{monitor.id}_{year}_{month}"
+            ))
+    
+    if st.button("Calcular Planificación"):
+        if sum(weights.values()) <= 0:
+            st.error("Al menos una actividad debe tener peso positivo")
+            return
         
-        # Obtener datos de la actividad
-        actividad_response = supabase.table('actividades').select('*').eq('id', reserva['actividad_id']).execute()
-        actividad = actividad_response.data[0] if actividad_response.data else None
+        # Reservas ya creadas en el mes: se respetan y cuentan como carga del monitor
+        # (se leen sin plazo porque el plan no puede basarse en datos antiguos)
+        existing = repository.reservation_slots(supabase, month_days[0], month_days[-1])
         
-        # Crear información resumida
-        turno_info = f"{turno['nombre']} ({turno['hora_inicio']} - {turno['hora_fin']})" if turno else "Turno desconocido"
-        actividad_info = actividad['nombre'] if actividad else "Actividad desconocida"
+        rows, unassignable = plan_month(year, month, turnos, weights, [m.id for m in monitores],
+                                        unavailable, existing)
+        st.session_state.monthly_plan = {'month': (year, month), 'rows': rows, 'unassignable': unassignable}
+    
+    plan = st.session_state.get('monthly_plan')
+    if not plan or plan['month'] != (year, month):
+        return
+    
+    if not plan['rows']:
+        st.info("No quedan turnos libres que planificar en este mes")
+        return
+    
+    turno_names = {t.id: t.nombre for t in turnos}
+    actividad_names = {a.id: a.nombre for a in actividades}
+    monitor_names = {m.id: f"{m.nombre} {m.apellidos}" for m in monitores}
+    
+    df = pd.DataFrame(plan['rows'])
+    df['Fecha'] = pd.to_datetime(df['fecha']).dt.strftime('%d/%m/%Y')
+    df['Turno'] = df['turno_id'].map(turno_names)
+    df['Actividad'] = df['actividad_id'].map(actividad_names)
+    df['Monitor'] = df['monitor_id'].map(monitor_names)
+    
+    if plan['unassignable']:
+        st.warning(f"{len(plan['unassignable'])} turnos no tienen ningún monitor disponible y quedarán sin reserva")
+    
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        st.dataframe(df[['Fecha', 'Turno', 'Actividad', 'Monitor']], use_container_width=True, hide_index=True)
+    with col2:
+        carga = df.groupby('Monitor').size().reset_index(name='Reservas').sort_values('Reservas', ascending=False)
+        st.dataframe(carga, use_container_width=True, hide_index=True)
+    
+    if st.button(f"Crear {len(plan['rows'])} Reservas"):
+        # Inserción de todo el mes en una sola petición
+        try:
+            created = repository.insert_reservations(supabase, plan['rows'])
+        except Exception as e:
+            st.error(f"Error al crear las reservas: {str(e)}")
+            return
         
-        reservas_info.append({
-            'id': reserva['id'],
-            'info': f"{fecha_busqueda} - {turno_info} - {actividad_info}"
-        })
+        if created:
+            for reserva in created:
+                record_change('reservas', 'INSERT', reserva['id'], despues=reserva)
+                day_cache.invalidate(date.fromisoformat(reserva['fecha'][:10]))
+            del st.session_state.monthly_plan
+            st.success(f"Se crearon {len(created)} reservas")
+        else:
+            st.error("Error al crear las reservas")
+
+def show_reservation_management_tab():
+    st.header("Gestionar Reservas")
+    
+    # Permitir buscar una reserva existente
+    fecha_busqueda = st.date_input("Buscar reservas por fecha", value=datetime.now().date(), key="reservations_day")
+    
+    # Obtener reservas para la fecha seleccionada (desde la caché si ya se precargaron)
+    reservas_info, age = load_section(('Reservas del día', fecha_busqueda), day_cache.get, fecha_busqueda)
+    
+    # Precargar los días cercanos para que el cambio de fecha sea inmediato
+    day_cache.prefetch_around(fecha_busqueda)
+    
+    if reservas_info is None:
+        show_pending("Reservas del día")
+        return
+    
+    show_stale(age)
+    
+    if not reservas_info:
+        st.info(f"No hay reservas para el {fecha_busqueda}")
+        return
     
     # Permitir seleccionar una reserva
-    reserva_options = {r['id']: r['info'] for r in reservas_info}
+    reserva_options = dict(reservas_info)
     selected_reserva_id = st.selectbox("Seleccionar reserva", options=list(reserva_options.keys()), format_func=lambda x: reserva_options[x])
     
     if selected_reserva_id:
@@ -219,66 +325,78 @@ def show_reservation_management_tab():
 def manage_reservation_participants(reserva_id):
     supabase = get_supabase_client()
     
-    # Obtener información de la reserva
-    reserva_response = supabase.table('reservas').select('*').eq('id', reserva_id).execute()
+    # Obtener la reserva con su turno, actividad y monitor desde el estado local. Va sin plazo:
+    # solo la primera visita consulta la base de datos (después se reconcilia en segundo
+    # plano) y las inscripciones y el aforo no pueden gestionarse sobre datos antiguos
+    state = get_reservation_state(supabase, reserva_id)
     
-    if not reserva_response.data:
+    if not state:
         st.error("No se pudo obtener la información de la reserva")
         return
     
-    reserva = reserva_response.data[0]
-    
-    # Obtener información adicional
-    # Turno
-    turno_response = supabase.table('turnos').select('*').eq('id', reserva['turno_id']).execute()
-    turno = turno_response.data[0] if turno_response.data else None
-    
-    # Actividad
-    actividad_response = supabase.table('actividades').select('*').eq('id', reserva['actividad_id']).execute()
-    actividad = actividad_response.data[0] if actividad_response.data else None
-    
-    # Monitor
-    monitor_response = supabase.table('agentes').select('*').eq('id', reserva['monitor_id']).execute()
-    monitor = monitor_response.data[0] if monitor_response.data else None
+    reserva = state['reserva']
     
     # Mostrar información de la reserva
     st.subheader("Detalles de la Reserva")
     col1, col2 = st.columns(2)
     
     with col1:
-        st.write(f"**Fecha:** {reserva['fecha']}")
-        st.write(f"**Turno:** {turno['nombre'] if turno else 'Desconocido'}")
-        st.write(f"**Horario:** {turno['hora_inicio'] if turno else '?'} - {turno['hora_fin'] if turno else '?'}")
+        st.write(f"**Fecha:** {reserva.fecha}")
+        st.write(f"**Turno:** {reserva.turno or 'Desconocido'}")
+        st.write(f"**Horario:** {reserva.hora_inicio or '?'} - {reserva.hora_fin or '?'}")
     
     with col2:
-        st.write(f"**Actividad:** {actividad['nombre'] if actividad else 'Desconocida'}")
-        st.write(f"**Monitor:** {monitor['nombre']} {monitor['apellidos'] if monitor else 'Desconocido'}")
+        st.write(f"**Actividad:** {reserva.actividad or 'Desconocida'}")
+        st.write(f"**Monitor:** {reserva.monitor or 'Desconocido'}")
+        st.write(f"**Aforo:** {reserva.capacidad or 'Sin límite'}")
+    
+    # Participantes actuales, lista de espera y catálogo de agentes, mantenidos en la sesión
+    participaciones = state['participaciones']
+    lista_espera = state['lista_espera']
+    agentes = get_agents_catalog(supabase)
+    agentes_por_id = {a.id: a for a in agentes}
+    
+    # Cambio de aforo: al ampliarlo la base de datos promueve a los primeros en espera
+    with st.expander("Cambiar aforo"):
+        nuevo_aforo = st.number_input("Aforo (0 = sin límite)", min_value=0, step=1, value=reserva.capacidad or 0)
+        
+        if st.button("Guardar Aforo"):
+            capacidad = nuevo_aforo or None
+            
+            if capacidad is not None and capacidad < len(participaciones):
+                st.error(f"El aforo no puede ser menor que los {len(participaciones)} participantes inscritos")
+            else:
+                try:
+                    updated, promovidas = repository.update_reservation_capacity(supabase, reserva_id, capacidad)
+                except Exception:
+                    updated, promovidas = False, []
+                
+                if updated:
+                    record_change('reservas', 'UPDATE', reserva_id, antes={'capacidad': reserva.capacidad},
+                                  despues={'capacidad': capacidad})
+                    apply_capacity_changed(supabase, state, capacidad, promovidas)
+                    for promovida in promovidas:
+                        record_change('participaciones', 'INSERT', promovida.id, despues=promovida)
+                        rotation_index.record(promovida.agente_id, reserva.fecha)
+                    st.success("Aforo actualizado correctamente")
+                    st.rerun()
+                else:
+                    st.error("Error al actualizar el aforo: comprueba que no sea menor que los participantes inscritos")
     
     # Gestión de participantes
     st.subheader("Participantes")
     
-    # Obtener participantes actuales
-    participaciones_response = supabase.table('participaciones').select('*').eq('reserva_id', reserva_id).execute()
-    participaciones = participaciones_response.data if participaciones_response.data else []
-    
     # Mostrar lista de participantes actuales
     if participaciones:
         participantes_info = []
         
         for p in participaciones:
             # Obtener información del agente
-            agente_response = supabase.table('agentes').select('*').eq('id', p['agente_id']).execute()
-            if agente_response.data:
-                agente = agente_response.data[0]
-                participantes_info.append({
-                    'id': p['id'],
-                    'agente_id': agente['id'],
-                    'nombre': agente['nombre'],
-                    'apellidos': agente['apellidos'],
-                    'nip': agente['nip'],
-                    'seccion': agente['seccion'],
-                    'grupo': agente['grupo']
-                })
+            agente = agentes_por_id.get(p.agente_id)
+            if agente:
+                participantes_info.append(repository.RosterEntry(
+                    p.id, agente.id, agente.nombre, agente.apellidos, agente.nip, agente.seccion, agente.grupo
+                ))
         
         if participantes_info:
             df = pd.DataFrame(participantes_info)
@@ -286,22 +404,30 @@ def manage_reservation_participants(reserva_id):
             df_display = df[['Nombre Completo', 'nip', 'seccion', 'grupo']]
             df_display.columns = ['Nombre', 'NIP', 'Sección', 'Grupo']
             
-            st.write(f"Total de participantes: {len(df_display)}")
+            aforo = f" / {reserva.capacidad}" if reserva.capacidad else ""
+            st.write(f"Total de participantes: {len(df_display)}{aforo}")
             st.dataframe(df_display, use_container_width=True)
             
             # Opción para eliminar participantes
             with st.expander("Eliminar participantes"):
-                agente_options = {row['agente_id']: f"{row['nombre']} {row['apellidos']} ({row['nip']})" for _, row in df.iterrows()}
+                agente_options = {p.agente_id: f"{p.nombre} {p.apellidos} ({p.nip})" for p in participantes_info}
                 agente_to_remove = st.selectbox("Seleccionar agente a eliminar", options=list(agente_options.keys()), format_func=lambda x: agente_options[x])
                 
                 if st.button("Eliminar Participante"):
                     # Buscar la participación correspondiente
-                    participacion_to_remove = next((p for p in participaciones if p['agente_id'] == agente_to_remove), None)
+                    participacion_to_remove = next((p for p in participaciones if p.agente_id == agente_to_remove), None)
                     
                     if participacion_to_remove:
-                        delete_response = supabase.table('participaciones').delete().eq('id', participacion_to_remove['id']).execute()
+                        # La baja y la promoción desde la lista de espera ocurren en la misma transacción
+                        deleted, promovidas = repository.withdraw_participation(supabase, participacion_to_remove.id)
                         
-                        if delete_response:
+                        if deleted:
+                            record_change('participaciones', 'DELETE', participacion_to_remove.id, antes=participacion_to_remove)
+                            apply_participant_removed(supabase, state, participacion_to_remove.id, promovidas)
+                            rotation_index.forget(agente_to_remove, reserva.fecha)
+                            for promovida in promovidas:
+                                record_change('participaciones', 'INSERT', promovida.id, despues=promovida)
+                                rotation_index.record(promovida.agente_id, reserva.fecha)
                             st.success("Participante eliminado correctamente")
                             st.rerun()
                         else:
@@ -309,18 +435,47 @@ def manage_reservation_participants(reserva_id):
     else:
         st.info("No hay participantes registrados en esta reserva")
     
+    # Lista de espera, por orden de llegada
+    if lista_espera:
+        st.subheader("Lista de Espera")
+        
+        espera_info = [(e, agentes_por_id.get(e.agente_id)) for e in lista_espera]
+        st.dataframe(
+            [{'Puesto': puesto, 'Nombre': f"{a.nombre} {a.apellidos}" if a else 'Desconocido', 'NIP': a.nip if a else ''}
+             for puesto, (e, a) in enumerate(espera_info, 1)],
+            use_container_width=True,
+            hide_index=True
+        )
+        
+        with st.expander("Quitar de la lista de espera"):
+            espera_options = {e.id: f"{a.nombre} {a.apellidos} ({a.nip})" if a else e.agente_id for e, a in espera_info}
+            espera_to_remove = st.selectbox("Seleccionar agente en espera", options=list(espera_options.keys()), format_func=lambda x: espera_options[x])
+            
+            if st.button("Quitar de la Lista"):
+                if repository.leave_waitlist(supabase, espera_to_remove):
+                    record_change('lista_espera', 'DELETE', espera_to_remove,
+                                  antes=next(e for e in lista_espera if e.id == espera_to_remove))
+                    apply_waitlist_removed(supabase, state, espera_to_remove)
+                    st.success("Agente quitado de la lista de espera")
+                    st.rerun()
+                else:
+                    st.error("Error al quitar al agente de la lista de espera")
+    
     # Formulario para añadir participantes
     st.subheader("Añadir Participantes")
     
-    # Obtener todos los agentes que no son participantes actuales
-    agentes_participantes_ids = [p['agente_id'] for p in participaciones]
+    notice = st.session_state.pop('reservation_notice', None)
+    if notice and notice[0] == reserva_id:
+        st.warning(notice[1])
     
-    # Consultar todos los agentes
-    agentes_response = supabase.table('agentes').select('*').execute()
-    agentes = agentes_response.data if agentes_response.data else []
+    if reserva.capacidad and len(participaciones) >= reserva.capacidad:
+        st.caption("La reserva está completa: los agentes que se añadan pasan a la lista de espera")
+    
+    # Obtener todos los agentes que no son participantes actuales ni están en espera
+    agentes_participantes_ids = {p.agente_id for p in participaciones} | {e.agente_id for e in lista_espera}
     
     # Filtrar agentes que no son participantes actuales
-    agentes_disponibles = [a for a in agentes if a['id'] not in agentes_participantes_ids]
+    agentes_disponibles = [a for a in agentes if a.id not in agentes_participantes_ids]
     
     if not agentes_disponibles:
         st.info("No hay más agentes disponibles para añadir")
@@ -331,23 +486,23 @@ def manage_reservation_participants(reserva_id):
         with col1:
             filter_seccion = st.multiselect(
                 "Filtrar por Sección",
-                options=list(set(a['seccion'] for a in agentes_disponibles)),
+                options=list(set(a.seccion for a in agentes_disponibles)),
                 default=[]
             )
         
         with col2:
             filter_grupo = st.multiselect(
                 "Filtrar por Grupo",
-                options=list(set(a['grupo'] for a in agentes_disponibles)),
+                options=list(set(a.grupo for a in agentes_disponibles)),
                 default=[]
             )
         
         # Aplicar filtros
         if filter_seccion:
-            agentes_disponibles = [a for a in agentes_disponibles if a['seccion'] in filter_seccion]
+            agentes_disponibles = [a for a in agentes_disponibles if a.seccion in filter_seccion]
         
         if filter_grupo:
-            agentes_disponibles = [a for a in agentes_disponibles if a['grupo'] in filter_grupo]
+            agentes_disponibles = [a for a in agentes_disponibles if a.grupo in filter_grupo]
         
         # Buscar por NIP o nombre
         search_query = st.text_input("Buscar por NIP o Nombre")
@@ -356,29 +511,48 @@ def manage_reservation_participants(reserva_id):
             search_query = search_query.lower()
             agentes_disponibles = [
                 a for a in agentes_disponibles 
-                if search_query in a['nip'].lower() or 
-                   search_query in a['nombre'].lower() or 
-                   search_query in a['apellidos'].lower()
+                if search_query in a.nip.lower() or 
+                   search_query in a.nombre.lower() or 
+                   search_query in a.apellidos.lower()
             ]
         
         # Seleccionar agente a añadir
         if agentes_disponibles:
-            agente_options = {a['id']: f"{a['nombre']} {a['apellidos']} ({a['nip']}) - {a['seccion']} - {a['grupo']}" for a in agentes_disponibles}
-            selected_agente_id = st.selectbox("Seleccionar agente", options=list(agente_options.keys()), format_func=lambda x: agente_options[x])
+            # Ordenar por rotación: primero quien lleva más tiempo sin participar
+            rotation_index.ensure_loaded(supabase)
+            ranked_ids = rotation_index.rank([a.id for a in agentes_disponibles])
+            agentes_por_id_disponibles = {a.id: a for a in agentes_disponibles}
+            
+            candidate_options = {}
+            for agente_id in ranked_ids:
+                a = agentes_por_id_disponibles[agente_id]
+                recientes, ultima = rotation_index.stats(agente_id)
+                ultima_info = ultima.strftime('%d/%m/%Y') if ultima else 'nunca'
+                candidate_options[agente_id] = (f"{a.nombre} {a.apellidos} ({a.nip}) - {a.seccion} - {a.grupo}"
+                                             f" · última: {ultima_info} · {ROTATION_WINDOW_DAYS}d: {recientes}")
+            
+            selected_agente_id = st.selectbox("Seleccionar agente (primero quien lleva más tiempo sin entrenar)", options=ranked_ids, format_func=lambda x: candidate_options[x])
             
             if st.button("Añadir Participante"):
-                # Crear nueva participación
-                data = {
-                    'reserva_id': reserva_id,
-                    'agente_id': selected_agente_id
-                }
+                # Inscripción con el aforo comprobado en la misma escritura
+                inscripcion = repository.enroll_agent(supabase, reserva_id, selected_agente_id)
                 
-                insert_response = supabase.table('participaciones').insert(data).execute()
-                
-                if insert_response.data:
-                    st.success("Participante añadido correctamente")
-                    st.rerun()
-                else:
+                if inscripcion is None:
                     st.error("Error al añadir el participante")
+                else:
+                    apply_enrollment(supabase, state, selected_agente_id, inscripcion)
+                    
+                    if inscripcion.estado == 'en_espera':
+                        record_change('lista_espera', 'INSERT', inscripcion.id,
+                                      despues={'reserva_id': reserva_id, 'agente_id': selected_agente_id})
+                        # El aviso se muestra tras recargar la página con la lista de espera actualizada
+                        st.session_state.reservation_notice = (reserva_id, "La reserva está completa: el agente queda en la lista de espera")
+                    else:
+                        if inscripcion.estado == 'inscrito':
+                            record_change('participaciones', 'INSERT', inscripcion.id,
+                                          despues={'reserva_id': reserva_id, 'agente_id': selected_agente_id})
+                            rotation_index.record(selected_agente_id, reserva.fecha)
+                        st.success("Participante añadido correctamente")
+                    st.rerun()
         else:
             st.info("No hay agentes disponibles con los filtros seleccionados")
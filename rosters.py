@@ -0,0 +1,164 @@
+"""Generación de las listas de participantes de un día, por monitor.
+
+Uso:
+    python rosters.py                      # reservas de mañana, en CSV y HTML
+    python rosters.py --fecha 2024-05-20 --formato csv html pdf --salida /srv/listas
+
+Carga todas las reservas del día con turno, actividad, monitor y participantes en
+una sola consulta, sea cual sea el número de reservas, y escribe un fichero por
+monitor y formato en <salida>/<fecha>/. Pensado para ejecutarse desde cron:
+
+    0 20 * * * cd /ruta/a/la/app && python rosters.py
+
+El formato pdf necesita reportlab instalado.
+"""
+import argparse
+import csv
+import html
+import os
+import re
+import sys
+import unicodedata
+from datetime import date, timedelta
+from dotenv import load_dotenv
+from db_utils import get_supabase_client
+import repository
+
+try:
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+except ImportError:  # reportlab es opcional: solo se necesita para el formato pdf
+    SimpleDocTemplate = None
+
+# Cargar variables de entorno
+load_dotenv()
+
+# Directorio en que se escriben las listas
+ROSTER_DIR = os.getenv("ROSTER_DIR", "listas")
+
+FORMATS = ('csv', 'html', 'pdf')
+CSV_HEADER = ['Fecha', 'Turno', 'Horario', 'Actividad', 'Apellidos', 'Nombre', 'NIP', 'Sección', 'Grupo', 'Firma']
+
+def _slug(text):
+    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'[^A-Za-z0-9]+', '_', text).strip('_').lower() or 'sin_monitor'
+
+def group_by_monitor(rosters):
+    """Agrupa las reservas del día por monitor manteniendo el orden por hora"""
+    grouped = {}
+    for reserva, roster in rosters:
+        grouped.setdefault(reserva.monitor_id, []).append((reserva, roster))
+    return grouped
+
+def _horario(reserva):
+    return f"{reserva.hora_inicio or '?'} - {reserva.hora_fin or '?'}"
+
+def write_csv(path, sessions):
+    with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_HEADER)
+        for reserva, roster in sessions:
+            for p in roster:
+                writer.writerow([reserva.fecha, reserva.turno, _horario(reserva), reserva.actividad,
+                                 p.apellidos, p.nombre, p.nip, p.seccion, p.grupo, ''])
+
+def write_html(path, monitor, fecha, sessions):
+    parts = [
+        '<!DOCTYPE html><html lang="es"><head><meta charset="utf-8">',
+        f'<title>Lista {html.escape(monitor)} {fecha.isoformat()}</title>',
+        '<style>body{font-family:sans-serif;margin:2em}table{border-collapse:collapse;width:100%;margin-bottom:2em}'
+        'th,td{border:1px solid #999;padding:4px 8px;text-align:left}td.firma{width:25%}'
+        '@media print{section{page-break-after:always}}</style></head><body>',
+    ]
+    for reserva, roster in sessions:
+        parts.append('<section>')
+        parts.append(f'<h1>{html.escape(reserva.actividad or "Actividad desconocida")}</h1>')
+        parts.append(f'<p>{fecha.strftime("%d/%m/%Y")} · {html.escape(reserva.turno or "")} ({_horario(reserva)}) · '
+                     f'Monitor: {html.escape(monitor)} · Participantes: {len(roster)}</p>')
+        parts.append('<table><tr><th>#</th><th>Apellidos</th><th>Nombre</th><th>NIP</th>'
+                     '<th>Sección</th><th>Grupo</th><th>Firma</th></tr>')
+        for number, p in enumerate(roster, 1):
+            cells = [str(number), p.apellidos, p.nombre, p.nip, p.seccion, p.grupo]
+            parts.append('<tr>' + ''.join(f'<td>{html.escape(c)}</td>' for c in cells) + '<td class="firma"></td></tr>')
+        parts.append('</table></section>')
+    parts.append('</body></html>')
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(parts))
+
+def write_pdf(path, monitor, fecha, sessions):
+    styles = getSampleStyleSheet()
+    story = []
+    for reserva, roster in sessions:
+        story.append(Paragraph(html.escape(reserva.actividad or "Actividad desconocida"), styles['Heading1']))
+        story.append(Paragraph(f'{fecha.strftime("%d/%m/%Y")} · {html.escape(reserva.turno or "")} ({_horario(reserva)}) · '
+                               f'Monitor: {html.escape(monitor)} · Participantes: {len(roster)}', styles['Normal']))
+        story.append(Spacer(1, 12))
+        rows = [['#', 'Apellidos', 'Nombre', 'NIP', 'Sección', 'Grupo', 'Firma']]
+        rows += [[str(n), p.apellidos, p.nombre, p.nip, p.seccion, p.grupo, ''] for n, p in enumerate(roster, 1)]
+        table = Table(rows, repeatRows=1)
+        table.setStyle(TableStyle([
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+        ]))
+        story.append(table)
+        story.append(Spacer(1, 24))
+
+    SimpleDocTemplate(path, pagesize=A4, title=f"Lista {monitor} {fecha.isoformat()}").build(story)
+
+def generate_rosters(supabase, fecha, output_dir=ROSTER_DIR, formats=('csv', 'html')):
+    """Escribe las listas del día por monitor y devuelve las rutas generadas"""
+    grouped = group_by_monitor(repository.day_rosters(supabase, fecha))
+    if not grouped:
+        return []
+
+    day_dir = os.path.join(output_dir, fecha.isoformat())
+    os.makedirs(day_dir, exist_ok=True)
+
+    paths = []
+    for monitor_id, sessions in grouped.items():
+        monitor = sessions[0][0].monitor or 'Sin monitor'
+        # El prefijo del id evita que dos monitores con el mismo nombre compartan fichero
+        base = os.path.join(day_dir, f"{fecha.isoformat()}_{_slug(monitor)}_{str(monitor_id)[:8]}")
+
+        if 'csv' in formats:
+            write_csv(base + '.csv', sessions)
+            paths.append(base + '.csv')
+        if 'html' in formats:
+            write_html(base + '.html', monitor, fecha, sessions)
+            paths.append(base + '.html')
+        if 'pdf' in formats:
+            write_pdf(base + '.pdf', monitor, fecha, sessions)
+            paths.append(base + '.pdf')
+
+    return paths
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera las listas de participantes de un día por monitor")
+    parser.add_argument('--fecha', type=date.fromisoformat, default=date.today() + timedelta(days=1),
+                        help="Fecha de las reservas (AAAA-MM-DD); por defecto, mañana")
+    parser.add_argument('--formato', nargs='+', choices=FORMATS, default=['csv', 'html'],
+                        help="Formatos a generar")
+    parser.add_argument('--salida', default=ROSTER_DIR, help="Directorio de salida")
+    args = parser.parse_args()
+
+    if 'pdf' in args.formato and SimpleDocTemplate is None:
+        parser.error("El formato pdf necesita reportlab (pip install reportlab)")
+
+    try:
+        paths = generate_rosters(get_supabase_client(), args.fecha, args.salida, args.formato)
+    except Exception as e:
+        print(f"Error al generar las listas: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if not paths:
+        print(f"No hay reservas para el {args.fecha.isoformat()}")
+        return
+
+    for path in paths:
+        print(path)
+
+if __name__ == "__main__":
+    main()
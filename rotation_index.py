@@ -0,0 +1,123 @@
+import heapq
+import threading
+from bisect import bisect_left, insort
+from datetime import date, timedelta
+import repository
+
+# Ventana móvil (en días) para contar las participaciones recientes
+ROTATION_WINDOW_DAYS = 90
+
+def _to_date(value):
+    return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+class RotationIndex:
+    """Índice en memoria de la última participación y las participaciones recientes de cada agente.
+
+    Se carga una vez con la ventana de los últimos ROTATION_WINDOW_DAYS días y la
+    tabla rotacion_agentes, y después se actualiza con cada alta o baja de
+    participación, así que ordenar a los candidatos no recorre el historial.
+    """
+
+    def __init__(self, window_days=ROTATION_WINDOW_DAYS, today=date.today):
+        self.window_days = window_days
+        self._today = today
+        self._lock = threading.Lock()
+        self._recent = {}
+        self._last = {}
+        # Agentes cuya última participación hay que volver a leer de rotacion_agentes
+        self._stale = set()
+        self._loaded = False
+
+    def _cutoff(self):
+        return self._today() - timedelta(days=self.window_days)
+
+    def ensure_loaded(self, supabase):
+        with self._lock:
+            if self._loaded:
+                if self._stale:
+                    stale, self._stale = self._stale, set()
+                    last = repository.last_participations(supabase, stale)
+                    for agente_id in stale:
+                        if agente_id in last:
+                            self._last[agente_id] = _to_date(last[agente_id])
+                        else:
+                            self._last.pop(agente_id, None)
+                return
+
+            cutoff = self._cutoff()
+            recent = {}
+            for agente_id, fecha in repository.participation_dates_since(supabase, cutoff):
+                insort(recent.setdefault(agente_id, []), _to_date(fecha))
+
+            self._recent = recent
+            self._last = {agente_id: _to_date(fecha) for agente_id, fecha in repository.last_participations(supabase).items()}
+            for agente_id, dates in recent.items():
+                if dates and (agente_id not in self._last or dates[-1] > self._last[agente_id]):
+                    self._last[agente_id] = dates[-1]
+            self._stale = set()
+            self._loaded = True
+
+    def _prune(self, dates):
+        """Descarta las fechas que han salido de la ventana (con el bloqueo tomado)"""
+        expired = bisect_left(dates, self._cutoff())
+        if expired:
+            del dates[:expired]
+
+    def record(self, agente_id, fecha):
+        """Registra una participación nueva"""
+        fecha = _to_date(fecha)
+        with self._lock:
+            dates = self._recent.setdefault(agente_id, [])
+            if fecha >= self._cutoff():
+                insort(dates, fecha)
+            self._prune(dates)
+            if agente_id not in self._last or fecha > self._last[agente_id]:
+                self._last[agente_id] = fecha
+            self._stale.discard(agente_id)
+
+    def forget(self, agente_id, fecha):
+        """Descuenta una participación eliminada"""
+        fecha = _to_date(fecha)
+        with self._lock:
+            dates = self._recent.get(agente_id, [])
+            position = bisect_left(dates, fecha)
+            if position < len(dates) and dates[position] == fecha:
+                dates.pop(position)
+            self._prune(dates)
+
+            if self._last.get(agente_id) == fecha:
+                if dates:
+                    self._last[agente_id] = dates[-1]
+                else:
+                    # La anterior es de fuera de la ventana: se lee de rotacion_agentes en
+                    # el siguiente ensure_loaded; mientras tanto se mantiene la conocida
+                    self._stale.add(agente_id)
+
+    def _stats(self, agente_id):
+        dates = self._recent.get(agente_id)
+        count = len(dates) - bisect_left(dates, self._cutoff()) if dates else 0
+        return count, self._last.get(agente_id)
+
+    def stats(self, agente_id):
+        """Devuelve (participaciones en la ventana, fecha de la última participación o None)"""
+        with self._lock:
+            return self._stats(agente_id)
+
+    def _key(self, agente_id):
+        # Primero quien lleva más tiempo sin entrenar (nunca = el primero); a igual fecha,
+        # quien menos ha entrenado en la ventana
+        count, last = self._stats(agente_id)
+        return (last or date.min, count)
+
+    def rank(self, agente_ids):
+        """Ordena a los agentes de quien lleva más tiempo sin entrenar a quien menos"""
+        with self._lock:
+            return sorted(agente_ids, key=self._key)
+
+    def top_k(self, agente_ids, k):
+        """Los k agentes con mayor prioridad de rotación sin ordenar toda la lista"""
+        with self._lock:
+            return heapq.nsmallest(k, agente_ids, key=self._key)
+
+# Índice compartido por todas las sesiones del proceso
+rotation_index = RotationIndex()
@@ -0,0 +1,133 @@
+"""Comprobación del almacén de sesiones con un reloj simulado.
+
+Uso:
+    python session_check.py
+
+Ejercita SessionStore sin esperar a que pase el tiempo real, avanzando a mano el
+reloj que recibe en el constructor, y comprueba que:
+
+  - una sesión se resuelve hasta su caducidad y deja de resolverse después
+  - una sesión revocada no se resuelve y la revocación dura hasta que el token caduca
+  - sin fecha de caducidad, la revocación dura TOKEN_EXPIRY_DAYS
+  - las revocaciones caducadas se descartan al revocar otra sesión
+  - al llenarse, el almacén descarta primero las sesiones caducadas y después las
+    que caducan antes
+
+No necesita base de datos ni Streamlit.
+"""
+import argparse
+import sys
+from session_store import SessionStore, TOKEN_EXPIRY_DAYS
+
+class FakeClock:
+    """Reloj que solo avanza cuando se le pide"""
+
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+USER = {'id': 'u1', 'username': 'admin', 'email': 'admin@test', 'role': 'admin'}
+
+def scenario_expiry():
+    clock = FakeClock()
+    store = SessionStore(clock=clock)
+    problems = []
+
+    store.put('a', USER, clock() + 60)
+    if store.get('a') != USER:
+        problems.append("la sesión no se resuelve antes de caducar")
+
+    clock.advance(60)
+    if store.get('a') is not None:
+        problems.append("la sesión se resuelve después de caducar")
+    if 'a' in store._sessions:
+        problems.append("la sesión caducada sigue en el almacén")
+
+    return problems
+
+def scenario_revocation():
+    clock = FakeClock()
+    store = SessionStore(clock=clock)
+    problems = []
+
+    store.put('a', USER, clock() + 3600)
+    store.revoke('a')
+    if store.get('a') is not None or not store.is_revoked('a'):
+        problems.append("la sesión revocada se sigue resolviendo")
+
+    clock.advance(3599)
+    if not store.is_revoked('a'):
+        problems.append("la revocación se olvida antes de que caduque el token")
+
+    clock.advance(1)
+    if store.is_revoked('a') or 'a' in store._revoked:
+        problems.append("la revocación se recuerda después de que caduque el token")
+
+    # Sin sesión registrada ni caducidad, la revocación dura lo que un token nuevo
+    store.revoke('b')
+    clock.advance(TOKEN_EXPIRY_DAYS * 24 * 3600 - 1)
+    if not store.is_revoked('b'):
+        problems.append(f"la revocación sin caducidad dura menos de {TOKEN_EXPIRY_DAYS} días")
+    clock.advance(1)
+
+    # Revocar otra sesión descarta las revocaciones ya caducadas
+    store.revoke('c', clock() + 60)
+    if set(store._revoked) != {'c'}:
+        problems.append(f"quedan revocaciones caducadas: {sorted(set(store._revoked) - {'c'})}")
+
+    return problems
+
+def scenario_eviction(max_sessions):
+    clock = FakeClock()
+    store = SessionStore(clock=clock, max_sessions=max_sessions)
+    problems = []
+
+    # La mitad caduca enseguida: al llenarse se purgan sin tocar las vigentes
+    for i in range(max_sessions):
+        store.put(f"s{i}", USER, clock() + (10 if i % 2 else 3600 + i))
+    clock.advance(10)
+    store.put('nueva', USER, clock() + 3600)
+
+    vigentes = {f"s{i}" for i in range(0, max_sessions, 2)} | {'nueva'}
+    if set(store._sessions) != vigentes:
+        problems.append("al llenarse no se descartaron exactamente las sesiones caducadas")
+
+    # Con todas vigentes se descartan las que caducan antes
+    store = SessionStore(clock=clock, max_sessions=max_sessions)
+    for i in range(max_sessions):
+        store.put(f"s{i}", USER, clock() + 100 + i)
+    store.put('nueva', USER, clock() + 10_000)
+
+    if len(store._sessions) > max_sessions:
+        problems.append(f"el almacén supera las {max_sessions} sesiones")
+    if store.get('s0') is not None or store.get(f"s{max_sessions - 1}") != USER or store.get('nueva') != USER:
+        problems.append("al llenarse no se descartaron primero las sesiones que caducan antes")
+
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description="Comprueba el almacén de sesiones con un reloj simulado")
+    parser.add_argument('--max-sesiones', type=int, default=8, help="Capacidad del almacén en la prueba de descarte")
+    args = parser.parse_args()
+
+    failed = False
+    for name, run in (
+        ("caducidad", scenario_expiry),
+        ("revocación", scenario_revocation),
+        ("descarte al llenarse", lambda: scenario_eviction(args.max_sesiones)),
+    ):
+        problems = run()
+        failed |= bool(problems)
+        print(f"{name}: {'OK' if not problems else 'FALLO'}")
+        for problem in problems:
+            print(f"    {problem}")
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import threading
+import time
+
+TOKEN_EXPIRY_DAYS = 7  # El token durará 7 días
+
+class SessionStore:
+    """Almacén de sesiones del proceso indexado por el identificador del token (jti).
+
+    Guarda los datos ya verificados del token hasta su caducidad, de modo que
+    restaurar una sesión es una búsqueda en un diccionario en lugar de decodificar
+    el JWT. Las sesiones revocadas dejan de resolverse aunque el token siga siendo válido.
+    """
+
+    def __init__(self, clock=time.time, max_sessions=10000):
+        self._clock = clock
+        self._max_sessions = max_sessions
+        self._sessions = {}
+        self._revoked = {}
+        self._lock = threading.Lock()
+
+    def put(self, jti, user, expires_at):
+        """Registra una sesión verificada; expires_at es un timestamp en segundos"""
+        with self._lock:
+            if len(self._sessions) >= self._max_sessions:
+                self._purge()
+            self._sessions[jti] = (user, expires_at)
+
+    def get(self, jti):
+        """Devuelve el usuario de la sesión, o None si no existe, caducó o fue revocada"""
+        entry = self._sessions.get(jti)
+        if entry is None:
+            return None
+
+        user, expires_at = entry
+        if self._clock() >= expires_at:
+            with self._lock:
+                self._sessions.pop(jti, None)
+            return None
+
+        return user
+
+    def is_revoked(self, jti):
+        expires_at = self._revoked.get(jti)
+        if expires_at is None:
+            return False
+
+        # Pasada la caducidad el token ya no es válido: no hace falta recordar la revocación
+        if self._clock() >= expires_at:
+            with self._lock:
+                self._revoked.pop(jti, None)
+            return False
+
+        return True
+
+    def revoke(self, jti, expires_at=None):
+        """Invalida la sesión; la revocación se recuerda hasta que el token caduque"""
+        with self._lock:
+            entry = self._sessions.pop(jti, None)
+            if expires_at is None:
+                expires_at = entry[1] if entry else self._clock() + TOKEN_EXPIRY_DAYS * 24 * 3600
+            self._purge_revoked()
+            self._revoked[jti] = expires_at
+
+    def _purge_revoked(self):
+        now = self._clock()
+        self._revoked = {k: v for k, v in self._revoked.items() if v > now}
+
+    def _purge(self):
+        now = self._clock()
+        self._sessions = {k: v for k, v in self._sessions.items() if v[1] > now}
+        self._purge_revoked()
+
+        # Si siguen sin caber, se descartan las sesiones que caducan antes
+        if len(self._sessions) >= self._max_sessions:
+            keep = sorted(self._sessions.items(), key=lambda item: item[1][1])[len(self._sessions) // 2:]
+            self._sessions = dict(keep)
+
+# Almacén compartido por todas las sesiones de Streamlit del proceso
+session_store = SessionStore()
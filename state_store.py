@@ -0,0 +1,140 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+import streamlit as st
+import repository
+
+# Segundos tras los que el estado local se vuelve a contrastar con la base de datos
+RECONCILE_SECONDS = 60
+
+# Hilos compartidos por todas las sesiones para las reconciliaciones en segundo plano
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="reconcile")
+
+def _schedule(entry, fetch, *args):
+    """Lanza la recarga en segundo plano recordando la versión local a la que corresponde"""
+    if entry.get('pending') is None:
+        entry['pending'] = (entry['version'], _executor.submit(fetch, *args))
+
+def _reconcile(entry, key, fetch, *args):
+    """Aplica una recarga terminada o programa una nueva si el estado está caducado.
+
+    El resultado solo se aplica si no ha habido parches locales desde que se lanzó,
+    para no pisar una escritura optimista más reciente con datos antiguos. Con una
+    tupla de claves, fetch devuelve un valor para cada una.
+    """
+    pending = entry.get('pending')
+    if pending is not None:
+        version, future = pending
+        if future.done():
+            entry['pending'] = None
+            if future.exception() is None and version == entry['version']:
+                if isinstance(key, tuple):
+                    entry.update(zip(key, future.result()))
+                else:
+                    entry[key] = future.result()
+                entry['loaded_at'] = time.time()
+
+    if time.time() - entry['loaded_at'] > RECONCILE_SECONDS:
+        _schedule(entry, fetch, *args)
+
+def _touch(entry, fetch, *args):
+    """Marca un parche local y programa su reconciliación"""
+    entry['version'] += 1
+    entry['pending'] = None
+    _schedule(entry, fetch, *args)
+
+# --- Catálogo de agentes -----------------------------------------------------
+
+def get_agents_catalog(supabase):
+    """Devuelve la lista de agentes de la sesión, cargándola solo la primera vez"""
+    entry = st.session_state.get('agents_catalog')
+
+    if entry is None:
+        entry = {'agents': repository.list_agents(supabase), 'loaded_at': time.time(), 'version': 0, 'pending': None}
+        st.session_state.agents_catalog = entry
+    else:
+        _reconcile(entry, 'agents', repository.list_agents, supabase)
+
+    return entry['agents']
+
+def patch_agent(supabase, agent_id, changes):
+    """Aplica localmente los cambios guardados de un agente"""
+    entry = st.session_state.get('agents_catalog')
+    if entry is None:
+        return
+
+    agents = entry['agents']
+    for position, agent in enumerate(agents):
+        if agent.id == agent_id:
+            agents[position] = agent._replace(**changes)
+            break
+
+    _touch(entry, repository.list_agents, supabase)
+
+def invalidate_agents_catalog():
+    """Descarta el catálogo para recargarlo tras cambios masivos (importaciones)"""
+    st.session_state.pop('agents_catalog', None)
+    st.session_state.pop('original_agents_df', None)
+
+# --- Estado de una reserva y su lista de participantes -----------------------
+
+ENROLLMENT_KEYS = ('participaciones', 'lista_espera')
+
+def get_reservation_state(supabase, reserva_id):
+    """Devuelve el estado local de una reserva (datos, participaciones y lista de espera).
+
+    La reserva se carga con una sola consulta que incluye turno, actividad y monitor;
+    las participaciones y la lista de espera se parchean localmente tras cada escritura.
+    """
+    states = st.session_state.setdefault('reservation_states', {})
+    entry = states.get(reserva_id)
+
+    if entry is None:
+        reserva = repository.get_reservation(supabase, reserva_id)
+        if reserva is None:
+            return None
+
+        participaciones, lista_espera = repository.reservation_enrollment(supabase, reserva_id)
+        entry = {
+            'reserva': reserva,
+            'participaciones': participaciones,
+            'lista_espera': lista_espera,
+            'loaded_at': time.time(),
+            'version': 0,
+            'pending': None
+        }
+        states[reserva_id] = entry
+    else:
+        _reconcile(entry, ENROLLMENT_KEYS, repository.reservation_enrollment, supabase, reserva_id)
+
+    return entry
+
+def apply_enrollment(supabase, entry, agente_id, enrollment):
+    """Aplica localmente el resultado de inscribir a un agente (inscrito o en espera)"""
+    if enrollment.estado == 'en_espera':
+        if not any(e.agente_id == agente_id for e in entry['lista_espera']):
+            entry['lista_espera'].append(repository.WaitlistRef(enrollment.id, agente_id, ''))
+    else:
+        entry['lista_espera'] = [e for e in entry['lista_espera'] if e.agente_id != agente_id]
+        if not any(p.agente_id == agente_id for p in entry['participaciones']):
+            entry['participaciones'].append(repository.ParticipationRef(enrollment.id, agente_id))
+    _touch(entry, repository.reservation_enrollment, supabase, entry['reserva'].id)
+
+def apply_participant_removed(supabase, entry, participacion_id, promovidas=()):
+    """Elimina localmente la participación borrada y pasa a participantes a los promovidos"""
+    promovidos = {p.agente_id for p in promovidas}
+    entry['participaciones'] = [p for p in entry['participaciones'] if p.id != participacion_id] + list(promovidas)
+    entry['lista_espera'] = [e for e in entry['lista_espera'] if e.agente_id not in promovidos]
+    _touch(entry, repository.reservation_enrollment, supabase, entry['reserva'].id)
+
+def apply_waitlist_removed(supabase, entry, espera_id):
+    """Elimina localmente una entrada de la lista de espera"""
+    entry['lista_espera'] = [e for e in entry['lista_espera'] if e.id != espera_id]
+    _touch(entry, repository.reservation_enrollment, supabase, entry['reserva'].id)
+
+def apply_capacity_changed(supabase, entry, capacidad, promovidas=()):
+    """Aplica el nuevo aforo y pasa a participantes a los promovidos por la ampliación"""
+    promovidos = {p.agente_id for p in promovidas}
+    entry['reserva'] = entry['reserva']._replace(capacidad=capacidad)
+    entry['participaciones'] = entry['participaciones'] + list(promovidas)
+    entry['lista_espera'] = [e for e in entry['lista_espera'] if e.agente_id not in promovidos]
+    _touch(entry, repository.reservation_enrollment, supabase, entry['reserva'].id)